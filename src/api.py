@@ -1,27 +1,95 @@
 from __future__ import annotations
 
+import asyncio
 import io
+import json
 import os
-import re
+import threading
+import time
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
-import joblib
-import pdfplumber
-from docx import Document
-from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi import FastAPI, File, HTTPException, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
-from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
 
-from src.features import sent2features
+from src.batching import MicroBatcher
+from src.cache import PredictionCache
+from src.entities import EntityAggregator, decode_entities
+from src.extraction import (
+    ExtractionBusyError,
+    ExtractionPool,
+    default_workers,
+    iter_document_tokens,
+    tokenize_parts,
+)
+from src.logreg_fast import CompiledLogReg
+from src.metrics import MetricsRegistry
+from src.registry import WARMUP_SENTENCES, ModelRegistry, ModelVersion
+from src.report import ReportBusyError, ReportJobs
+from src.tokenizer import TokenSpans, tokenize, tokenize_text
 
 app = FastAPI(title="NER API")
+# Référence des délais de démarrage (/ready) : fin des imports du module
+STARTED_AT = time.perf_counter()
+
+# Taille maximale des fichiers importés, lus par morceaux
+MAX_UPLOAD_BYTES = 50_000_000
+UPLOAD_CHUNK_SIZE = 1 << 20
+UPLOAD_PATHS = {"/predict-file", "/predict-file-stream"}
+TOO_LARGE_DETAIL = "Fichier trop volumineux (> 50MB)"
+
+
+@app.middleware("http")
+async def reject_large_uploads(request: Request, call_next):
+    """Refuse les imports trop gros d'après Content-Length, avant de lire le corps"""
+    if request.url.path in UPLOAD_PATHS:
+        length = request.headers.get("content-length")
+        # Marge pour l'enveloppe multipart autour du fichier
+        if length and length.isdigit() and int(length) > MAX_UPLOAD_BYTES + 65_536:
+            return JSONResponse(status_code=413, content={"detail": TOO_LARGE_DETAIL})
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def reject_until_ready(request: Request, call_next):
+    """Répond 503 aux prédictions tant que le modèle chargé en arrière-plan n'est pas actif
+
+    Sans NER_BACKGROUND_LOAD, le chargement est synchrone (ou fait par l'appelant,
+    via load_model_file) et les requêtes passent sans attendre le démarrage.
+    """
+    if BACKGROUND_LOAD and not readiness["ready"] and request.url.path in PREDICT_PATHS:
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Modèle en cours de chargement"},
+            headers={"Retry-After": "1"},
+        )
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Compte et chronomètre chaque requête par route (et non par URL brute)"""
+    if not metrics.enabled:
+        return await call_next(request)
+
+    start = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        path = getattr(request.scope.get("route"), "path", "unmatched")
+        metrics.request_seconds.observe(
+            time.perf_counter() - start, method=request.method, path=path
+        )
+        metrics.requests.inc(method=request.method, path=path, status=status)
+
 
 # Configuration CORS depuis variable d'environnement ou valeurs par défaut
 raw_origins = os.getenv(
@@ -44,9 +112,60 @@ if models_path.exists():
     app.mount("/models", StaticFiles(directory=str(models_path)), name="models")
 MODEL_PATH = Path("models") / "ner_model_best.joblib"
 FALLBACK_MODEL_PATH = Path("models") / "ner_model.joblib"
-MODEL_TYPE = "crf"  # or "logreg"
-
-model = None
+# Versions gardées en mémoire pour un retour arrière (active comprise)
+MODEL_KEEP_VERSIONS = int(os.getenv("NER_MODEL_KEEP_VERSIONS", "2"))
+# "arrays" : décodeur NumPy sur l'export <modèle>.arrays, mappé en mémoire en
+# lecture seule et donc partagé par tous les workers uvicorn
+MODEL_FORMAT = os.getenv("NER_MODEL_FORMAT", "joblib")
+# Chargement et préchauffage du modèle de démarrage dans un thread : le worker
+# accepte les connexions aussitôt et /ready répond 503 jusqu'à ce qu'il soit actif
+BACKGROUND_LOAD = os.getenv("NER_BACKGROUND_LOAD", "0") == "1"
+PREDICT_PATHS = {
+    "/predict",
+    "/predict-text",
+    "/predict-enhanced",
+    "/predict-batch",
+    "/predict-file",
+    "/predict-file-stream",
+}
+
+# Découpage des documents longs en phrases bornées, prédites par lots
+SENTENCE_END_TOKENS = {".", "!", "?"}
+MAX_SENTENCE_TOKENS = int(os.getenv("NER_MAX_SENTENCE_TOKENS", "128"))
+PREDICT_BATCH_SIZE = int(os.getenv("NER_PREDICT_BATCH_SIZE", "64"))
+
+# Nombre maximal de documents par appel à /predict-batch
+MAX_BATCH_DOCUMENTS = int(os.getenv("NER_MAX_BATCH_DOCUMENTS", "1000"))
+
+# Extraction PDF/DOCX dans un pool de processus borné
+EXTRACTION_WORKERS = int(os.getenv("NER_EXTRACTION_WORKERS", str(default_workers())))
+EXTRACTION_MAX_QUEUE = int(os.getenv("NER_EXTRACTION_MAX_QUEUE", "8"))
+EXTRACTION_PAGES_PER_TASK = int(os.getenv("NER_EXTRACTION_PAGES_PER_TASK", "8"))
+
+# Génération des rapports PDF en arrière-plan
+REPORT_WORKERS = int(os.getenv("NER_REPORT_WORKERS", "1"))
+REPORT_MAX_PENDING = int(os.getenv("NER_REPORT_MAX_PENDING", "16"))
+REPORT_CACHE_BYTES = int(os.getenv("NER_REPORT_CACHE_BYTES", "100000000"))
+
+# Micro-batching des requêtes texte concurrentes
+BATCH_MAX_SIZE = int(os.getenv("NER_BATCH_MAX_SIZE", "32"))
+BATCH_MAX_WAIT_MS = float(os.getenv("NER_BATCH_MAX_WAIT_MS", "5"))
+
+# Cache des prédictions par phrase (taille 0 pour désactiver)
+CACHE_MAX_ENTRIES = int(os.getenv("NER_CACHE_SIZE", "10000"))
+CACHE_TTL = float(os.getenv("NER_CACHE_TTL", "0")) or None
+CACHE_PATH = os.getenv("NER_CACHE_PATH") or None
+
+registry = ModelRegistry(MODEL_KEEP_VERSIONS)
+model_info: Dict = {}
+readiness: Dict = {"ready": False, "ready_seconds": None}
+prediction_cache = PredictionCache(CACHE_MAX_ENTRIES, CACHE_TTL, CACHE_PATH)
+# Métriques Prometheus (/metrics), désactivées par défaut
+metrics = MetricsRegistry(os.getenv("NER_METRICS", "0") == "1")
+extraction_pool = ExtractionPool(
+    EXTRACTION_WORKERS, EXTRACTION_MAX_QUEUE, EXTRACTION_PAGES_PER_TASK
+)
+report_jobs = ReportJobs(REPORT_WORKERS, REPORT_MAX_PENDING, REPORT_CACHE_BYTES)
 
 
 class PredictRequest(BaseModel):
@@ -62,6 +181,15 @@ class PredictResponse(BaseModel):
     labels: List[str]
 
 
+class PredictBatchRequest(BaseModel):
+    texts: List[str] = []
+    tokens: List[List[str]] = []
+
+
+class PredictBatchResponse(BaseModel):
+    results: List[PredictResponse]
+
+
 class EnhancedPredictResponse(BaseModel):
     tokens: List[str]
     labels: List[str]
@@ -69,194 +197,435 @@ class EnhancedPredictResponse(BaseModel):
     statistics: Dict
 
 
-def extract_entities(tokens: List[str], labels: List[str]) -> List[Dict]:
-    """Regroupe les tokens en entités complètes"""
-    entities = []
-    current_entity = None
-
-    for i, (token, label) in enumerate(zip(tokens, labels)):
-        if label.startswith("B-"):
-            if current_entity:
-                entities.append(current_entity)
-            current_entity = {
-                "text": token,
-                "label": label[2:],  # Enlève le préfixe B-
-                "start": i,
-                "end": i,
-                "tokens": [token],
-            }
-        elif (
-            label.startswith("I-")
-            and current_entity
-            and label[2:] == current_entity["label"]
-        ):
-            current_entity["text"] += " " + token
-            current_entity["end"] = i
-            current_entity["tokens"].append(token)
-        else:
-            if current_entity:
-                entities.append(current_entity)
-                current_entity = None
-
-    if current_entity:
-        entities.append(current_entity)
-
-    return entities
-
-
-def calculate_statistics(entities: List[Dict], total_tokens: int) -> Dict:
-    """Calcule les statistiques détaillées"""
-    if not entities:
-        return {}
-
-    # Comptage par type
-    label_counts = {}
-    for entity in entities:
-        label = entity["label"]
-        label_counts[label] = label_counts.get(label, 0) + 1
-
-    # Calcul des pourcentages
-    total_entities = len(entities)
-    stats = []
-    for label, count in label_counts.items():
-        # Calcul du nombre de tokens pour ce label
-        token_count = sum(len(e["tokens"]) for e in entities if e["label"] == label)
-        stats.append(
-            {
-                "label": label,
-                "count": count,
-                "percentage": (
-                    round((count / total_entities) * 100, 1)
-                    if total_entities > 0
-                    else 0
-                ),
-                "token_percentage": (
-                    round((token_count / total_tokens) * 100, 1)
-                    if total_tokens > 0
-                    else 0
-                ),
-            }
-        )
+def extract_entities(
+    tokens: List[str], labels: List[str], spans: Optional[TokenSpans] = None
+) -> List[Dict]:
+    """Regroupe les tokens en entités complètes (avec offsets caractères si spans)"""
+    entities, _ = decode_entities(tokens, labels, spans)
+    return [entity.as_dict() for entity in entities]
 
-    return {
-        "total_entities": total_entities,
-        "total_tokens": total_tokens,
-        "entity_density": (
-            round((total_entities / total_tokens) * 100, 1) if total_tokens > 0 else 0
-        ),
-        "by_type": stats,
-    }
 
-
-@app.on_event("startup")
-def load_model() -> None:
-    global model
-    if MODEL_PATH.exists():
-        model = joblib.load(MODEL_PATH)
-    elif FALLBACK_MODEL_PATH.exists():
-        model = joblib.load(FALLBACK_MODEL_PATH)
-
-
-def tokenize_text(text: str) -> List[str]:
-    """Tokenise le texte en excluant les virgules et ponctuation non pertinente"""
-    text = text.strip()
-    if not text:
-        return []
-    # Capture les mots, mais filtre les virgules et ponctuation basique
-    # Garde les ponctuations pertinentes (!, ?, ., :, ;) pour la structure
-    tokens = re.findall(r"\w+|[!?\.;:]", text, flags=re.UNICODE)
-    # Filtrer les tokens vides
-    return [t for t in tokens if t.strip()]
-
-
-def extract_text_from_pdf(file_path: Path) -> str:
-    """Extrait le texte d'un PDF avec encodage UTF-8 et gestion d'erreur"""
+def process_memory() -> Dict[str, float]:
+    """Mémoire du processus courant en Mo (RSS totale et pages de fichiers partagées)"""
+    fields = {"VmRSS": "rss_mb", "RssAnon": "rss_anon_mb", "RssFile": "rss_file_mb"}
+    memory: Dict[str, float] = {}
     try:
-        text_parts: List[str] = []
-        with pdfplumber.open(file_path) as pdf:
-            if not pdf.pages:
-                raise ValueError("Le PDF est vide")
-            for page in pdf.pages:
-                try:
-                    page_text = page.extract_text()
-                    if page_text:
-                        # Nettoyer et normaliser le texte
-                        page_text = page_text.encode("utf-8", errors="ignore").decode(
-                            "utf-8"
-                        )
-                        text_parts.append(page_text)
-                except Exception as e:
-                    print(f" Erreur extraction page: {e}")
-                    continue
-        return "\n".join(text_parts) if text_parts else "Aucun texte trouvé"
-    except Exception as e:
-        raise ValueError(f"Erreur PDF: {str(e)}")
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in fields:
+                    memory[fields[key]] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        memory["max_rss_mb"] = round(peak / 1024, 1)
+    return memory
+
+
+def warm_up(version: ModelVersion) -> None:
+    """Prédit quelques phrases avec une version avant qu'elle serve du trafic"""
+    predict_sentences(WARMUP_SENTENCES, version)
+
+
+def activate_version(version: ModelVersion) -> None:
+    """Bascule les prédictions sur `version` et met à jour cache et infos"""
+    registry.activate(version.version)
+    # Après la bascule : les prédictions de l'ancienne version en vol ne sont
+    # plus mises en cache (cf. PredictionCache.set)
+    prediction_cache.fingerprint = version.fingerprint
+    metrics.model_load_seconds.set(version.load_seconds)
+    model_info.clear()
+    model_info.update(
+        {
+            "version": version.version,
+            "path": str(version.source),
+            "type": version.model_type,
+            "format": version.format,
+            "feature_spec": version.feature_spec.as_dict(),
+            "pid": os.getpid(),
+            "load_seconds": round(version.load_seconds, 4),
+            "warmup_seconds": round(version.warmup_seconds, 4),
+        }
+    )
+
+
+def load_model_file(path: Path) -> None:
+    """Charge un modèle donné, le préchauffe et l'active"""
+    rss_before = process_memory()
+    version = registry.load(path, MODEL_FORMAT, warm_up)
+    activate_version(version)
+    model_info.update(
+        {"rss_before_load": rss_before, "rss_after_load": process_memory()}
+    )
+    print(
+        f" Modèle {version.source} ({version.model_type}, {version.version}) "
+        f"chargé en {version.load_seconds:.3f}s "
+        f"(pid {os.getpid()}, {model_info['rss_after_load']})"
+    )
+
+
+def default_model_path() -> Optional[Path]:
+    for path in (MODEL_PATH, FALLBACK_MODEL_PATH):
+        if path.exists():
+            return path
+    return None
+
+
+def load_startup_model() -> None:
+    """Charge le modèle de démarrage (s'il existe) puis marque le worker prêt"""
+    path = default_model_path()
+    if path is not None:
+        load_model_file(path)
+    ready_seconds = time.perf_counter() - STARTED_AT
+    readiness.update({"ready": True, "ready_seconds": round(ready_seconds, 4)})
+    metrics.ready_seconds.set(ready_seconds)
 
 
-def extract_text_from_docx(file_path: Path) -> str:
-    """Extrait le texte d'un fichier Word avec gestion d'erreurs"""
+def load_startup_model_in_background() -> None:
     try:
-        doc = Document(file_path)
+        load_startup_model()
     except Exception as e:
-        raise ValueError(f"Erreur lecture DOCX: {str(e)}")
-
-    # Normaliser l'encodage pour éviter les problèmes d'affichage
-    paragraphs = []
-    for p in doc.paragraphs:
-        if p.text:
-            try:
-                text = p.text.encode("utf-8", errors="ignore").decode("utf-8")
-                paragraphs.append(text)
-            except Exception as e:
-                print(f" Erreur paragraphe: {e}")
-                continue
-    return "\n".join(paragraphs) if paragraphs else "Aucun texte trouvé"
+        # Le worker reste non prêt ; l'erreur est exposée par /ready
+        print(f" Échec du chargement du modèle de démarrage : {e}")
+
 
+@app.on_event("startup")
+def load_model() -> None:
+    if BACKGROUND_LOAD:
+        threading.Thread(
+            target=load_startup_model_in_background, name="model-loader", daemon=True
+        ).start()
+    else:
+        load_startup_model()
+
+
+def split_sentences(
+    tokens: List[str], max_tokens: int = MAX_SENTENCE_TOKENS
+) -> Iterator[Tuple[int, int]]:
+    """Découpe les tokens en phrases et renvoie les offsets (début, fin)"""
+    start = 0
+    for i, token in enumerate(tokens):
+        if token in SENTENCE_END_TOKENS or i + 1 - start >= max_tokens:
+            yield start, i + 1
+            start = i + 1
+    if start < len(tokens):
+        yield start, len(tokens)
+
+
+def predict_sentences(
+    sentences: List[List[str]], version: Optional[ModelVersion] = None
+) -> List[List[str]]:
+    """Prédit les labels d'un lot de phrases en un seul appel au modèle"""
+    # Lue une seule fois : une bascule de modèle n'affecte pas un lot en cours
+    version = version or registry.active
+    if version is None:
+        return [["O"] * len(sent) for sent in sentences]
+
+    start = time.perf_counter()
+    model = version.model
+    if isinstance(model, CompiledLogReg):
+        with metrics.stage("predict"):
+            labels = model.predict_sentences(sentences)
+    else:
+        with metrics.stage("features"):
+            feats = [version.extract(sent) for sent in sentences]
+        with metrics.stage("predict"):
+            labels = [list(sent_labels) for sent_labels in model.predict(feats)]
+    version.record(time.perf_counter() - start, len(sentences))
+    return labels
+
+
+def predict_sentences_cached(sentences: List[List[str]]) -> List[List[str]]:
+    """Comme predict_sentences, en ne prédisant que les phrases absentes du cache"""
+    fingerprint = prediction_cache.fingerprint
+    results = [prediction_cache.get(sent) for sent in sentences]
+    missing = [i for i, sent_labels in enumerate(results) if sent_labels is None]
+    if missing:
+        predicted = predict_sentences([sentences[i] for i in missing])
+        for i, sent_labels in zip(missing, predicted):
+            prediction_cache.set(sentences[i], sent_labels, fingerprint)
+            results[i] = sent_labels
+    return results
+
+
+def predict_documents(
+    documents: List[List[str]], batch_size: int = PREDICT_BATCH_SIZE
+) -> List[List[str]]:
+    """Prédit plusieurs documents phrase par phrase, par lots de taille bornée"""
+    labels = [["O"] * len(tokens) for tokens in documents]
+    spans = (
+        (doc, start, end)
+        for doc, tokens in enumerate(documents)
+        for start, end in split_sentences(tokens)
+    )
+    while True:
+        batch = list(islice(spans, batch_size))
+        if not batch:
+            break
+        batch_labels = predict_sentences_cached(
+            [documents[doc][start:end] for doc, start, end in batch]
+        )
+        # Replace les labels de chaque phrase à ses offsets dans son document
+        for (doc, start, end), sent_labels in zip(batch, batch_labels):
+            labels[doc][start:end] = sent_labels
+    return labels
 
-def predict_tokens(tokens: List[str]) -> Tuple[List[str], List[str]]:
+
+def predict_document(
+    tokens: List[str], batch_size: int = PREDICT_BATCH_SIZE
+) -> Tuple[List[str], List[str]]:
+    """Prédit un document long phrase par phrase, par lots de taille bornée"""
     if not tokens:
         return [], []
-    if model is None:
-        return tokens, ["O"] * len(tokens)
+    return tokens, predict_documents([tokens], batch_size)[0]
 
-    if MODEL_TYPE == "logreg":
-        feats = [feat for feat in sent2features(tokens)]
-        labels = list(model.predict(feats))
-    else:
-        feats = [sent2features(tokens)]
-        labels = list(model.predict(feats)[0])
+
+batcher = MicroBatcher(predict_sentences, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS)
+
+
+def lookup_sentences(
+    tokens: List[str],
+) -> Tuple[List[List[str]], List[Optional[List[str]]]]:
+    """Découpe en phrases et cherche chacune dans le cache (hors de la boucle)"""
+    sentences = [tokens[start:end] for start, end in split_sentences(tokens)]
+    return sentences, [prediction_cache.get(sent) for sent in sentences]
+
+
+def store_sentences(
+    sentences: List[List[str]],
+    results: List[Optional[List[str]]],
+    predicted: Dict[int, List[str]],
+    fingerprint: str,
+) -> List[str]:
+    """Met en cache les phrases prédites et renvoie les labels du document"""
+    for i, sent_labels in predicted.items():
+        prediction_cache.set(sentences[i], sent_labels, fingerprint)
+        results[i] = sent_labels
+    return [label for sent_labels in results for label in sent_labels]
+
+
+async def predict_tokens_batched(tokens: List[str]) -> Tuple[List[str], List[str]]:
+    """Prédit phrase par phrase via le cache, puis le micro-batcher partagé
+
+    Découpage, hachage des clés de cache (et cache SQLite) tournent dans le
+    threadpool : la boucle ne fait qu'attendre le micro-batcher.
+    """
+    if not tokens:
+        return [], []
+    metrics.record_document("request", len(tokens))
+
+    fingerprint = prediction_cache.fingerprint
+    sentences, results = await run_in_threadpool(lookup_sentences, tokens)
+    missing = [i for i, sent_labels in enumerate(results) if sent_labels is None]
+    predicted = await asyncio.gather(*(batcher.predict(sentences[i]) for i in missing))
+    labels = await run_in_threadpool(
+        store_sentences, sentences, results, dict(zip(missing, predicted)), fingerprint
+    )
     return tokens, labels
 
 
+@app.on_event("shutdown")
+async def stop_batcher() -> None:
+    await batcher.stop()
+    extraction_pool.shutdown()
+    report_jobs.shutdown()
+
+
+@app.get("/batch-stats")
+def batch_stats() -> Dict:
+    """Statistiques de remplissage des lots du micro-batcher"""
+    return batcher.stats.as_dict()
+
+
+@app.get("/extraction-stats")
+def extraction_stats() -> Dict:
+    """Occupation du pool d'extraction de documents"""
+    return extraction_pool.stats()
+
+
+@app.get("/ready")
+def ready() -> JSONResponse:
+    """Sonde de disponibilité : 200 une fois le modèle de démarrage actif, 503 avant"""
+    active = registry.active
+    content = {
+        **readiness,
+        "version": active.version if active else None,
+        "loading": registry.loading,
+        "error": registry.last_error,
+    }
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=content)
+
+
+@app.get("/model-info")
+def get_model_info() -> Dict:
+    """Format, temps de chargement et mémoire du modèle dans ce worker"""
+    return {**model_info, "rss": process_memory()}
+
+
+class ReloadRequest(BaseModel):
+    path: Optional[str] = None  # relatif à models/, défaut : modèle de démarrage
+    activate: bool = True
+
+
+reload_task: Optional[asyncio.Task] = None
+
+
+async def reload_in_background(path: Path, activate: bool) -> None:
+    try:
+        version = await run_in_threadpool(registry.load, path, MODEL_FORMAT, warm_up)
+    except Exception as e:
+        print(f" Échec du rechargement de {path} : {e}")
+        return
+    if activate:
+        activate_version(version)
+        print(f" Modèle {version.source} ({version.version}) activé")
+
+
+@app.get("/model-registry")
+def get_model_registry() -> Dict:
+    """Versions chargées, version active et latences par version"""
+    return registry.info()
+
+
+@app.post("/model-registry/reload", status_code=202)
+async def reload_model(req: ReloadRequest) -> Dict:
+    """Charge et préchauffe un modèle en arrière-plan, puis l'active"""
+    if req.path is None:
+        path = default_model_path()
+        if path is None:
+            raise HTTPException(status_code=404, detail="Aucun modèle à charger")
+    else:
+        path = (models_path / req.path).resolve()
+        if not path.is_relative_to(models_path.resolve()) or not path.exists():
+            raise HTTPException(status_code=404, detail="Modèle introuvable")
+    if registry.loading is not None:
+        raise HTTPException(status_code=409, detail="Chargement déjà en cours")
+
+    # Référence gardée : la boucle ne garde qu'une référence faible aux tâches
+    global reload_task
+    reload_task = asyncio.get_running_loop().create_task(
+        reload_in_background(path, req.activate)
+    )
+    return {"status": "loading", "path": str(path)}
+
+
+@app.post("/model-registry/{version}/activate")
+def activate_model(version: str) -> Dict:
+    """Rebascule sur une version déjà chargée (retour arrière)"""
+    if version not in registry.versions:
+        raise HTTPException(status_code=404, detail="Version inconnue")
+    activate_version(registry.versions[version])
+    return registry.info()
+
+
+@app.get("/cache-stats")
+def cache_stats() -> Dict:
+    """Compteurs du cache de prédictions"""
+    return prediction_cache.stats()
+
+
+@app.get("/metrics")
+def get_metrics() -> Response:
+    """Compteurs, histogrammes de latence et temps par étape au format Prometheus"""
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Métriques désactivées")
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+def timed_stage(stage: str, fn: Callable, *args):
+    """Appelle fn(*args) chronométré comme étape `stage` (pour run_in_threadpool)"""
+    with metrics.stage(stage):
+        return fn(*args)
+
+
 @app.post("/predict", response_model=PredictResponse)
-def predict(req: PredictRequest) -> PredictResponse:
-    tokens, labels = predict_tokens(req.tokens)
+async def predict(req: PredictRequest) -> PredictResponse:
+    tokens, labels = await predict_tokens_batched(req.tokens)
     return PredictResponse(tokens=tokens, labels=labels)
 
 
 @app.post("/predict-text", response_model=PredictResponse)
-def predict_text(req: PredictTextRequest) -> PredictResponse:
-    tokens = tokenize_text(req.text)
-    tokens, labels = predict_tokens(tokens)
+async def predict_text(req: PredictTextRequest) -> PredictResponse:
+    tokens = await run_in_threadpool(timed_stage, "tokenize", tokenize_text, req.text)
+    tokens, labels = await predict_tokens_batched(tokens)
     return PredictResponse(tokens=tokens, labels=labels)
 
 
-@app.post("/predict-enhanced", response_model=EnhancedPredictResponse)
-def predict_enhanced(req: PredictTextRequest) -> EnhancedPredictResponse:
-    tokens = tokenize_text(req.text)
-    tokens, labels = predict_tokens(tokens)
-
-    # Extraire les entités structurées
-    entities = extract_entities(tokens, labels)
+def enhanced_entities(
+    tokens: List[str], labels: List[str], spans: TokenSpans
+) -> Tuple[List[Dict], Dict]:
+    """Entités structurées (avec offsets dans le texte) et statistiques en un passage"""
+    with metrics.stage("entities"):
+        entities, stats = decode_entities(tokens, labels, spans)
+        return [entity.as_dict() for entity in entities], stats
 
-    # Calculer les statistiques
-    stats = calculate_statistics(entities, len(tokens))
 
+@app.post("/predict-enhanced", response_model=EnhancedPredictResponse)
+async def predict_enhanced(req: PredictTextRequest) -> EnhancedPredictResponse:
+    # Tokenisation et décodage des entités dans le threadpool, hors de la boucle
+    spans = await run_in_threadpool(timed_stage, "tokenize", tokenize, req.text)
+    tokens, labels = await predict_tokens_batched(spans.tokens)
+    entities, stats = await run_in_threadpool(enhanced_entities, tokens, labels, spans)
     return EnhancedPredictResponse(
         tokens=tokens, labels=labels, entities=entities, statistics=stats
     )
 
 
+@app.post("/predict-batch", response_model=PredictBatchResponse)
+async def predict_batch(req: PredictBatchRequest) -> PredictBatchResponse:
+    """Tague plusieurs textes et/ou listes de tokens en un seul appel"""
+    if len(req.texts) + len(req.tokens) > MAX_BATCH_DOCUMENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Trop de documents (> {MAX_BATCH_DOCUMENTS}) dans le lot",
+        )
+
+    def run() -> List[PredictResponse]:
+        with metrics.stage("tokenize"):
+            documents = [tokenize_text(text) for text in req.texts] + req.tokens
+        for tokens in documents:
+            metrics.record_document("batch", len(tokens))
+        labels = predict_documents(documents)
+        return [
+            PredictResponse(tokens=tokens, labels=doc_labels)
+            for tokens, doc_labels in zip(documents, labels)
+        ]
+
+    return PredictBatchResponse(results=await run_in_threadpool(run))
+
+
+def upload_size(file: UploadFile) -> int:
+    """Taille du fichier importé, sans le lire"""
+    if file.size is not None:
+        return file.size
+    position = file.file.tell()
+    size = file.file.seek(0, io.SEEK_END)
+    file.file.seek(position)
+    return size
+
+
+async def read_upload(file: UploadFile, limit: int = MAX_UPLOAD_BYTES) -> bytearray:
+    """Lit le fichier par morceaux et abandonne dès que la limite est dépassée"""
+    content = bytearray()
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        content += chunk
+        if len(content) > limit:
+            raise HTTPException(status_code=413, detail=TOO_LARGE_DETAIL)
+    return content
+
+
+def predict_text_file(source) -> Tuple[List[str], List[str]]:
+    """Tague un .txt bloc par bloc à mesure de sa lecture"""
+    tokens: List[str] = []
+    labels: List[str] = []
+    for spans in iter_document_tokens(source, ".txt"):
+        block_tokens, block_labels = predict_document(spans.tokens)
+        tokens.extend(block_tokens)
+        labels.extend(block_labels)
+    return tokens, labels
+
+
 @app.post("/predict-file", response_model=PredictResponse)
 async def predict_file(file: UploadFile = File(...)) -> PredictResponse:
     if file is None:
@@ -268,154 +637,174 @@ async def predict_file(file: UploadFile = File(...)) -> PredictResponse:
             status_code=400, detail="Format non supporté. Utilisez PDF, DOCX ou TXT."
         )
 
-    # Lire le contenu du fichier
-    content = await file.read()
-
-    # Valider la taille (max 50 MB)
-    if len(content) > 50_000_000:
-        raise HTTPException(status_code=400, detail="Fichier trop volumineux (> 50MB)")
+    size = upload_size(file)
+    if size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=TOO_LARGE_DETAIL)
+    if metrics.enabled:
+        metrics.upload_bytes.observe(size, format=suffix.lstrip("."))
 
-    # Écrire dans un fichier temporaire
-    tmp_dir = Path(".tmp")
-    tmp_dir.mkdir(exist_ok=True)
-    tmp_path = tmp_dir / file.filename
+    if suffix == ".txt":
+        # Décodé, tokenisé et tagué bloc par bloc, sans construire le texte entier
+        tokens, labels = await run_in_threadpool(predict_text_file, file.file)
+        metrics.record_document("file", len(tokens))
+        return PredictResponse(tokens=tokens, labels=labels)
 
-    try:
-        tmp_path.write_bytes(content)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur écriture: {str(e)}")
+    content = await read_upload(file)
 
-    # Extraire le texte avec gestion d'erreur
+    # Extraire le texte hors de la boucle d'événements, sans fichier temporaire
     try:
-        if suffix == ".pdf":
-            text = extract_text_from_pdf(tmp_path)
-        elif suffix == ".docx":
-            text = extract_text_from_docx(tmp_path)
-        else:  # .txt
-            try:
-                text = content.decode("utf-8")
-            except UnicodeDecodeError:
-                text = content.decode("latin-1")
+        with metrics.stage("extraction"):
+            text = await extraction_pool.extract(content, suffix)
+    except ExtractionBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lecture fichier: {str(e)}")
-    finally:
-        # Nettoyer le fichier temporaire
-        try:
-            tmp_path.unlink()
-        except Exception:
-            pass
+    del content
 
-    tokens = tokenize_text(text)
-    tokens, labels = predict_tokens(tokens)
+    with metrics.stage("tokenize"):
+        tokens = await run_in_threadpool(tokenize_text, text)
+    metrics.record_document("file", len(tokens))
+    tokens, labels = await run_in_threadpool(predict_document, tokens)
     return PredictResponse(tokens=tokens, labels=labels)
 
 
-@app.post("/export-pdf")
-def export_pdf(data: dict):
-    """Génère un PDF avec les résultats"""
-    # Créer un buffer pour le PDF
-    buffer = io.BytesIO()
+def stream_predictions(
+    chunks: Iterator[TokenSpans], sse: bool = False
+) -> Iterator[str]:
+    """Tague chaque page/paragraphe dès son extraction et l'émet en NDJSON ou SSE"""
 
-    # Créer le document
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
+    def encode(payload: Dict) -> str:
+        line = json.dumps(payload, ensure_ascii=False)
+        return f"data: {line}\n\n" if sse else line + "\n"
 
-    # Contenu du PDF
-    content = []
-
-    # Titre
-    title_style = ParagraphStyle(
-        "CustomTitle", parent=styles["Heading1"], fontSize=24, spaceAfter=30
-    )
-    content.append(Paragraph("Rapport d'Analyse NER", title_style))
-
-    # Texte original
-    content.append(Paragraph("<b>Texte analysé :</b>", styles["Heading2"]))
-    content.append(Paragraph(data.get("text", ""), styles["Normal"]))
-    content.append(Spacer(1, 20))
-
-    # Statistiques
-    content.append(Paragraph("<b>Statistiques :</b>", styles["Heading2"]))
-    stats = data.get("statistics", {})
-
-    stats_data = [
-        ["Métrique", "Valeur"],
-        ["Tokens analysés", stats.get("total_tokens", 0)],
-        ["Entités détectées", stats.get("total_entities", 0)],
-        ["Densité d'entités", f"{stats.get('entity_density', 0)}%"],
-    ]
-
-    stats_table = Table(stats_data)
-    stats_table.setStyle(
-        TableStyle(
-            [
-                ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
-                ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
-                ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                ("FONTSIZE", (0, 0), (-1, 0), 14),
-                ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
-                ("BACKGROUND", (0, 1), (-1, -1), colors.beige),
-                ("GRID", (0, 0), (-1, -1), 1, colors.black),
-            ]
-        )
+    # Une entité à cheval sur deux morceaux est émise avec le second
+    aggregator = EntityAggregator()
+    try:
+        for index, spans in enumerate(chunks):
+            offset = aggregator.total_tokens
+            tokens, labels = predict_document(spans.tokens)
+            if not tokens:
+                continue
+            with metrics.stage("entities"):
+                chunk_entities = aggregator.feed(tokens, labels, spans)
+            yield encode(
+                {
+                    "chunk": index,
+                    "offset": offset,
+                    "tokens": tokens,
+                    "labels": labels,
+                    "entities": [entity.as_dict() for entity in chunk_entities],
+                }
+            )
+    except ValueError as e:
+        yield encode({"error": str(e)})
+        return
+
+    remaining = aggregator.flush()
+    metrics.record_document("stream", aggregator.total_tokens)
+    yield encode(
+        {
+            "done": True,
+            "total_tokens": aggregator.total_tokens,
+            "entities": [entity.as_dict() for entity in remaining],
+            "statistics": aggregator.statistics(),
+        }
     )
 
-    content.append(stats_table)
-    content.append(Spacer(1, 20))
-
-    # Détail par type
-    content.append(Paragraph("<b>Détail par type d'entité :</b>", styles["Heading2"]))
-
-    entities_by_type = data.get("entities_by_type", [])
-    if entities_by_type:
-        detail_data = [["Type", "Nombre", "Pourcentage"]]
-        for item in entities_by_type:
-            detail_data.append(
-                [
-                    item.get("label", ""),
-                    item.get("count", 0),
-                    f"{item.get('percentage', 0)}%",
-                ]
-            )
 
-        detail_table = Table(detail_data)
-        detail_table.setStyle(
-            TableStyle(
-                [
-                    ("BACKGROUND", (0, 0), (-1, 0), colors.darkblue),
-                    ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-                    ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-                    ("GRID", (0, 0), (-1, -1), 1, colors.black),
-                ]
-            )
+@app.post("/predict-file-stream")
+async def predict_file_stream(
+    file: UploadFile = File(...), format: str = "ndjson"
+) -> StreamingResponse:
+    """Variante streamée de /predict-file : un message par page ou paragraphe"""
+    suffix = Path(file.filename or "").suffix.lower()
+    if suffix not in {".pdf", ".docx", ".txt"}:
+        raise HTTPException(
+            status_code=400, detail="Format non supporté. Utilisez PDF, DOCX ou TXT."
         )
-        content.append(detail_table)
+    if format not in {"ndjson", "sse"}:
+        raise HTTPException(status_code=400, detail="Format de flux: ndjson ou sse")
+    if upload_size(file) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=TOO_LARGE_DETAIL)
+
+    sse = format == "sse"
+    if suffix == ".txt":
+        chunks = iter_document_tokens(file.file, suffix)
+    else:
+        # Extraction dans le pool (et sa file bornée) avant le début du flux :
+        # seuls tokenisation et tagging sont streamés page par page
+        content = await read_upload(file)
+        try:
+            with metrics.stage("extraction"):
+                parts = await extraction_pool.extract_parts(content, suffix)
+        except ExtractionBusyError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(
+                status_code=500, detail=f"Erreur lecture fichier: {str(e)}"
+            )
+        del content
+        chunks = tokenize_parts(parts)
 
-    # Liste des entités
-    content.append(Spacer(1, 20))
-    content.append(
-        Paragraph("<b>Liste des entités détectées :</b>", styles["Heading2"])
+    return StreamingResponse(
+        stream_predictions(chunks, sse),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
     )
 
-    entities = data.get("entities", [])
-    if entities:
-        for i, entity in enumerate(entities, 1):
-            content.append(
-                Paragraph(
-                    f"{i}. <b>{entity.get('text', '')}</b> [{entity.get('label', '')}]",
-                    styles["Normal"],
-                )
-            )
 
-    # Générer le PDF
-    doc.build(content)
-    buffer.seek(0)
+@app.post("/export-pdf", status_code=202)
+async def export_pdf(data: dict) -> Dict:
+    """Lance la génération du PDF des résultats en arrière-plan
+
+    Les jobs et les PDF générés sont gardés en mémoire du worker qui a reçu la
+    requête : le suivi et le téléchargement doivent arriver sur ce même
+    worker, donc servir ces endpoints avec un seul worker uvicorn (ou une
+    affinité de session), sinon ils répondent 404.
+    """
+    try:
+        job_id = report_jobs.submit(data)
+    except ReportBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {
+        **report_jobs.status(job_id),
+        "status_url": f"/export-pdf/{job_id}",
+        "download_url": f"/export-pdf/{job_id}/download",
+    }
+
+
+@app.get("/export-pdf/{job_id}")
+def export_pdf_status(job_id: str) -> Dict:
+    """État d'un job de génération de rapport (pending, done ou error)"""
+    status = report_jobs.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Rapport inconnu ou expiré")
+    return status
+
+
+@app.get("/export-pdf/{job_id}/download")
+def export_pdf_download(job_id: str) -> Response:
+    """Télécharge un rapport généré"""
+    status = report_jobs.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Rapport inconnu ou expiré")
+    if status["status"] == "error":
+        raise HTTPException(status_code=500, detail=status["error"])
+    pdf = report_jobs.result(job_id)
+    if pdf is None:
+        raise HTTPException(status_code=409, detail="Rapport en cours de génération")
 
     return Response(
-        content=buffer.getvalue(),
+        content=pdf,
         media_type="application/pdf",
         headers={"Content-Disposition": "attachment; filename=rapport_ner.pdf"},
     )
+
+
+@app.get("/report-stats")
+def report_stats() -> Dict:
+    """Jobs de rapports en cours et occupation du cache de PDF"""
+    return report_jobs.stats()
@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+ARRAYS_SUFFIX = ".arrays"
+VITERBI_BATCH_SIZE = 256
+
+FeatureSeq = Sequence[Dict[str, object]]
+
+
+class ArrayCRF:
+    """Linear-chain CRF weights stored in NumPy arrays, decoded with Viterbi.
+
+    ``attributes`` maps each crfsuite attribute name to a row of ``state``,
+    which holds its weight for every label; ``transitions[i, j]`` is the weight
+    of label ``i`` followed by label ``j``. The arrays can be memory mapped.
+    A quantized ``state`` (int8) comes with a per-label ``scale``, and
+    ``feature_spec_`` is the feature template the weights were trained with.
+    """
+
+    scale: Optional[np.ndarray] = None
+    feature_spec_: Optional[Dict[str, object]] = None
+
+    def __init__(
+        self,
+        labels: List[str],
+        attributes: List[str],
+        state: np.ndarray,
+        transitions: np.ndarray,
+        scale: Optional[np.ndarray] = None,
+        feature_spec: Optional[Dict[str, object]] = None,
+    ) -> None:
+        self.classes_ = list(labels)
+        self.attributes = list(attributes)
+        self.attribute_ids = {name: i for i, name in enumerate(self.attributes)}
+        self.state = state
+        self.transitions = np.asarray(transitions, dtype=np.float64)
+        self.scale = scale
+        self.feature_spec_ = feature_spec
+
+    @classmethod
+    def from_crf(cls, crf, dtype=np.float64) -> "ArrayCRF":
+        """Build the arrays from a fitted sklearn_crfsuite.CRF."""
+        labels = list(crf.classes_)
+        label_ids = {label: i for i, label in enumerate(labels)}
+
+        state_features = crf.state_features_
+        names = sorted({attr for attr, _ in state_features})
+        attr_ids = {attr: i for i, attr in enumerate(names)}
+
+        state = np.zeros((len(names), len(labels)), dtype=dtype)
+        for (attr, label), weight in state_features.items():
+            state[attr_ids[attr], label_ids[label]] = weight
+
+        transitions = np.zeros((len(labels), len(labels)), dtype=dtype)
+        for (label_from, label_to), weight in crf.transition_features_.items():
+            transitions[label_ids[label_from], label_ids[label_to]] = weight
+
+        return cls(
+            labels,
+            names,
+            state,
+            transitions,
+            feature_spec=getattr(crf, "feature_spec_", None),
+        )
+
+    def __getstate__(self) -> Dict[str, object]:
+        # The attribute index is rebuilt on load rather than pickled twice
+        state = self.__dict__.copy()
+        del state["attribute_ids"]
+        return state
+
+    def __setstate__(self, state: Dict[str, object]) -> None:
+        self.__dict__.update(state)
+        self.attribute_ids = {name: i for i, name in enumerate(self.attributes)}
+
+    def weights(self) -> np.ndarray:
+        """State weights as float64, dequantized if needed."""
+        state = np.asarray(self.state, dtype=np.float64)
+        return state * self.scale if self.scale is not None else state
+
+    def prune(self, threshold: float = 0.0, top_k: Optional[int] = None) -> "ArrayCRF":
+        """Drop state weights below ``threshold`` in magnitude or outside the
+        ``top_k`` largest, then the attributes left without any weight."""
+        state = self.weights()
+        magnitude = np.abs(state)
+        keep = magnitude >= max(threshold, np.finfo(np.float64).tiny)
+        if top_k is not None and top_k < int(keep.sum()):
+            cutoff = np.partition(magnitude[keep], -top_k)[-top_k]
+            keep &= magnitude >= cutoff
+        state = np.where(keep, state, 0.0)
+        rows = np.flatnonzero(keep.any(axis=1))
+        return ArrayCRF(
+            self.classes_,
+            [self.attributes[i] for i in rows],
+            state[rows],
+            self.transitions,
+            feature_spec=self.feature_spec_,
+        )
+
+    def quantize(self, dtype: str) -> "ArrayCRF":
+        """Store state weights as ``float16`` or as ``int8`` with a per-label scale."""
+        state = self.weights()
+        if dtype == "float16":
+            return ArrayCRF(
+                self.classes_,
+                self.attributes,
+                state.astype(np.float16),
+                self.transitions,
+                feature_spec=self.feature_spec_,
+            )
+        if dtype != "int8":
+            raise ValueError(f"Unsupported quantization {dtype!r}")
+        scale = np.abs(state).max(axis=0) / 127
+        scale[scale == 0] = 1.0
+        quantized = np.round(state / scale).astype(np.int8)
+        return ArrayCRF(
+            self.classes_,
+            self.attributes,
+            quantized,
+            self.transitions,
+            scale,
+            self.feature_spec_,
+        )
+
+    def save(self, path: str | Path) -> None:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "state.npy", self.state)
+        np.save(path / "transitions.npy", self.transitions)
+        if self.scale is not None:
+            np.save(path / "scale.npy", self.scale)
+        else:
+            (path / "scale.npy").unlink(missing_ok=True)
+        if self.feature_spec_ is not None:
+            (path / "feature_spec.json").write_text(
+                json.dumps(self.feature_spec_), encoding="utf-8"
+            )
+        else:
+            (path / "feature_spec.json").unlink(missing_ok=True)
+        for name, values in [
+            ("labels", self.classes_),
+            ("attributes", self.attributes),
+        ]:
+            (path / f"{name}.json").write_text(
+                json.dumps(values, ensure_ascii=False), encoding="utf-8"
+            )
+
+    @classmethod
+    def load(cls, path: str | Path, mmap: bool = True) -> "ArrayCRF":
+        path = Path(path)
+        mmap_mode = "r" if mmap else None
+        labels, attributes = (
+            json.loads((path / f"{name}.json").read_text(encoding="utf-8"))
+            for name in ("labels", "attributes")
+        )
+        scale_path = path / "scale.npy"
+        spec_path = path / "feature_spec.json"
+        return cls(
+            labels,
+            attributes,
+            np.load(path / "state.npy", mmap_mode=mmap_mode),
+            np.load(path / "transitions.npy", mmap_mode=mmap_mode),
+            np.load(scale_path) if scale_path.exists() else None,
+            (
+                json.loads(spec_path.read_text(encoding="utf-8"))
+                if spec_path.exists()
+                else None
+            ),
+        )
+
+    def emissions(self, X: Sequence[FeatureSeq]) -> np.ndarray:
+        """State scores of every position, padded to (sentences, max length, labels).
+
+        Feature dicts follow python-crfsuite: string values become the
+        ``key:value`` attribute with weight 1, numbers and booleans keep the
+        key and are used as the weight.
+        """
+        attribute_ids = self.attribute_ids
+        max_len = max(len(xseq) for xseq in X)
+
+        positions: List[int] = []
+        rows: List[int] = []
+        values: List[float] = []
+        for s, xseq in enumerate(X):
+            offset = s * max_len
+            for t, item in enumerate(xseq):
+                for key, value in item.items():
+                    if isinstance(value, str):
+                        row = attribute_ids.get(f"{key}:{value}")
+                        value = 1.0
+                    elif isinstance(value, dict):
+                        for sub_key, sub_value in value.items():
+                            row = attribute_ids.get(f"{key}:{sub_key}")
+                            if row is not None and sub_value:
+                                positions.append(offset + t)
+                                rows.append(row)
+                                values.append(float(sub_value))
+                        continue
+                    else:
+                        row = attribute_ids.get(key)
+                    if row is not None and value:
+                        positions.append(offset + t)
+                        rows.append(row)
+                        values.append(float(value))
+
+        scores = np.zeros((len(X) * max_len, len(self.classes_)), dtype=np.float64)
+        if rows:
+            weights = np.asarray(self.state[rows], dtype=np.float64)
+            weights *= np.asarray(values)[:, None]
+            if self.scale is not None:
+                weights *= self.scale
+            # Positions are sorted: sum the rows of each position in one pass
+            present, starts = np.unique(positions, return_index=True)
+            scores[present] = np.add.reduceat(weights, starts, axis=0)
+        return scores.reshape(len(X), max_len, len(self.classes_))
+
+    def viterbi(self, scores: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        """Best label ids of a padded batch, one Viterbi step for all sentences."""
+        n_sents, max_len, n_labels = scores.shape
+        backpointers = np.zeros((n_sents, max_len, n_labels), dtype=np.intp)
+
+        best = scores[:, 0]
+        for t in range(1, max_len):
+            candidates = best[:, :, None] + self.transitions
+            backpointers[:, t] = candidates.argmax(axis=1)
+            step = np.take_along_axis(candidates, backpointers[:, t, None, :], axis=1)
+            active = (t < lengths)[:, None]
+            best = np.where(active, step[:, 0] + scores[:, t], best)
+
+        last = best.argmax(axis=1)
+        paths = np.zeros((n_sents, max_len), dtype=np.intp)
+        current = last
+        sents = np.arange(n_sents)
+        for t in range(max_len - 1, -1, -1):
+            current = np.where(t == lengths - 1, last, current)
+            paths[:, t] = current
+            if t > 0:
+                current = backpointers[sents, t, current]
+        return paths
+
+    def predict(
+        self, X: Sequence[FeatureSeq], batch_size: int = VITERBI_BATCH_SIZE
+    ) -> List[List[str]]:
+        # Sentences of similar length are decoded together to limit padding
+        order = sorted(range(len(X)), key=lambda i: len(X[i]))
+        preds: List[List[str]] = [[] for _ in X]
+        for start in range(0, len(order), batch_size):
+            batch = [i for i in order[start : start + batch_size] if len(X[i])]
+            if not batch:
+                continue
+            lengths = np.array([len(X[i]) for i in batch])
+            paths = self.viterbi(self.emissions([X[i] for i in batch]), lengths)
+            for i, path, length in zip(batch, paths, lengths):
+                preds[i] = [self.classes_[j] for j in path[:length]]
+        return preds
+
+    def predict_single(self, xseq: FeatureSeq) -> List[str]:
+        return self.predict([xseq])[0]
+
+
+def arrays_path(model_path: str | Path) -> Path:
+    """Directory holding the array export of a joblib model."""
+    return Path(model_path).with_suffix(ARRAYS_SUFFIX)
+
+
+def export_arrays(crf, output: str | Path) -> ArrayCRF:
+    model = crf if isinstance(crf, ArrayCRF) else ArrayCRF.from_crf(crf)
+    model.save(output)
+    return model
+
+
+def is_fresh(model_path: str | Path) -> bool:
+    """Whether the array export exists and is newer than the joblib model."""
+    arrays = arrays_path(model_path)
+    return (
+        arrays.exists() and arrays.stat().st_mtime >= Path(model_path).stat().st_mtime
+    )
+
+
+def ensure_arrays(model_path: str | Path) -> Path:
+    """Export the model once so that every worker process mmaps the same files.
+
+    Workers racing on a missing or stale export each write a private directory
+    and rename it into place; the first rename wins and the others are dropped.
+    """
+    arrays = arrays_path(model_path)
+    if is_fresh(model_path):
+        return arrays
+
+    import joblib
+
+    tmp = arrays.with_name(f"{arrays.name}.tmp-{os.getpid()}")
+    export_arrays(joblib.load(model_path), tmp)
+    if arrays.exists() and not is_fresh(model_path):
+        shutil.rmtree(arrays, ignore_errors=True)
+    try:
+        os.rename(tmp, arrays)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return arrays
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Export a CRF model to arrays")
+    parser.add_argument("model_path", type=Path, help="Trained CRF (joblib)")
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="Output directory (default: <model>.arrays next to the model)",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    import joblib
+
+    args = parse_args()
+    output: Optional[Path] = args.output or arrays_path(args.model_path)
+    model = export_arrays(joblib.load(args.model_path), output)
+    print(
+        f"{len(model.attributes)} attributes x {len(model.classes_)} labels "
+        f"exported to {output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Callable, Dict, List, Optional, Tuple
+
+PredictFn = Callable[[List[List[str]]], List[List[str]]]
+
+
+class BatchStats:
+    """Compteurs de remplissage des lots envoyés au modèle"""
+
+    def __init__(self, max_batch_size: int) -> None:
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.sentences = 0
+        self.tokens = 0
+        self.largest_batch = 0
+        self.size_histogram: Dict[int, int] = {}
+
+    def record(self, sentences: List[List[str]]) -> None:
+        size = len(sentences)
+        self.batches += 1
+        self.sentences += size
+        self.tokens += sum(len(sent) for sent in sentences)
+        self.largest_batch = max(self.largest_batch, size)
+        self.size_histogram[size] = self.size_histogram.get(size, 0) + 1
+
+    def as_dict(self) -> Dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "batches": self.batches,
+            "sentences": self.sentences,
+            "tokens": self.tokens,
+            "largest_batch": self.largest_batch,
+            "mean_batch_size": (
+                round(self.sentences / self.batches, 2) if self.batches else 0
+            ),
+            "mean_fill_ratio": (
+                round(self.sentences / (self.batches * self.max_batch_size), 3)
+                if self.batches
+                else 0
+            ),
+            "size_histogram": dict(sorted(self.size_histogram.items())),
+        }
+
+
+class MicroBatcher:
+    """Regroupe les phrases de requêtes concurrentes en un seul appel au modèle.
+
+    Les phrases sont collectées pendant au plus ``max_wait_ms`` millisecondes ou
+    jusqu'à ``max_batch_size`` phrases, puis ``predict_fn`` est appelé une fois
+    sur le lot dans le threadpool, un lot après l'autre. ``predict_fn`` peut
+    tout de même tourner en même temps que les endpoints synchrones.
+
+    Le batcher n'est pas thread-safe : sa file et ses futures appartiennent à
+    la boucle asyncio qui l'a démarré, et ``predict`` doit être attendu depuis
+    cette boucle. Depuis un autre thread, passer par
+    ``asyncio.run_coroutine_threadsafe(batcher.predict(tokens), loop)``.
+    """
+
+    def __init__(
+        self,
+        predict_fn: PredictFn,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ) -> None:
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.stats = BatchStats(self.max_batch_size)
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            if self._task.get_loop() is not asyncio.get_running_loop():
+                raise RuntimeError("MicroBatcher démarré sur une autre boucle asyncio")
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._queue = None
+
+    async def predict(self, tokens: List[str]) -> List[str]:
+        """Prédit les labels d'une phrase en l'ajoutant au prochain lot"""
+        if not tokens:
+            return []
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((tokens, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[List[str], asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            sentences = [tokens for tokens, _ in batch]
+            try:
+                labels = await loop.run_in_executor(None, self.predict_fn, sentences)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.stats.record(sentences)
+            for (_, future), sent_labels in zip(batch, labels):
+                if not future.done():
+                    future.set_result(list(sent_labels))
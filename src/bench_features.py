@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import joblib
+
+from src.conll import read_conll
+from src.features import (
+    FeatureSpec,
+    compile_features,
+    sent2features,
+    sent2features_cached,
+    word_shape,
+)
+from src.gazetteer import load_gazetteer
+
+Extractor = Callable[[List[str]], List[Dict[str, object]]]
+
+
+def time_extractor(
+    extractor: Extractor, sentences: List[List[str]], repeat: int
+) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for sent in sentences:
+            extractor(sent)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark feature extraction")
+    parser.add_argument(
+        "--data",
+        type=Path,
+        default=Path("data") / "fr_dev.conll",
+        help="CoNLL file to featurize",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Number of timed runs (best run is reported)",
+    )
+    parser.add_argument(
+        "--model-path",
+        type=Path,
+        default=None,
+        help="Optional CRF model used to check that predictions are identical",
+    )
+    parser.add_argument(
+        "--gazetteer",
+        type=Path,
+        default=None,
+        help="Optional gazetteer (src.gazetteer) to also time its match features",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    sentences, _ = read_conll(args.data)
+    n_tokens = sum(len(sent) for sent in sentences)
+
+    reference = [sent2features(sent) for sent in sentences]
+    cached = [sent2features_cached(sent) for sent in sentences]
+    assert reference == cached, "sent2features_cached differs from sent2features"
+
+    baseline = time_extractor(sent2features, sentences, args.repeat)
+    word_shape.cache_clear()
+    cold = time_extractor(sent2features_cached, sentences, 1)
+    warm = time_extractor(sent2features_cached, sentences, args.repeat)
+    timings = [
+        ("sent2features", baseline),
+        ("sent2features_cached (cold)", cold),
+        ("sent2features_cached (warm)", warm),
+    ]
+    if args.gazetteer is not None:
+        gazetteer = load_gazetteer(args.gazetteer)
+        extract = compile_features(FeatureSpec(gazetteer=True), gazetteer)
+        timings.append(
+            ("+ gazetteer (warm)", time_extractor(extract, sentences, args.repeat))
+        )
+
+    print(f"{len(sentences)} sentences, {n_tokens} tokens")
+    for name, elapsed in timings:
+        print(
+            f"{name:<30} {elapsed * 1000:8.1f} ms  "
+            f"{n_tokens / elapsed:10.0f} tokens/s  x{baseline / elapsed:.2f}"
+        )
+    print(word_shape.cache_info())
+
+    if args.model_path is not None:
+        model = joblib.load(args.model_path)
+        same = list(model.predict(reference)) == list(model.predict(cached))
+        print("Identical predictions:", same)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,462 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import joblib
+
+from src.array_crf import ensure_arrays
+from src.conll import read_conll
+from src.evaluate import predict_crf
+from src.features import sent2features, sent2features_cached, word_shape
+from src.gazetteer import gazetteer_path
+from src.train import train_crf, train_logreg
+
+DEFAULT_SIZES = [100, 1_000, 10_000]
+DEFAULT_TOLERANCE = 0.10
+STAGES = [
+    "read_conll",
+    "sent2features",
+    "sent2features_cached",
+    "train_crf",
+    "train_logreg",
+    "predict_crf",
+    "predict_enhanced",
+    "cold_start",
+]
+ROOT = Path(__file__).resolve().parents[1]
+
+# Run in a fresh interpreter: seconds from its start to `import src.api`, to the
+# startup model being ready, and to the first /predict-text answer
+COLD_START_SCRIPT = """
+import time
+start = time.perf_counter()
+import asyncio, json, sys
+from pathlib import Path
+from src import api
+imported = time.perf_counter()
+api.MODEL_PATH = api.FALLBACK_MODEL_PATH = Path(sys.argv[1])
+
+async def main():
+    api.load_model()
+    while not api.readiness["ready"]:
+        await asyncio.sleep(0.001)
+    ready = time.perf_counter()
+    await api.predict_text(api.PredictTextRequest(text="Victor Hugo est né à Besançon."))
+    predicted = time.perf_counter()
+    await api.stop_batcher()
+    print(json.dumps({"import": imported - start, "ready": ready - start,
+                      "first_prediction": predicted - start}))
+
+asyncio.run(main())
+"""
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def peak_memory_mb(run: Callable[[], object]) -> float:
+    """Peak Python allocation of one extra (untimed) run, in MB."""
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1e6, 2)
+
+
+def measure(
+    run: Callable[[], List[float]], items: int, unit: str, memory: bool = True
+) -> Dict[str, float]:
+    """Time `run` (which returns per-call latencies) and summarize it."""
+    start = time.perf_counter()
+    latencies = run()
+    elapsed = time.perf_counter() - start
+    result = {
+        "items": items,
+        "unit": unit,
+        "seconds": round(elapsed, 4),
+        "throughput": round(items / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+    if memory:
+        result["peak_mb"] = peak_memory_mb(run)
+    return result
+
+
+def timed_calls(fn: Callable, args: Sequence) -> List[float]:
+    latencies = []
+    for arg in args:
+        start = time.perf_counter()
+        fn(arg)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def synthetic_documents(
+    sentences: List[List[str]], sizes: Sequence[int], seed: int = 0
+) -> Dict[int, str]:
+    """Documents of roughly `size` tokens stitched from random dev sentences."""
+    rng = random.Random(seed)
+    documents = {}
+    for size in sizes:
+        tokens: List[str] = []
+        while len(tokens) < size:
+            tokens.extend(rng.choice(sentences))
+        documents[size] = " ".join(tokens[:size])
+    return documents
+
+
+def bench_predict_enhanced(
+    model_path: Path, texts: List[str], documents: Dict[int, str], repeat: int
+) -> Dict[str, Dict[str, float]]:
+    """Time /predict-enhanced through an in-process ASGI client (no network)."""
+    import httpx
+
+    from src import api
+    from src.cache import PredictionCache
+
+    # Every request must reach the model: no prediction cache
+    api.prediction_cache = PredictionCache(max_entries=0)
+    api.load_model_file(model_path)
+    transport = httpx.ASGITransport(app=api.app)
+
+    async def post_all(payloads: List[str]) -> List[float]:
+        latencies = []
+        try:
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://bench"
+            ) as client:
+                for text in payloads:
+                    start = time.perf_counter()
+                    response = await client.post(
+                        "/predict-enhanced", json={"text": text}
+                    )
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+        finally:
+            # The batcher task belongs to this event loop: stop it before it closes
+            await api.batcher.stop()
+        return latencies
+
+    def run(payloads: List[str]) -> Callable[[], List[float]]:
+        return lambda: asyncio.run(post_all(payloads))
+
+    results = {"predict_enhanced[dev]": measure(run(texts), len(texts), "requests")}
+    for size, text in documents.items():
+        results[f"predict_enhanced[{size}]"] = measure(
+            run([text] * repeat), repeat * size, "tokens"
+        )
+    return results
+
+
+def import_profile(top: int = 10) -> List[Tuple[str, float]]:
+    """Modules with the largest cumulative import time under `import src.api`."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import src.api"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = []
+    for line in process.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[1].strip().isdigit():
+            modules.append((fields[2].strip(), int(fields[1]) / 1000))
+    return sorted(modules, key=lambda item: -item[1])[:top]
+
+
+def stage_model(model_path: Path, directory: Path) -> Path:
+    """Copy of the model (and its gazetteer) in `directory`, with its array export.
+
+    The export is written next to the copy, never next to the user's model.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    staged = directory / model_path.name
+    shutil.copy2(model_path, staged)
+    if gazetteer_path(model_path).is_dir():
+        shutil.copytree(gazetteer_path(model_path), gazetteer_path(staged))
+    ensure_arrays(staged)
+    return staged
+
+
+def bench_cold_start(
+    model_path: Path, model_format: str, workers: int, background: bool
+) -> Dict[str, float]:
+    """Start `workers` fresh API processes one after the other and time each."""
+    env = {
+        **os.environ,
+        "NER_MODEL_FORMAT": model_format,
+        "NER_BACKGROUND_LOAD": "1" if background else "0",
+    }
+    timings: List[Dict[str, float]] = []
+
+    def run() -> List[float]:
+        latencies = []
+        for _ in range(workers):
+            start = time.perf_counter()
+            process = subprocess.run(
+                [sys.executable, "-c", COLD_START_SCRIPT, str(model_path)],
+                cwd=ROOT,
+                env=env,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            timings.append(json.loads(process.stdout.strip().splitlines()[-1]))
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    result = measure(run, workers, "workers", memory=False)
+    for key in ("import", "ready", "first_prediction"):
+        values = [timing[key] for timing in timings]
+        result[f"{key}_p50_ms"] = round(percentile(values, 50) * 1000, 1)
+    return result
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    stages = set(args.stages)
+    results: Dict[str, Dict[str, float]] = {}
+
+    sentences, labels = read_conll(args.data)
+    n_tokens = sum(len(sent) for sent in sentences)
+    print(f"{len(sentences)} sentences, {n_tokens} tokens", file=sys.stderr)
+
+    if "read_conll" in stages:
+        results["read_conll"] = measure(
+            lambda: timed_calls(read_conll, [args.data] * args.repeat),
+            args.repeat * len(sentences),
+            "sentences",
+        )
+    if "sent2features" in stages:
+        results["sent2features"] = measure(
+            lambda: timed_calls(sent2features, sentences), n_tokens, "tokens"
+        )
+    if "sent2features_cached" in stages:
+        word_shape.cache_clear()
+        results["sent2features_cached"] = measure(
+            lambda: timed_calls(sent2features_cached, sentences), n_tokens, "tokens"
+        )
+
+    train_sent = sentences[: args.train_sentences]
+    train_labels = labels[: args.train_sentences]
+    train_tokens = sum(len(sent) for sent in train_sent)
+    crf = None
+    if "train_crf" in stages:
+        holder = {}
+
+        def fit_crf() -> List[float]:
+            start = time.perf_counter()
+            holder["model"] = train_crf(
+                train_sent, train_labels, max_iterations=args.crf_iterations
+            )
+            return [time.perf_counter() - start]
+
+        results["train_crf"] = measure(
+            fit_crf, train_tokens, "tokens", memory=args.train_memory
+        )
+        crf = holder["model"]
+    if "train_logreg" in stages:
+        results["train_logreg"] = measure(
+            lambda: timed_calls(lambda _: train_logreg(train_sent, train_labels), [0]),
+            train_tokens,
+            "tokens",
+            memory=args.train_memory,
+        )
+
+    model_path: Optional[Path] = args.model_path
+    with tempfile.TemporaryDirectory() as tmp:
+        if model_path is None and stages & {
+            "predict_crf",
+            "predict_enhanced",
+            "cold_start",
+        }:
+            if crf is None:
+                crf = train_crf(
+                    train_sent, train_labels, max_iterations=args.crf_iterations
+                )
+            model_path = Path(tmp) / "ner_model.joblib"
+            joblib.dump(crf, model_path)
+
+        if "predict_crf" in stages:
+            model = joblib.load(model_path)
+            results["predict_crf"] = measure(
+                lambda: timed_calls(lambda sent: predict_crf(model, [sent]), sentences),
+                n_tokens,
+                "tokens",
+            )
+        if "predict_enhanced" in stages:
+            texts = [" ".join(sent) for sent in sentences[: args.requests]]
+            documents = synthetic_documents(sentences, args.sizes)
+            results.update(
+                bench_predict_enhanced(model_path, texts, documents, args.repeat)
+            )
+        if "cold_start" in stages:
+            for name, ms in import_profile():
+                print(f"import {name:<40} {ms:8.1f} ms", file=sys.stderr)
+            cold_model = stage_model(model_path, Path(tmp) / "cold_start")
+            for model_format in ("joblib", "arrays"):
+                results[f"cold_start[{model_format}]"] = bench_cold_start(
+                    cold_model, model_format, args.repeat, args.background_load
+                )
+    return results
+
+
+def compare(
+    current: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    tolerance: float,
+) -> List[str]:
+    """Print a side-by-side table and return the regressed stages."""
+    regressions = []
+    print(f"{'stage':<28} {'throughput':>12} {'p99 ms':>12} {'peak MB':>12}")
+    for name, result in current.items():
+        ref = baseline.get(name)
+        if ref is None:
+            print(f"{name:<28} {'(new)':>12}")
+            continue
+        speed = result["throughput"] / ref["throughput"]
+        p99 = result["p99_ms"] / ref["p99_ms"] if ref["p99_ms"] else 1.0
+        line = f"{name:<28} {speed:>11.2f}x {p99:>11.2f}x"
+        if "peak_mb" in result and ref.get("peak_mb"):
+            line += f" {result['peak_mb'] / ref['peak_mb']:>11.2f}x"
+        if speed < 1 - tolerance or p99 > 1 + tolerance:
+            regressions.append(name)
+            line += "  REGRESSION"
+        print(line)
+    return regressions
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark featurization, training, inference and HTTP latency"
+    )
+    parser.add_argument(
+        "--data",
+        type=Path,
+        default=Path("data") / "fr_dev.conll",
+        help="CoNLL file used for every stage",
+    )
+    parser.add_argument(
+        "--stages",
+        nargs="+",
+        choices=STAGES,
+        default=STAGES,
+        help="Stages to run (default: all)",
+    )
+    parser.add_argument(
+        "--model-path",
+        type=Path,
+        default=None,
+        help="CRF model for the predict stages (default: the one trained here)",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help="Token counts of the synthetic documents sent to /predict-enhanced",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Runs of read_conll, requests per synthetic document and "
+        "cold-started API processes",
+    )
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=500,
+        help="Number of dev sentences sent one by one to /predict-enhanced",
+    )
+    parser.add_argument(
+        "--train-sentences",
+        type=int,
+        default=2_000,
+        help="Sentences used by the training stages",
+    )
+    parser.add_argument(
+        "--crf-iterations",
+        type=int,
+        default=20,
+        help="L-BFGS iterations of the benchmarked CRF",
+    )
+    parser.add_argument(
+        "--train-memory",
+        action="store_true",
+        help="Also measure peak memory of training (runs each fit twice)",
+    )
+    parser.add_argument(
+        "--background-load",
+        action="store_true",
+        help="Cold start with NER_BACKGROUND_LOAD=1",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="Write the results to this JSON baseline",
+    )
+    parser.add_argument(
+        "--compare",
+        type=Path,
+        default=None,
+        help="Baseline JSON to compare against (exit code 1 on regression)",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="Allowed relative slowdown before a stage counts as a regression",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    results = run_benchmarks(args)
+    report = {
+        "meta": {
+            "data": str(args.data),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+    print(json.dumps(results, indent=2))
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline written to {args.output}", file=sys.stderr)
+
+    if args.compare is not None:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
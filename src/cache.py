@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+LABEL_SEP = "\t"
+
+
+def file_fingerprint(path: str | Path) -> str:
+    """Empreinte du contenu d'un fichier ou dossier modèle (sha256 tronqué)"""
+    path = Path(path)
+    files = (
+        sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+    )
+
+    digest = hashlib.sha256()
+    for file in files:
+        digest.update(file.name.encode("utf-8"))
+        with file.open("rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+class SqliteCacheBackend:
+    """Stockage sur disque partagé entre les workers uvicorn d'une même machine"""
+
+    def __init__(self, path: str | Path, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._inserts = 0
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, timeout=5)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "key TEXT PRIMARY KEY, labels TEXT, expires REAL, created REAL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS predictions_created "
+                "ON predictions (created)"
+            )
+
+    def get(self, key: str) -> Optional[Tuple[float, List[str]]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT expires, labels FROM predictions WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1].split(LABEL_SEP)
+
+    def set(self, key: str, expires: float, labels: List[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?)",
+                (key, LABEL_SEP.join(labels), expires, time.time()),
+            )
+            self._inserts += 1
+            if self._inserts % 1000 == 0:
+                self._trim()
+
+    def _trim(self) -> None:
+        self._conn.execute("DELETE FROM predictions WHERE expires < ?", (time.time(),))
+        self._conn.execute(
+            "DELETE FROM predictions WHERE key IN ("
+            "SELECT key FROM predictions ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM predictions")
+
+
+class PredictionCache:
+    """Cache LRU des labels prédits par phrase, avec TTL optionnel.
+
+    La clé est un hash des tokens de la phrase et de l'empreinte du modèle
+    chargé : changer de modèle invalide donc toutes les entrées. Avec
+    ``path``, un cache SQLite sur disque sert de second niveau partagé entre
+    processus.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        ttl: Optional[float] = None,
+        path: Optional[str | Path] = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.fingerprint = ""
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, Tuple[float, List[str]]] = OrderedDict()
+        # Appelé depuis le threadpool (endpoints synchrones) et la boucle asyncio
+        self._lock = threading.Lock()
+        self.backend = (
+            SqliteCacheBackend(path, max_entries * 10)
+            if path and max_entries > 0
+            else None
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def key(self, tokens: List[str]) -> str:
+        digest = hashlib.blake2b(self.fingerprint.encode("utf-8"), digest_size=16)
+        # Préfixe de longueur : ["a\x00b"] et ["a", "b"] n'ont pas la même clé
+        for token in tokens:
+            data = token.encode("utf-8", errors="surrogatepass")
+            digest.update(len(data).to_bytes(4, "little"))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def get(self, tokens: List[str]) -> Optional[List[str]]:
+        if not self.enabled or not tokens:
+            return None
+
+        key = self.key(tokens)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+        # Lecture SQLite hors du verrou : elle a le sien
+        from_backend = entry is None and self.backend is not None
+        if from_backend:
+            entry = self.backend.get(key)
+
+        with self._lock:
+            if entry is None or entry[0] < now:
+                self.misses += 1
+                return None
+            if from_backend:
+                self._store(key, entry)
+            elif key in self._entries:
+                # L'entrée a pu être évincée par un autre thread entre-temps
+                self._entries.move_to_end(key)
+            self.hits += 1
+        return entry[1]
+
+    def set(
+        self, tokens: List[str], labels: List[str], fingerprint: Optional[str] = None
+    ) -> None:
+        """Ignoré si le modèle a changé depuis `fingerprint` (lu avant prédiction)"""
+        if not self.enabled or not tokens:
+            return
+        if fingerprint is not None and fingerprint != self.fingerprint:
+            return
+
+        key = self.key(tokens)
+        expires = time.time() + self.ttl if self.ttl else float("inf")
+        with self._lock:
+            self._store(key, (expires, list(labels)))
+        if self.backend is not None:
+            self.backend.set(key, expires, labels)
+
+    def _store(self, key: str, entry: Tuple[float, List[str]]) -> None:
+        # Appelant : verrou tenu
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits, misses, entries = self.hits, self.misses, len(self._entries)
+        lookups = hits + misses
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "shared": self.backend is not None,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0,
+            "model_fingerprint": self.fingerprint,
+        }
@@ -1,42 +1,89 @@
 from __future__ import annotations
 
+import gzip
+import lzma
+from itertools import islice
 from pathlib import Path
-from typing import List, Tuple
+from typing import IO, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 
 
-def read_conll(path: str | Path) -> Tuple[List[List[str]], List[List[str]]]:
-    """Read a CoNLL-style file and return token and label sequences.
+class Sentence(NamedTuple):
+    id: Optional[str]
+    tokens: List[str]
+    labels: List[str]
+
+
+def open_conll(path: str | Path) -> IO[str]:
+    """Open a CoNLL file as text, transparently decompressing .gz and .xz files."""
+    path = Path(path)
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8")
+    if path.suffix == ".xz":
+        return lzma.open(path, "rt", encoding="utf-8")
+    return path.open(encoding="utf-8")
+
+
+def iter_conll(path: str | Path) -> Iterator[Sentence]:
+    """Lazily yield the sentences of a CoNLL-style file, one at a time.
 
     Each non-empty line is expected to contain at least 2 columns with the label
-    in the last column. Sentences are separated by blank lines.
+    in the last column. Sentences are separated by blank lines. MultiCoNER
+    header lines (``# id <sentence id> domain=fr``) are not tokens: the id is
+    attached to the following sentence and other ``#`` comment lines are skipped.
     """
-    sentences: List[List[str]] = []
-    labels: List[List[str]] = []
-
+    sent_id: Optional[str] = None
     sentence: List[str] = []
     sentence_labels: List[str] = []
 
-    with Path(path).open(encoding="utf-8") as f:
+    with open_conll(path) as f:
         for line in f:
             line = line.strip()
 
             if not line:
                 if sentence:
-                    sentences.append(sentence)
-                    labels.append(sentence_labels)
+                    yield Sentence(sent_id, sentence, sentence_labels)
                     sentence = []
                     sentence_labels = []
+                sent_id = None
                 continue
 
             parts = line.split()
-            token = parts[0]
-            ner_tag = parts[-1]
+            if parts[0] == "#" and len(parts) > 1 and parts[1] != "_":
+                if parts[1] == "id" and len(parts) > 2:
+                    if sentence:
+                        yield Sentence(sent_id, sentence, sentence_labels)
+                        sentence = []
+                        sentence_labels = []
+                    sent_id = parts[2]
+                continue
 
-            sentence.append(token)
-            sentence_labels.append(ner_tag)
+            sentence.append(parts[0])
+            sentence_labels.append(parts[-1])
 
     if sentence:
-        sentences.append(sentence)
-        labels.append(sentence_labels)
+        yield Sentence(sent_id, sentence, sentence_labels)
+
+
+def iter_batches(sentences: Iterable[Sentence], size: int) -> Iterator[List[Sentence]]:
+    """Group a sentence stream into lists of at most ``size`` sentences."""
+    sentences = iter(sentences)
+    while True:
+        batch = list(islice(sentences, size))
+        if not batch:
+            return
+        yield batch
+
+
+def read_conll(path: str | Path) -> Tuple[List[List[str]], List[List[str]]]:
+    """Read a CoNLL-style file and return token and label sequences.
+
+    See `iter_conll` for the expected format; prefer it for large files.
+    """
+    sentences: List[List[str]] = []
+    labels: List[List[str]] = []
+
+    for sentence in iter_conll(path):
+        sentences.append(sentence.tokens)
+        labels.append(sentence.labels)
 
     return sentences, labels
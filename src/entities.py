@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.tokenizer import TokenSpans
+
+
+class Span(NamedTuple):
+    """Entité décodée : label, offsets de tokens (fin incluse) et de caractères"""
+
+    label: str
+    start: int
+    end: int
+    tokens: Tuple[str, ...]
+    char_start: int = -1
+    char_end: int = -1
+
+    def as_dict(self) -> Dict:
+        entity = {
+            "text": " ".join(self.tokens),
+            "label": self.label,
+            "start": self.start,
+            "end": self.end,
+            "tokens": list(self.tokens),
+        }
+        if self.char_start >= 0:
+            entity["char_start"] = self.char_start
+            entity["char_end"] = self.char_end
+        return entity
+
+
+class EntityAggregator:
+    """Décode les labels BIO et agrège les statistiques en un seul passage.
+
+    Les morceaux d'un même document (pages, blocs streamés) sont passés
+    successivement à ``feed`` : une entité encore ouverte en fin de morceau
+    est prolongée par les I- du morceau suivant, et les offsets sont relatifs
+    au document entier.
+    """
+
+    def __init__(self) -> None:
+        self.total_tokens = 0
+        self.counts: Dict[str, int] = {}
+        self.token_counts: Dict[str, int] = {}
+        self._label: Optional[str] = None
+        self._start = 0
+        self._tokens: List[str] = []
+        self._char_start = -1
+        self._char_end = -1
+
+    def feed(
+        self,
+        tokens: Sequence[str],
+        labels: Sequence[str],
+        spans: Optional[TokenSpans] = None,
+    ) -> List[Span]:
+        """Entités terminées dans ce morceau"""
+        closed = []
+        offset = self.total_tokens
+        for i, label in enumerate(labels):
+            if (
+                self._label is not None
+                and label[:2] == "I-"
+                and label[2:] == self._label
+            ):
+                self._tokens.append(tokens[i])
+                if spans is not None:
+                    self._char_end = spans.ends[i]
+                continue
+
+            if self._label is not None:
+                closed.append(self._close())
+            if label[:2] == "B-":
+                self._label = label[2:]
+                self._start = offset + i
+                self._tokens = [tokens[i]]
+                if spans is not None:
+                    self._char_start = spans.starts[i]
+                    self._char_end = spans.ends[i]
+
+        self.total_tokens += len(labels)
+        return closed
+
+    def flush(self) -> List[Span]:
+        """Termine l'entité restée ouverte en fin de document"""
+        return [self._close()] if self._label is not None else []
+
+    def _close(self) -> Span:
+        label = self._label
+        n_tokens = len(self._tokens)
+        span = Span(
+            label,
+            self._start,
+            self._start + n_tokens - 1,
+            tuple(self._tokens),
+            self._char_start,
+            self._char_end,
+        )
+        self.counts[label] = self.counts.get(label, 0) + 1
+        self.token_counts[label] = self.token_counts.get(label, 0) + n_tokens
+        self._label = None
+        self._char_start = self._char_end = -1
+        return span
+
+    def statistics(self) -> Dict:
+        """Statistiques par type des entités terminées jusqu'ici"""
+        return build_statistics(self.counts, self.token_counts, self.total_tokens)
+
+
+def build_statistics(
+    counts: Dict[str, int], token_counts: Dict[str, int], total_tokens: int
+) -> Dict:
+    """Pourcentages par type à partir des compteurs d'entités et de tokens"""
+    total_entities = sum(counts.values())
+    if not total_entities:
+        return {}
+
+    stats = [
+        {
+            "label": label,
+            "count": count,
+            "percentage": round((count / total_entities) * 100, 1),
+            "token_percentage": (
+                round((token_counts[label] / total_tokens) * 100, 1)
+                if total_tokens > 0
+                else 0
+            ),
+        }
+        for label, count in counts.items()
+    ]
+    return {
+        "total_entities": total_entities,
+        "total_tokens": total_tokens,
+        "entity_density": (
+            round((total_entities / total_tokens) * 100, 1) if total_tokens > 0 else 0
+        ),
+        "by_type": stats,
+    }
+
+
+def decode_entities(
+    tokens: Sequence[str],
+    labels: Sequence[str],
+    spans: Optional[TokenSpans] = None,
+) -> Tuple[List[Span], Dict]:
+    """Entités et statistiques d'un document complet, en un seul passage"""
+    aggregator = EntityAggregator()
+    entities = aggregator.feed(tokens, labels, spans) + aggregator.flush()
+    return entities, aggregator.statistics()
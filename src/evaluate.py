@@ -1,14 +1,33 @@
 from __future__ import annotations
 
 import argparse
+import pickle
+from contextlib import nullcontext
+from functools import partial
+from multiprocessing import Pool
 from pathlib import Path
-from typing import List
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import joblib
 from seqeval.metrics import classification_report, f1_score
 
-from src.conll import read_conll
-from src.features import sent2features
+from src.cache import file_fingerprint
+from src.conll import Sentence, iter_batches, iter_conll, read_conll
+from src.features import (
+    DEFAULT_SPEC,
+    FEATURES_VERSION,
+    FeatureSpec,
+    compile_features,
+    feature_spec,
+    model_extractor,
+)
+from src.gazetteer import Gazetteer, model_gazetteer
+from src.registry import detect_model_type
+
+FeatureBatch = Tuple[List[List[str]], List[List[Dict[str, object]]]]
+
+_models: Dict[str, object] = {}
+_model_types: Dict[str, str] = {}
 
 
 def load_split(data_dir: Path, split: str):
@@ -16,23 +35,176 @@ def load_split(data_dir: Path, split: str):
     return read_conll(path)
 
 
-def predict_logreg(model, sentences: List[List[str]]):
-    all_feats = [feat for sent in sentences for feat in sent2features(sent)]
-    all_preds = model.predict(all_feats)
+def iter_split(data_dir: Path, split: str) -> Iterator[Sentence]:
+    path = data_dir / f"fr_{split}.conll"
+    return iter_conll(path)
+
+
+def predict_logreg_features(model, X: List[List[Dict[str, object]]]):
+    all_preds = model.predict([feat for sent in X for feat in sent])
 
     preds = []
     idx = 0
-    for sent in sentences:
+    for sent in X:
         preds.append(list(all_preds[idx : idx + len(sent)]))
         idx += len(sent)
     return preds
 
 
-def predict_crf(model, sentences: List[List[str]]):
-    X = [sent2features(sent) for sent in sentences]
+def predict_crf_features(model, X: List[List[Dict[str, object]]]):
+    return [list(sent_preds) for sent_preds in model.predict(X)]
+
+
+def predict_logreg(
+    model, sentences: List[List[str]], gazetteer: Optional[Gazetteer] = None
+):
+    extract = model_extractor(model, gazetteer)
+    return predict_logreg_features(model, [extract(sent) for sent in sentences])
+
+
+def predict_crf(
+    model, sentences: List[List[str]], gazetteer: Optional[Gazetteer] = None
+):
+    extract = model_extractor(model, gazetteer)
+    X = [extract(sent) for sent in sentences]
     return model.predict(X)
 
 
+def iter_featurized(
+    path: Path,
+    batch_size: int,
+    cache_dir: Optional[Path] = None,
+    spec: FeatureSpec = DEFAULT_SPEC,
+    gazetteer: Optional[Gazetteer] = None,
+) -> Iterator[FeatureBatch]:
+    """Yield (labels, features) batches of a CoNLL file, featurized with `spec`.
+
+    With `cache_dir`, featurized batches are pickled to a file keyed by the data
+    file hash, FEATURES_VERSION, the spec and the gazetteer, and later runs
+    stream them back instead of re-featurizing.
+    """
+    extract = compile_features(spec, gazetteer)
+    cache_path = None
+    if cache_dir is not None:
+        key = f"{path.stem}-{file_fingerprint(path)}-v{FEATURES_VERSION}-{spec.key}"
+        if gazetteer is not None:
+            key += f"-{gazetteer.key}"
+        cache_path = cache_dir / f"{key}.pkl"
+        if cache_path.exists():
+            with cache_path.open("rb") as f:
+                while True:
+                    try:
+                        yield pickle.load(f)
+                    except EOFError:
+                        return
+
+    writer = None
+    if cache_path is not None:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(".tmp")
+        writer = tmp_path.open("wb")
+
+    try:
+        for batch in iter_batches(iter_conll(path), batch_size):
+            featurized = (
+                [sentence.labels for sentence in batch],
+                [extract(sentence.tokens) for sentence in batch],
+            )
+            if writer is not None:
+                pickle.dump(featurized, writer, protocol=pickle.HIGHEST_PROTOCOL)
+            yield featurized
+        if writer is not None:
+            # Only a fully written cache is published
+            writer.close()
+            tmp_path.replace(cache_path)
+    finally:
+        if writer is not None and not writer.closed:
+            writer.close()
+            tmp_path.unlink(missing_ok=True)
+
+
+def _load_models(model_paths: List[Path]) -> None:
+    _models.clear()
+    _model_types.clear()
+    for path in model_paths:
+        model = joblib.load(path)
+        # Each checkpoint is scored as what it is, so CRF and logreg can be mixed
+        _models[str(path)] = model
+        _model_types[str(path)] = detect_model_type(model)
+
+
+def _predict_batch(
+    X: List[List[Dict[str, object]]], paths: Optional[List[str]] = None
+) -> Dict[str, List[List[str]]]:
+    predictors = {"logreg": predict_logreg_features, "crf": predict_crf_features}
+    return {
+        path: predictors[_model_types[path]](model, X)
+        for path, model in _models.items()
+        if paths is None or path in paths
+    }
+
+
+def _imap_batches(
+    pool, predict: Callable, batches: Iterable[FeatureBatch]
+) -> Iterator[Tuple[List[List[str]], Dict[str, List[List[str]]]]]:
+    shard_labels: List[List[List[str]]] = []
+
+    def shards() -> Iterator[List[List[Dict[str, object]]]]:
+        for batch_labels, X in batches:
+            shard_labels.append(batch_labels)
+            yield X
+
+    for i, batch_preds in enumerate(pool.imap(predict, shards())):
+        yield shard_labels[i], batch_preds
+        shard_labels[i] = []
+
+
+def evaluate_models(
+    path: Path,
+    model_paths: List[Path],
+    batch_size: int = 1000,
+    jobs: int = 1,
+    cache_dir: Optional[Path] = None,
+) -> Tuple[List[List[str]], Dict[str, List[List[str]]]]:
+    """Predict a split with several models, featurizing it once per feature spec.
+
+    Models are grouped by the spec (and gazetteer) they were trained with; each
+    group is scored in one pass over the split featurized for it. The type of
+    each model (CRF or logreg) is detected from its checkpoint.
+    """
+    labels: List[List[str]] = []
+    preds: Dict[str, List[List[str]]] = {str(p): [] for p in model_paths}
+
+    _load_models(model_paths)
+    groups: Dict[
+        Tuple[FeatureSpec, Optional[str]], Tuple[Optional[Gazetteer], List[str]]
+    ] = {}
+    for model_path, model in _models.items():
+        gazetteer = model_gazetteer(model, model_path)
+        key = (feature_spec(model), gazetteer and gazetteer.key)
+        groups.setdefault(key, (gazetteer, []))[1].append(model_path)
+
+    pool = (
+        Pool(jobs, initializer=_load_models, initargs=(model_paths,))
+        if jobs > 1
+        else nullcontext()
+    )
+    with pool:
+        for i, ((spec, _), (gazetteer, paths)) in enumerate(groups.items()):
+            batches = iter_featurized(path, batch_size, cache_dir, spec, gazetteer)
+            predict = partial(_predict_batch, paths=paths)
+            if jobs > 1:
+                results = _imap_batches(pool, predict, batches)
+            else:
+                results = ((batch_labels, predict(X)) for batch_labels, X in batches)
+            for batch_labels, batch_preds in results:
+                if i == 0:
+                    labels.extend(batch_labels)
+                for model_path, model_preds in batch_preds.items():
+                    preds[model_path].extend(model_preds)
+    return labels, preds
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Evaluate NER models")
     parser.add_argument(
@@ -44,8 +216,9 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--model-path",
         type=Path,
-        default=Path("models") / "ner_model.joblib",
-        help="Path to the trained model",
+        nargs="+",
+        default=[Path("models") / "ner_model.joblib"],
+        help="Path(s) to the trained model(s), scored in a single pass",
     )
     parser.add_argument(
         "--split",
@@ -54,26 +227,47 @@ def parse_args() -> argparse.Namespace:
         help="Data split to evaluate",
     )
     parser.add_argument(
-        "--model-type",
-        choices=["logreg", "crf"],
-        default="crf",
-        help="Model type",
+        "--batch-size",
+        type=int,
+        default=1000,
+        help="Number of sentences featurized and predicted at once",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes sharing the prediction of batches",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=Path(".cache") / "features",
+        help="Directory of featurized splits",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Featurize the split without reading or writing the cache",
     )
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_args()
-    sentences, labels = load_split(args.data_dir, args.split)
-
-    model = joblib.load(args.model_path)
-    if args.model_type == "logreg":
-        preds = predict_logreg(model, sentences)
-    else:
-        preds = predict_crf(model, sentences)
+    path = args.data_dir / f"fr_{args.split}.conll"
+    labels, preds = evaluate_models(
+        path,
+        args.model_path,
+        args.batch_size,
+        args.jobs,
+        None if args.no_cache else args.cache_dir,
+    )
 
-    print("F1:", f1_score(labels, preds))
-    print(classification_report(labels, preds))
+    for model_path, model_preds in preds.items():
+        if len(preds) > 1:
+            print(f"== {model_path}")
+        print("F1:", f1_score(labels, model_preds))
+        print(classification_report(labels, model_preds))
 
 
 if __name__ == "__main__":
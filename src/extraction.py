@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import asyncio
+import codecs
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import IO, Dict, Iterable, Iterator, List, Optional
+
+from src.tokenizer import IncrementalTokenizer, TokenSpans, tokenize
+
+# Taille approximative (en caractères) des blocs de texte streamés pour les .txt
+TEXT_CHUNK_CHARS = 64_000
+TEXT_SCAN_BYTES = 64 * 1024
+
+
+def iter_pdf_pages(source: Path | IO[bytes]) -> Iterator[str]:
+    """Extrait le texte d'un PDF page par page, au fur et à mesure"""
+    # Importé au premier document : inutile aux requêtes texte, coûteux au démarrage
+    import pdfplumber
+
+    try:
+        with pdfplumber.open(source) as pdf:
+            if not pdf.pages:
+                raise ValueError("Le PDF est vide")
+            for page in pdf.pages:
+                try:
+                    page_text = page.extract_text()
+                except Exception as e:
+                    print(f" Erreur extraction page: {e}")
+                    continue
+                finally:
+                    # Libère les objets de la page déjà traitée
+                    page.close()
+                if page_text:
+                    # Nettoyer et normaliser le texte
+                    yield page_text.encode("utf-8", errors="ignore").decode("utf-8")
+    except Exception as e:
+        raise ValueError(f"Erreur PDF: {str(e)}")
+
+
+def extract_text_from_pdf(file_path: Path) -> str:
+    """Extrait le texte d'un PDF avec encodage UTF-8 et gestion d'erreur"""
+    text_parts = list(iter_pdf_pages(file_path))
+    return "\n".join(text_parts) if text_parts else "Aucun texte trouvé"
+
+
+def iter_docx_paragraphs(source: Path | IO[bytes]) -> Iterator[str]:
+    """Extrait les paragraphes non vides d'un fichier Word"""
+    from docx import Document
+
+    try:
+        doc = Document(source)
+    except Exception as e:
+        raise ValueError(f"Erreur lecture DOCX: {str(e)}")
+
+    # Normaliser l'encodage pour éviter les problèmes d'affichage
+    for p in doc.paragraphs:
+        if p.text:
+            try:
+                yield p.text.encode("utf-8", errors="ignore").decode("utf-8")
+            except Exception as e:
+                print(f" Erreur paragraphe: {e}")
+                continue
+
+
+def extract_text_from_docx(file_path: Path) -> str:
+    """Extrait le texte d'un fichier Word avec gestion d'erreurs"""
+    paragraphs = list(iter_docx_paragraphs(file_path))
+    return "\n".join(paragraphs) if paragraphs else "Aucun texte trouvé"
+
+
+def iter_text_blocks(
+    source: IO[bytes], chunk_chars: int = TEXT_CHUNK_CHARS
+) -> Iterator[str]:
+    """Lit un .txt par blocs de taille fixe (UTF-8, sinon latin-1)"""
+    # Validation UTF-8 par morceaux binaires : mémoire bornée même sans saut de ligne
+    encoding = "utf-8"
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        while chunk := source.read(TEXT_SCAN_BYTES):
+            decoder.decode(chunk)
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        encoding = "latin-1"
+    source.seek(0)
+
+    reader = io.TextIOWrapper(source, encoding=encoding, newline="")
+    while block := reader.read(chunk_chars):
+        yield block
+
+
+def iter_document_chunks(source: IO[bytes], suffix: str) -> Iterator[str]:
+    """Pages (PDF), paragraphes (DOCX) ou blocs (TXT) d'un document"""
+    if suffix == ".pdf":
+        return iter_pdf_pages(source)
+    if suffix == ".docx":
+        return iter_docx_paragraphs(source)
+    return iter_text_blocks(source)
+
+
+def iter_document_tokens(source: IO[bytes], suffix: str) -> Iterator[TokenSpans]:
+    """Tokens de chaque page/paragraphe/bloc, offsets relatifs au texte entier"""
+    if suffix == ".txt":
+        # Les blocs de taille fixe peuvent couper un mot : tokenisation incrémentale
+        tokenizer = IncrementalTokenizer()
+        for block in iter_text_blocks(source):
+            yield tokenizer.feed(block)
+        yield tokenizer.flush()
+        return
+
+    yield from tokenize_parts(iter_document_chunks(source, suffix))
+
+
+def tokenize_parts(parts: Iterable[str]) -> Iterator[TokenSpans]:
+    """Tokens de chaque page/paragraphe, offsets relatifs au texte entier"""
+    offset = 0
+    for part in parts:
+        yield tokenize(part, offset)
+        # Pages et paragraphes sont joints par un saut de ligne
+        offset += len(part) + 1
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # Le processus parent reste seul responsable de la suppression du segment
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13 : pas d'option track
+        return shared_memory.SharedMemory(name=name)
+
+
+def _read_shared(name: str, size: int) -> bytes:
+    shm = _attach(name)
+    try:
+        return bytes(shm.buf[:size])
+    finally:
+        shm.close()
+
+
+def _count_pdf_pages(name: str, size: int) -> int:
+    import pdfplumber
+
+    try:
+        with pdfplumber.open(io.BytesIO(_read_shared(name, size))) as pdf:
+            return len(pdf.pages)
+    except Exception as e:
+        raise ValueError(f"Erreur PDF: {str(e)}")
+
+
+def _extract_pdf_range(name: str, size: int, start: int, stop: int) -> List[str]:
+    import pdfplumber
+
+    parts: List[str] = []
+    try:
+        with pdfplumber.open(io.BytesIO(_read_shared(name, size))) as pdf:
+            for page in pdf.pages[start:stop]:
+                try:
+                    page_text = page.extract_text()
+                except Exception as e:
+                    print(f" Erreur extraction page: {e}")
+                    continue
+                finally:
+                    page.close()
+                if page_text:
+                    parts.append(
+                        page_text.encode("utf-8", errors="ignore").decode("utf-8")
+                    )
+    except Exception as e:
+        raise ValueError(f"Erreur PDF: {str(e)}")
+    return parts
+
+
+def _extract_docx(name: str, size: int) -> List[str]:
+    return list(iter_docx_paragraphs(io.BytesIO(_read_shared(name, size))))
+
+
+class ExtractionBusyError(RuntimeError):
+    """Trop de documents en attente d'extraction"""
+
+
+class ExtractionPool:
+    """Extraction PDF/DOCX dans un pool de processus borné, hors boucle asyncio.
+
+    Le contenu est copié une seule fois en mémoire partagée ; les pages d'un PDF
+    sont découpées en tranches de ``pages_per_task`` extraites en parallèle. Au
+    plus ``workers`` documents sont extraits en même temps et au-delà de
+    ``max_queue`` documents en attente, `extract` lève ExtractionBusyError.
+    """
+
+    def __init__(
+        self, workers: int = 2, max_queue: int = 8, pages_per_task: int = 8
+    ) -> None:
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.pages_per_task = max(1, pages_per_task)
+        self.waiting = 0
+        self.active = 0
+        self.rejected = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _run(self, fn, *args) -> asyncio.Future:
+        if self._executor is None:
+            # forkserver : un fork du serveur (threads, boucle asyncio, SQLite)
+            # peut hériter de verrous tenus par un autre thread
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        return asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def extract(self, content: bytes, suffix: str) -> str:
+        parts = await self.extract_parts(content, suffix)
+        return "\n".join(parts) if parts else "Aucun texte trouvé"
+
+    async def extract_parts(self, content: bytes, suffix: str) -> List[str]:
+        """Pages (PDF) ou paragraphes (DOCX) non vides, dans l'ordre du document"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise ExtractionBusyError("Trop de documents en cours d'analyse")
+
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(content)))
+        try:
+            shm.buf[: len(content)] = content
+            if suffix == ".pdf":
+                parts = await self._extract_pdf(shm.name, len(content))
+            else:
+                parts = await self._run(_extract_docx, shm.name, len(content))
+        finally:
+            shm.close()
+            shm.unlink()
+            self.active -= 1
+            self._slots.release()
+        return parts
+
+    async def _extract_pdf(self, name: str, size: int) -> List[str]:
+        n_pages = await self._run(_count_pdf_pages, name, size)
+        if not n_pages:
+            raise ValueError("Erreur PDF: Le PDF est vide")
+
+        ranges = [
+            (start, min(start + self.pages_per_task, n_pages))
+            for start in range(0, n_pages, self.pages_per_task)
+        ]
+        chunks = await asyncio.gather(
+            *(self._run(_extract_pdf_range, name, size, a, b) for a, b in ranges)
+        )
+        return [part for chunk in chunks for part in chunk]
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def default_workers() -> int:
+    return min(4, os.cpu_count() or 1)
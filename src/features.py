@@ -1,6 +1,19 @@
 from __future__ import annotations
 
-from typing import Dict, List
+import hashlib
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from src.gazetteer import Gazetteer
+
+# Bump whenever the produced attributes change: invalidates featurized caches
+FEATURES_VERSION = "1"
+WORD_CACHE_SIZE = 100_000
+# Compiled specs kept per process: a few models (and reloads) at a time
+EXTRACTOR_CACHE_SIZE = 8
 
 
 def token2features(sent: List[str], i: int) -> Dict[str, object]:
@@ -48,3 +61,206 @@ def token2features(sent: List[str], i: int) -> Dict[str, object]:
 
 def sent2features(sent: List[str]) -> List[Dict[str, object]]:
     return [token2features(sent, i) for i in range(len(sent))]
+
+
+WordShape = Tuple[Dict[str, object], ...]
+Extractor = Callable[[List[str]], List[Dict[str, object]]]
+
+_BOS: Dict[str, object] = {"BOS": True}
+_EOS: Dict[str, object] = {"EOS": True}
+_EMPTY: Dict[str, object] = {}
+
+# Shape features available to a FeatureSpec, as predicates of the word
+SHAPE_FEATURES: Dict[str, Callable[[str], bool]] = {
+    "isupper": str.isupper,
+    "istitle": str.istitle,
+    "isdigit": str.isdigit,
+    "isalpha": str.isalpha,
+    "islower": str.islower,
+    "hasdigit": lambda word: any(c.isdigit() for c in word),
+    "hashyphen": lambda word: "-" in word,
+}
+
+
+MAX_WINDOW = 5
+MAX_AFFIX = 10
+
+
+def _check_int(name: str, value: object, low: int, high: int) -> None:
+    # bool is an int subclass: reject it explicitly
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"{name} must hold integers, got {value!r}")
+    if not low <= value <= high:
+        raise ValueError(f"{name} must be between {low} and {high}, got {value}")
+
+
+@dataclass(frozen=True)
+class FeatureSpec:
+    """Declarative feature template; the default reproduces `token2features`.
+
+    ``window`` context words on each side contribute their lowercased form (if
+    ``context_lower``) and ``context_shapes``; the current word contributes its
+    lowercased form, ``shapes``, and the lowercased ``suffixes``/``prefixes``
+    of the given lengths. With ``gazetteer``, tokens covered by a gazetteer
+    match also get ``gaz:B-<label>``/``gaz:I-<label>`` features.
+    """
+
+    window: int = 1
+    shapes: Tuple[str, ...] = ("isupper", "istitle", "isdigit")
+    suffixes: Tuple[int, ...] = (3, 2)
+    prefixes: Tuple[int, ...] = (1, 2, 3)
+    context_lower: bool = True
+    context_shapes: Tuple[str, ...] = ("istitle", "isupper")
+    gazetteer: bool = False
+
+    def __post_init__(self) -> None:
+        # Specs are read from model directories: check every field strictly
+        _check_int("window", self.window, 0, MAX_WINDOW)
+        for name in ("suffixes", "prefixes"):
+            values = getattr(self, name)
+            if not isinstance(values, tuple):
+                raise ValueError(f"{name} must be a list of lengths")
+            for value in values:
+                _check_int(name, value, 1, MAX_AFFIX)
+        for name in ("shapes", "context_shapes"):
+            values = getattr(self, name)
+            if not isinstance(values, tuple):
+                raise ValueError(f"{name} must be a list of shape features")
+            unknown = [v for v in values if v not in SHAPE_FEATURES]
+            if unknown:
+                raise ValueError(f"Unknown shape features: {unknown!r}")
+        for name in ("context_lower", "gazetteer"):
+            if not isinstance(getattr(self, name), bool):
+                raise ValueError(f"{name} must be true or false")
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, object]) -> "FeatureSpec":
+        return cls(
+            **{
+                key: tuple(value) if isinstance(value, list) else value
+                for key, value in data.items()
+            }
+        )
+
+    def as_dict(self) -> Dict[str, object]:
+        return {key: getattr(self, key) for key in self.__dataclass_fields__}
+
+    @property
+    def key(self) -> str:
+        """Short digest identifying the produced attributes (for caches)."""
+        payload = json.dumps(self.as_dict(), sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:8]
+
+    @property
+    def offsets(self) -> List[int]:
+        """Context offsets in merge order: -1, +1, -2, +2, ..."""
+        return [sign * k for k in range(1, self.window + 1) for sign in (-1, 1)]
+
+
+DEFAULT_SPEC = FeatureSpec()
+
+
+def _neighbour_column(
+    shapes: List[WordShape], slot: int, offset: int
+) -> List[Dict[str, object]]:
+    """Context dicts that the word at `offset` gives to each token of a sentence."""
+    n = len(shapes)
+    k = min(abs(offset), n)
+    edge = [(_BOS if offset < 0 else _EOS) if abs(offset) == 1 else _EMPTY] * k
+    context = [s[slot] for s in shapes]
+    return edge + context[: n - k] if offset < 0 else context[k:] + edge
+
+
+@lru_cache(maxsize=EXTRACTOR_CACHE_SIZE)
+def compile_shape(spec: FeatureSpec) -> Callable[[str], WordShape]:
+    """Word features of `spec` as one function, LRU cached per word.
+
+    The returned dicts are shared between calls and must not be mutated.
+    """
+    used = [
+        (name, SHAPE_FEATURES[name])
+        for name in dict.fromkeys(
+            spec.shapes + (spec.context_shapes if spec.window else ())
+        )
+    ]
+    current = [(f"word.{name}()", name) for name in spec.shapes]
+    suffixes = [(f"suffix-{n}", n) for n in spec.suffixes]
+    prefixes = [(f"prefix-{n}", n) for n in spec.prefixes]
+    contexts = [
+        (
+            f"{offset:+d}:word.lower()" if spec.context_lower else None,
+            [(f"{offset:+d}:word.{name}()", name) for name in spec.context_shapes],
+        )
+        for offset in spec.offsets
+    ]
+
+    @lru_cache(maxsize=WORD_CACHE_SIZE)
+    def shape(word: str) -> WordShape:
+        lower = word.lower()
+        values = {name: predicate(word) for name, predicate in used}
+        features: Dict[str, object] = {"bias": 1.0, "word.lower()": lower}
+        for key, name in current:
+            features[key] = values[name]
+        for key, n in suffixes:
+            features[key] = word[-n:].lower()
+        for key, n in prefixes:
+            features[key] = word[:n].lower()
+        shapes = [features]
+        for lower_key, shape_keys in contexts:
+            context: Dict[str, object] = {lower_key: lower} if lower_key else {}
+            for key, name in shape_keys:
+                context[key] = values[name]
+            shapes.append(context)
+        return tuple(shapes)
+
+    return shape
+
+
+@lru_cache(maxsize=EXTRACTOR_CACHE_SIZE)
+def compile_features(
+    spec: FeatureSpec, gazetteer: Optional[Gazetteer] = None
+) -> Extractor:
+    """Sentence extractor specialized for `spec` (built once per spec).
+
+    A spec with gazetteer features needs the `gazetteer` the model was trained
+    with; it is ignored otherwise.
+    """
+    if spec.gazetteer and gazetteer is None:
+        raise ValueError("This feature spec needs the model's gazetteer")
+    shape = compile_shape(spec)
+    annotate = gazetteer.annotate if spec.gazetteer else None
+    neighbours = list(enumerate(spec.offsets, start=1))
+
+    def extract(sent: List[str]) -> List[Dict[str, object]]:
+        shapes = [shape(word) for word in sent]
+        columns = [_neighbour_column(shapes, slot, o) for slot, o in neighbours]
+        if annotate is not None:
+            columns.append(annotate(sent))
+        features = []
+        for i, s in enumerate(shapes):
+            token_features = s[0].copy()
+            for column in columns:
+                token_features.update(column[i])
+            features.append(token_features)
+        return features
+
+    return extract
+
+
+def feature_spec(model) -> FeatureSpec:
+    """Spec a model was trained with; models saved before specs used the default."""
+    spec = getattr(model, "feature_spec_", None)
+    return DEFAULT_SPEC if spec is None else FeatureSpec.from_dict(spec)
+
+
+def model_extractor(model, gazetteer: Optional[Gazetteer] = None) -> Extractor:
+    spec = feature_spec(model)
+    return compile_features(spec, gazetteer if spec.gazetteer else None)
+
+
+# Default template, used when no spec is given
+word_shape = compile_shape(DEFAULT_SPEC)
+sent2features_cached = compile_features(DEFAULT_SPEC)
+sent2features_cached.__doc__ = (
+    "Same output as `sent2features`, assembled from cached word shapes."
+)
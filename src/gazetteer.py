@@ -0,0 +1,345 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import shutil
+from bisect import bisect_left
+from collections import deque
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.conll import iter_conll
+from src.entities import decode_entities
+from src.tokenizer import tokenize_text
+
+GAZETTEER_SUFFIX = ".gazetteer"
+ARRAY_NAMES = (
+    "root",
+    "goto_offsets",
+    "goto_tokens",
+    "goto_targets",
+    "fail",
+    "suffix",
+    "depth",
+    "output_offsets",
+    "output_labels",
+)
+
+Entry = Tuple[Tuple[str, ...], str]
+Match = Tuple[int, int, str]
+
+_NO_FEATURES: Dict[str, object] = {}
+
+
+class Gazetteer:
+    """Aho–Corasick automaton over lowercased tokens of labelled entity names.
+
+    Nodes are trie prefixes of entries. The children of node ``n`` are the
+    ``goto_tokens``/``goto_targets`` slice ``goto_offsets[n]:goto_offsets[n+1]``,
+    sorted by token id, with a dense ``root`` table for the first token. ``fail``
+    is the longest proper suffix of a node that is also a node, ``suffix`` the
+    nearest one that ends an entry, and ``output_*`` lists the labels of the
+    entries ending at each node. All of them are arrays that can be memory
+    mapped; only the token vocabulary is held in a dict.
+    """
+
+    def __init__(
+        self,
+        tokens: List[str],
+        labels: List[str],
+        arrays: Dict[str, np.ndarray],
+        key: str,
+        path: Optional[Path] = None,
+    ) -> None:
+        self.tokens = tokens
+        self.token_ids = {token: i for i, token in enumerate(tokens)}
+        self.labels = labels
+        self.key = key
+        self.path = path
+        for name in ARRAY_NAMES:
+            setattr(self, name, arrays[name])
+        self._features = [
+            ({f"gaz:B-{label}": True}, {f"gaz:I-{label}": True}) for label in labels
+        ]
+
+    @classmethod
+    def build(cls, entries: Iterable[Entry]) -> "Gazetteer":
+        """Build the automaton from (tokens, label) entries."""
+        token_ids: Dict[str, int] = {}
+        label_ids: Dict[str, int] = {}
+        children: List[Dict[int, int]] = [{}]
+        outputs: List[set] = [set()]
+        depth = [0]
+        for entry_tokens, label in entries:
+            node = 0
+            for token in entry_tokens:
+                token_id = token_ids.setdefault(token.lower(), len(token_ids))
+                child = children[node].get(token_id)
+                if child is None:
+                    child = children[node][token_id] = len(children)
+                    children.append({})
+                    outputs.append(set())
+                    depth.append(depth[node] + 1)
+                node = child
+            if node:
+                outputs[node].add(label_ids.setdefault(label, len(label_ids)))
+
+        # Failure and output links, breadth first so that parents come first
+        n_nodes = len(children)
+        fail = [0] * n_nodes
+        suffix = [-1] * n_nodes
+        queue = deque(children[0].values())
+        while queue:
+            node = queue.popleft()
+            for token_id, child in children[node].items():
+                state = fail[node]
+                while state and token_id not in children[state]:
+                    state = fail[state]
+                fail[child] = children[state].get(token_id, 0)
+                suffix[child] = (
+                    fail[child] if outputs[fail[child]] else suffix[fail[child]]
+                )
+                queue.append(child)
+
+        root = np.zeros(len(token_ids), dtype=np.int32)
+        for token_id, child in children[0].items():
+            root[token_id] = child
+        goto_offsets = np.zeros(n_nodes + 1, dtype=np.int64)
+        goto_offsets[1:] = np.cumsum([len(edges) for edges in children])
+        edges = [sorted(node_edges.items()) for node_edges in children]
+        output_offsets = np.zeros(n_nodes + 1, dtype=np.int64)
+        output_offsets[1:] = np.cumsum([len(labels) for labels in outputs])
+        arrays = {
+            "root": root,
+            "goto_offsets": goto_offsets,
+            "goto_tokens": np.array(
+                [t for node_edges in edges for t, _ in node_edges], dtype=np.int32
+            ),
+            "goto_targets": np.array(
+                [c for node_edges in edges for _, c in node_edges], dtype=np.int32
+            ),
+            "fail": np.array(fail, dtype=np.int32),
+            "suffix": np.array(suffix, dtype=np.int32),
+            "depth": np.array(depth, dtype=np.int32),
+            "output_offsets": output_offsets,
+            "output_labels": np.array(
+                [label for labels in outputs for label in sorted(labels)],
+                dtype=np.int32,
+            ),
+        }
+        tokens = sorted(token_ids, key=token_ids.get)
+        labels = sorted(label_ids, key=label_ids.get)
+        digest = hashlib.sha256(json.dumps([tokens, labels]).encode("utf-8"))
+        for name in ARRAY_NAMES:
+            digest.update(arrays[name].tobytes())
+        return cls(tokens, labels, arrays, digest.hexdigest()[:16])
+
+    def __reduce_ex__(self, protocol):
+        # Worker processes reopen the saved files instead of receiving copies
+        if self.path is not None:
+            return load_gazetteer, (str(self.path),)
+        return super().__reduce_ex__(protocol)
+
+    def __len__(self) -> int:
+        return len(self.fail)
+
+    def _child(self, node: int, token_id: int) -> int:
+        if node == 0:
+            return int(self.root[token_id])
+        lo, hi = int(self.goto_offsets[node]), int(self.goto_offsets[node + 1])
+        i = bisect_left(self.goto_tokens, token_id, lo, hi)
+        if i < hi and self.goto_tokens[i] == token_id:
+            return int(self.goto_targets[i])
+        return -1
+
+    def _matches(self, tokens: Sequence[str]) -> List[Tuple[int, int, int]]:
+        found: List[Tuple[int, int, int]] = []
+        node = 0
+        for i, token in enumerate(tokens):
+            token_id = self.token_ids.get(token.lower())
+            if token_id is None:
+                node = 0
+                continue
+            child = self._child(node, token_id)
+            while child < 0:
+                node = int(self.fail[node])
+                child = self._child(node, token_id)
+            node = child
+
+            out = node
+            while out > 0:
+                start, end = self.output_offsets[out], self.output_offsets[out + 1]
+                if start < end:
+                    first = i - int(self.depth[out]) + 1
+                    for label_id in self.output_labels[start:end]:
+                        found.append((first, i, int(label_id)))
+                out = int(self.suffix[out])
+        return found
+
+    def matches(self, tokens: Sequence[str]) -> List[Match]:
+        """All (start, end, label) entries found in `tokens`, end inclusive.
+
+        One pass over the sentence: the automaton follows failure links
+        instead of restarting at every position, so the cost is linear in the
+        number of tokens plus the number of matches.
+        """
+        return [
+            (start, end, self.labels[label_id])
+            for start, end, label_id in self._matches(tokens)
+        ]
+
+    def annotate(self, tokens: Sequence[str]) -> List[Dict[str, object]]:
+        """Per-token ``gaz:B-<label>``/``gaz:I-<label>`` features of the matches.
+
+        Tokens outside any match share an empty dict, which must not be mutated.
+        """
+        features: List[Dict[str, object]] = [_NO_FEATURES] * len(tokens)
+        for start, end, label_id in self._matches(tokens):
+            begin, inside = self._features[label_id]
+            for i in range(start, end + 1):
+                if features[i] is _NO_FEATURES:
+                    features[i] = {}
+                features[i].update(begin if i == start else inside)
+        return features
+
+    def save(self, path: str | Path) -> None:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(path / f"{name}.npy", getattr(self, name))
+        (path / "meta.json").write_text(
+            json.dumps(
+                {"tokens": self.tokens, "labels": self.labels, "key": self.key},
+                ensure_ascii=False,
+            ),
+            encoding="utf-8",
+        )
+
+    @classmethod
+    def load(cls, path: str | Path, mmap: bool = True) -> "Gazetteer":
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        mmap_mode = "r" if mmap else None
+        # Plain ndarray views of the maps: np.memmap item access is much slower
+        arrays = {
+            name: np.load(path / f"{name}.npy", mmap_mode=mmap_mode).view(np.ndarray)
+            for name in ARRAY_NAMES
+        }
+        return cls(meta["tokens"], meta["labels"], arrays, meta["key"], path)
+
+
+# Bounded: a rebuilt gazetteer gets a new key and the old maps must be released
+@lru_cache(maxsize=4)
+def _load_cached(path: str, mtime_ns: int) -> Gazetteer:
+    return Gazetteer.load(path, mmap=True)
+
+
+def load_gazetteer(path: str | Path) -> Gazetteer:
+    """Memory-mapped gazetteer, opened once per process (and per rebuild)."""
+    path = Path(path)
+    return _load_cached(str(path), (path / "meta.json").stat().st_mtime_ns)
+
+
+def gazetteer_path(model_path: str | Path) -> Path:
+    """Directory holding the gazetteer of a model (joblib file or array export)."""
+    return Path(model_path).with_suffix(GAZETTEER_SUFFIX)
+
+
+def model_gazetteer(model, model_path: str | Path) -> Optional[Gazetteer]:
+    """Gazetteer saved next to `model_path`, if the model's features use one."""
+    spec = getattr(model, "feature_spec_", None) or {}
+    if not spec.get("gazetteer"):
+        return None
+    return load_gazetteer(str(gazetteer_path(model_path)))
+
+
+def save_gazetteer(gazetteer: Optional[Gazetteer], model_path: str | Path) -> None:
+    """Store the gazetteer next to a saved model (no-op without gazetteer)."""
+    if gazetteer is None:
+        return
+    output = gazetteer_path(model_path)
+    if gazetteer.path is not None and gazetteer.path.resolve() == output.resolve():
+        return
+    if output.exists():
+        shutil.rmtree(output)
+    gazetteer.save(output)
+
+
+def conll_entries(paths: Iterable[Path]) -> Iterable[Entry]:
+    """Entity names and labels annotated in CoNLL files."""
+    for path in paths:
+        for sentence in iter_conll(path):
+            spans, _ = decode_entities(sentence.tokens, sentence.labels)
+            for span in spans:
+                yield span.tokens, span.label
+
+
+def list_entries(directory: Path) -> Iterable[Entry]:
+    """Entity lists: one ``<label>.txt`` file per label, one name per line."""
+    for path in sorted(directory.glob("*.txt")):
+        with path.open(encoding="utf-8") as f:
+            for line in f:
+                tokens = tokenize_text(line.strip())
+                if tokens:
+                    yield tuple(tokens), path.stem
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build a gazetteer automaton")
+    parser.add_argument(
+        "--conll",
+        type=Path,
+        nargs="*",
+        default=[],
+        help="CoNLL files whose annotated entities are added to the gazetteer",
+    )
+    parser.add_argument(
+        "--lists",
+        type=Path,
+        default=None,
+        help="Directory of entity lists (<label>.txt, one name per line)",
+    )
+    parser.add_argument(
+        "--min-chars",
+        type=int,
+        default=2,
+        help="Skip entries shorter than this many characters",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=gazetteer_path(Path("models") / "ner_model.joblib"),
+        help="Output directory (default: models/ner_model.gazetteer)",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    entries = list(conll_entries(args.conll))
+    if args.lists is not None:
+        entries.extend(list_entries(args.lists))
+    entries = [
+        (tokens, label)
+        for tokens, label in dict.fromkeys(entries)
+        if len(" ".join(tokens)) >= args.min_chars
+    ]
+    if not entries:
+        raise SystemExit("No gazetteer entries: pass --conll and/or --lists")
+
+    gazetteer = Gazetteer.build(entries)
+    if args.output.exists():
+        shutil.rmtree(args.output)
+    gazetteer.save(args.output)
+    print(
+        f"{len(entries)} entries, {len(gazetteer.labels)} labels, "
+        f"{len(gazetteer)} nodes saved to {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
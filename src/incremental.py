@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import copy
+import random
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.special import logsumexp
+from sklearn.base import clone
+from sklearn.pipeline import Pipeline
+
+from src.array_crf import ArrayCRF
+from src.features import model_extractor
+from src.gazetteer import Gazetteer
+
+FeatureSeq = Sequence[Dict[str, object]]
+# Attributs d'une phrase : (positions, lignes de `state`, valeurs), à plat
+SentenceAttributes = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def _item_attributes(item: Dict[str, object]) -> Iterable[Tuple[str, float]]:
+    """Attributs crfsuite d'un token, avec la même convention qu'ArrayCRF"""
+    for key, value in item.items():
+        if isinstance(value, str):
+            yield f"{key}:{value}", 1.0
+        elif isinstance(value, dict):
+            for sub_key, sub_value in value.items():
+                if sub_value:
+                    yield f"{key}:{sub_key}", float(sub_value)
+        elif value:
+            yield key, float(value)
+
+
+def _index_sentence(
+    xseq: FeatureSeq, attribute_ids: Dict[str, int], attributes: List[str]
+) -> SentenceAttributes:
+    """Lignes de `state` des attributs d'une phrase ; les nouveaux sont ajoutés"""
+    positions: List[int] = []
+    rows: List[int] = []
+    values: List[float] = []
+    for t, item in enumerate(xseq):
+        for name, value in _item_attributes(item):
+            row = attribute_ids.get(name)
+            if row is None:
+                row = attribute_ids[name] = len(attributes)
+                attributes.append(name)
+            positions.append(t)
+            rows.append(row)
+            values.append(value)
+    return (
+        np.array(positions, dtype=np.intp),
+        np.array(rows, dtype=np.intp),
+        np.array(values, dtype=np.float64),
+    )
+
+
+def _marginals(
+    emissions: np.ndarray, transitions: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Marginales par position et somme des marginales de paires (forward-backward)"""
+    n_tokens, n_labels = emissions.shape
+    alpha = np.empty((n_tokens, n_labels))
+    beta = np.zeros((n_tokens, n_labels))
+    alpha[0] = emissions[0]
+    for t in range(1, n_tokens):
+        alpha[t] = logsumexp(alpha[t - 1][:, None] + transitions, axis=0)
+        alpha[t] += emissions[t]
+    for t in range(n_tokens - 2, -1, -1):
+        beta[t] = logsumexp(transitions + (emissions[t + 1] + beta[t + 1]), axis=1)
+    log_z = logsumexp(alpha[-1])
+
+    states = np.exp(alpha + beta - log_z)
+    pairs = np.zeros((n_labels, n_labels))
+    for t in range(1, n_tokens):
+        pairs += np.exp(
+            alpha[t - 1][:, None] + transitions + (emissions[t] + beta[t]) - log_z
+        )
+    return states, pairs
+
+
+def update_crf(
+    model,
+    new_sent: Iterable[List[str]],
+    new_labels: Iterable[List[str]],
+    epochs: int = 3,
+    learning_rate: float = 0.05,
+    prior_strength: float = 100.0,
+    seed: int = 0,
+    gazetteer: Optional[Gazetteer] = None,
+) -> ArrayCRF:
+    """Poursuit l'entraînement d'un CRF sur de nouvelles phrases.
+
+    crfsuite ne sait pas repartir de poids existants : les poids du modèle
+    (CRF sklearn_crfsuite ou ArrayCRF) sont copiés dans un ArrayCRF, étendu
+    aux nouveaux attributs et labels, puis optimisés par descente de gradient
+    stochastique sur la log-vraisemblance des seules nouvelles phrases, avec
+    une pénalité L2 (``prior_strength``) vers les poids de départ. Les
+    features sont celles du modèle, avec son ``gazetteer`` s'il en utilise un.
+    """
+    base = model if isinstance(model, ArrayCRF) else ArrayCRF.from_crf(model)
+    labels = list(base.classes_)
+    label_ids = {label: i for i, label in enumerate(labels)}
+    attributes = list(base.attributes)
+    attribute_ids = dict(base.attribute_ids)
+    extract = model_extractor(base, gazetteer)
+
+    data = []
+    for sent, sent_labels in zip(new_sent, new_labels):
+        if not sent:
+            continue
+        for label in sent_labels:
+            if label not in label_ids:
+                label_ids[label] = len(labels)
+                labels.append(label)
+        gold = np.array([label_ids[label] for label in sent_labels], dtype=np.intp)
+        indexed = _index_sentence(extract(sent), attribute_ids, attributes)
+        data.append((indexed, gold))
+
+    # Poids de départ (déquantifiés), agrandis à zéro pour les attributs et
+    # labels nouveaux
+    weights = base.weights()
+    n_old_attrs, n_old_labels = weights.shape
+    state = np.zeros((len(attributes), len(labels)))
+    state[:n_old_attrs, :n_old_labels] = weights
+    transitions = np.zeros((len(labels), len(labels)))
+    transitions[:n_old_labels, :n_old_labels] = base.transitions
+
+    # Régularisation L2 vers les poids de départ (et non vers zéro), répartie
+    # sur les phrases : limite l'oubli de ce que le modèle savait déjà
+    prior_state = state.copy()
+    prior_transitions = transitions.copy()
+    decay = 2 * prior_strength / max(1, len(data))
+    rng = random.Random(seed)
+    for epoch in range(epochs):
+        rng.shuffle(data)
+        rate = learning_rate / (1 + epoch)
+        shrink = min(1.0, rate * decay)
+        for (positions, rows, values), gold in data:
+            emissions = np.zeros((len(gold), len(labels)))
+            np.add.at(emissions, positions, state[rows] * values[:, None])
+            states, pairs = _marginals(emissions, transitions)
+
+            # Gradient : observé (labels de référence) moins attendu
+            states[np.arange(len(gold)), gold] -= 1
+            touched = np.unique(rows)
+            state[touched] -= shrink * (state[touched] - prior_state[touched])
+            np.add.at(state, rows, -rate * values[:, None] * states[positions])
+
+            observed = np.zeros_like(pairs)
+            np.add.at(observed, (gold[:-1], gold[1:]), 1)
+            transitions -= shrink * (transitions - prior_transitions)
+            transitions += rate * (observed - pairs)
+
+    return ArrayCRF(
+        labels, attributes, state, transitions, feature_spec=base.feature_spec_
+    )
+
+
+def update_logreg(
+    pipeline: Pipeline,
+    new_sent: Iterable[List[str]],
+    new_labels: Iterable[List[str]],
+    max_iter: Optional[int] = None,
+    gazetteer: Optional[Gazetteer] = None,
+    seen_sent: Iterable[List[str]] = (),
+    seen_labels: Iterable[List[str]] = (),
+) -> Pipeline:
+    """Poursuit l'entraînement de la pipeline logreg sur de nouvelles phrases.
+
+    Le vocabulaire du DictVectorizer est étendu aux nouvelles features (en
+    fin de colonnes), puis la LogisticRegression multinomiale repart de ses
+    poids (``warm_start``) et optimise le même objectif (mêmes ``C``,
+    ``class_weight`` et, par défaut, ``max_iter``). Cet objectif ne porte que
+    sur les phrases fournies : c'est un réajustement, qui a besoin des phrases
+    déjà vues (``seen_sent``, le corpus d'entraînement) pour ne pas oublier ce
+    que le modèle savait ; il converge en moins d'itérations qu'un
+    entraînement depuis zéro.
+    """
+    vectorizer = copy.copy(pipeline.named_steps["vec"])
+    old = pipeline.named_steps["clf"]
+    extract = model_extractor(pipeline, gazetteer)
+
+    X: List[Dict[str, object]] = []
+    y: List[str] = []
+    for sentences, labels in ((seen_sent, seen_labels), (new_sent, new_labels)):
+        for sent, sent_labels in zip(sentences, labels):
+            X.extend(extract(sent))
+            y.extend(sent_labels)
+
+    missing = set(old.classes_) - set(y)
+    if missing:
+        raise ValueError(
+            f"Labels absents des données {sorted(missing)} : passer aussi les "
+            "phrases d'entraînement (seen_sent, seen_labels)"
+        )
+
+    # Nouvelles colonnes ajoutées après les existantes
+    names = list(vectorizer.feature_names_)
+    vocabulary = dict(vectorizer.vocabulary_)
+    for item in X:
+        for key, value in item.items():
+            name = (
+                f"{key}{vectorizer.separator}{value}" if isinstance(value, str) else key
+            )
+            if name not in vocabulary:
+                vocabulary[name] = len(names)
+                names.append(name)
+    vectorizer.feature_names_ = names
+    vectorizer.vocabulary_ = vocabulary
+
+    # Poids de départ agrandis à zéro, lignes dans l'ordre des classes du fit
+    classes = np.unique(y)
+    old_rows = {label: i for i, label in enumerate(old.classes_)}
+    coef = np.zeros((len(classes), len(names)))
+    intercept = np.zeros(len(classes))
+    for i, label in enumerate(classes):
+        if label in old_rows:
+            coef[i, : old.coef_.shape[1]] = old.coef_[old_rows[label]]
+            intercept[i] = old.intercept_[old_rows[label]]
+
+    clf = clone(old).set_params(warm_start=True, max_iter=max_iter or old.max_iter)
+    clf.coef_ = coef
+    clf.intercept_ = intercept
+    clf.fit(vectorizer.transform(X), np.asarray(y))
+
+    updated = Pipeline([("vec", vectorizer), ("clf", clf)])
+    if hasattr(pipeline, "feature_spec_"):
+        updated.feature_spec_ = pipeline.feature_spec_
+    return updated
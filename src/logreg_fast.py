@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.features import WORD_CACHE_SIZE, compile_shape, feature_spec
+from src.gazetteer import Gazetteer
+
+WordColumns = Tuple[np.ndarray, ...]
+# Rows (tokens) and gathered weight rows scored at once
+BLOCK_SIZE = 8192
+
+
+class CompiledLogReg:
+    """Serving path for the DictVectorizer -> LogisticRegression pipeline.
+
+    Each word is mapped once (LRU cached) to the DictVectorizer columns of its
+    current and context token features (as laid out by the pipeline's feature
+    spec), plus the columns of its gazetteer matches, so a batch of sentences becomes
+    one array of column ids. Scores are then the per-token sums of the matching
+    rows of ``coef_.T``, i.e. the sparse matmul of the pipeline, computed with
+    a gather and ``np.add.reduceat`` per block of tokens into reusable
+    per-thread buffers of bounded size.
+    """
+
+    def __init__(self, pipeline, gazetteer: Optional[Gazetteer] = None) -> None:
+        vectorizer = pipeline.named_steps["vec"]
+        clf = pipeline.named_steps["clf"]
+
+        self.classes_ = np.asarray(clf.classes_)
+        self.vocabulary = vectorizer.vocabulary_
+        self.separator = vectorizer.separator
+        self.weights = np.ascontiguousarray(clf.coef_.T, dtype=np.float64)
+        self.intercept = np.asarray(clf.intercept_, dtype=np.float64)
+        self.feature_spec_ = getattr(pipeline, "feature_spec_", None)
+        spec = feature_spec(pipeline)
+        self._offsets = spec.offsets
+        self._word_shape = compile_shape(spec)
+        self._annotate = gazetteer.annotate if spec.gazetteer else None
+        if spec.gazetteer and gazetteer is None:
+            raise ValueError("This pipeline needs its gazetteer")
+
+        self._bos = self._columns({"BOS": True})
+        self._eos = self._columns({"EOS": True})
+        self._empty = np.array([], dtype=np.intp)
+        self._word_columns = lru_cache(maxsize=WORD_CACHE_SIZE)(self._compute_columns)
+        self._buffers = threading.local()
+
+    def _columns(self, features: Dict[str, object]) -> np.ndarray:
+        # Same naming as DictVectorizer; false booleans add nothing to the score
+        columns = []
+        for key, value in features.items():
+            if isinstance(value, str):
+                column = self.vocabulary.get(f"{key}{self.separator}{value}")
+            else:
+                if value != 1:
+                    if value:
+                        raise ValueError(f"Unsupported feature value {key}={value}")
+                    continue
+                column = self.vocabulary.get(key)
+            if column is not None:
+                columns.append(column)
+        return np.array(columns, dtype=np.intp)
+
+    def _compute_columns(self, word: str) -> WordColumns:
+        return tuple(self._columns(features) for features in self._word_shape(word))
+
+    def _buffer(self, name: str, shape: Tuple[int, ...]) -> np.ndarray:
+        """Per-thread buffer grown by doubling up to a block, reused across requests."""
+        buffer = getattr(self._buffers, name, None)
+        if buffer is None or buffer.shape[0] < shape[0]:
+            capacity = 2 * (0 if buffer is None else buffer.shape[0])
+            capacity = max(shape[0], min(capacity, BLOCK_SIZE))
+            buffer = np.empty((capacity,) + shape[1:], dtype=self.weights.dtype)
+            setattr(self._buffers, name, buffer)
+        return buffer[: shape[0]]
+
+    def _block_label_ids(
+        self, indices: np.ndarray, row_sizes: np.ndarray
+    ) -> np.ndarray:
+        n_rows, nnz = len(row_sizes), len(indices)
+        gathered = self._buffer("gathered", (nnz, self.weights.shape[1]))
+        np.take(self.weights, indices, axis=0, out=gathered)
+
+        scores = self._buffer("scores", (n_rows, self.weights.shape[1]))
+        if row_sizes.min() > 0:
+            starts = np.zeros(n_rows, dtype=np.intp)
+            np.cumsum(row_sizes[:-1], out=starts[1:])
+            np.add.reduceat(gathered, starts, axis=0, out=scores)
+        else:
+            scores.fill(0)
+            np.add.at(scores, np.repeat(np.arange(n_rows), row_sizes), gathered)
+        scores += self.intercept
+
+        if scores.shape[1] == 1:
+            return (scores[:, 0] > 0).astype(np.intp)
+        return scores.argmax(axis=1)
+
+    def predict_sentences(self, sentences: List[List[str]]) -> List[List[str]]:
+        parts: List[np.ndarray] = []
+        offsets = list(enumerate(self._offsets, start=1))
+        for sent in sentences:
+            shapes = [self._word_columns(word) for word in sent]
+            n = len(shapes)
+            matches = self._annotate(sent) if self._annotate is not None else None
+            for i, columns in enumerate(shapes):
+                parts.append(columns[0])
+                if matches is not None:
+                    parts.append(
+                        self._columns(matches[i]) if matches[i] else self._empty
+                    )
+                for slot, offset in offsets:
+                    if 0 <= i + offset < n:
+                        parts.append(shapes[i + offset][slot])
+                    elif offset == -1:
+                        parts.append(self._bos)
+                    elif offset == 1:
+                        parts.append(self._eos)
+                    else:
+                        parts.append(self._empty)
+        if not parts:
+            return [[] for _ in sentences]
+
+        row_sizes = np.fromiter(map(len, parts), dtype=np.intp, count=len(parts))
+        stride = 1 + len(offsets) + (self._annotate is not None)
+        row_sizes = row_sizes.reshape(-1, stride).sum(axis=1)
+        n_rows = len(row_sizes)
+        ends = np.cumsum(row_sizes)
+        indices = np.concatenate(parts)
+
+        # Blocks of at most BLOCK_SIZE rows and gathered weights: the buffers
+        # kept by each serving thread stay bounded whatever the document size
+        label_ids = np.empty(n_rows, dtype=np.intp)
+        row = 0
+        while row < n_rows:
+            first = int(ends[row - 1]) if row else 0
+            stop = int(np.searchsorted(ends, first + BLOCK_SIZE, side="right"))
+            stop = min(max(stop, row + 1), row + BLOCK_SIZE)
+            label_ids[row:stop] = self._block_label_ids(
+                indices[first : int(ends[stop - 1])], row_sizes[row:stop]
+            )
+            row = stop
+        labels = self.classes_[label_ids].tolist()
+
+        preds = []
+        idx = 0
+        for sent in sentences:
+            preds.append(labels[idx : idx + len(sent)])
+            idx += len(sent)
+        return preds
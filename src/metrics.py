@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TOKEN_BUCKETS = (10, 50, 100, 500, 1_000, 5_000, 10_000, 50_000, 100_000, 500_000)
+BYTE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 5e6, 1e7, 5e7)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric(ABC):
+    """Métrique au format texte Prometheus, indexée par valeurs de labels"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    @abstractmethod
+    def samples(self) -> Iterator[str]:
+        """Lignes de valeurs ; appelé avec le verrou tenu"""
+
+    def render(self) -> List[str]:
+        # Sous le verrou des écritures : pas de dict modifié pendant le parcours
+        with self._lock:
+            samples = list(self.samples())
+        return [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} {self.kind}",
+            *samples,
+        ]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, value: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def samples(self) -> Iterator[str]:
+        for key, value in sorted(self._values.items()):
+            labels = _format_labels(self.labels, key)
+            yield f"{self.name}{labels} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        # Par jeu de labels : compte par bucket (+Inf en dernier), somme
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def samples(self) -> Iterator[str]:
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                labels = _format_labels(self.labels, key, f'le="{le}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labels, key)
+            yield f"{self.name}_sum{labels} {_format_value(total[0])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class MetricsRegistry:
+    """Ensemble de métriques de l'API ; désactivé, chaque enregistrement est un no-op"""
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._metrics: List[Metric] = []
+        self.requests = self._add(
+            Counter(
+                "ner_requests_total",
+                "Requêtes HTTP par endpoint et code de statut",
+                ("method", "path", "status"),
+            )
+        )
+        self.request_seconds = self._add(
+            Histogram(
+                "ner_request_duration_seconds",
+                "Latence des requêtes HTTP (jusqu'aux en-têtes de réponse)",
+                ("method", "path"),
+            )
+        )
+        self.stage_seconds = self._add(
+            Histogram(
+                "ner_stage_duration_seconds",
+                "Temps passé dans chaque étape du pipeline",
+                ("stage",),
+            )
+        )
+        self.tokens = self._add(
+            Counter("ner_tokens_processed_total", "Tokens tagués", ("source",))
+        )
+        self.document_tokens = self._add(
+            Histogram(
+                "ner_document_tokens",
+                "Taille des documents tagués, en tokens",
+                ("source",),
+                TOKEN_BUCKETS,
+            )
+        )
+        self.upload_bytes = self._add(
+            Histogram(
+                "ner_upload_bytes",
+                "Taille des fichiers importés, en octets",
+                ("format",),
+                BYTE_BUCKETS,
+            )
+        )
+        self.model_load_seconds = self._add(
+            Gauge("ner_model_load_seconds", "Durée du dernier chargement du modèle")
+        )
+        self.ready_seconds = self._add(
+            Gauge(
+                "ner_ready_seconds",
+                "Délai entre le chargement de l'API et le premier modèle prêt",
+            )
+        )
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def stage(self, name: str):
+        """Chronomètre un bloc `with` dans ner_stage_duration_seconds"""
+        if not self.enabled:
+            return nullcontext()
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds.observe(time.perf_counter() - start, stage=name)
+
+    def record_document(self, source: str, n_tokens: int) -> None:
+        if self.enabled:
+            self.tokens.inc(n_tokens, source=source)
+            self.document_tokens.observe(n_tokens, source=source)
+
+    def render(self) -> str:
+        lines = [line for metric in self._metrics for line in metric.render()]
+        return "\n".join(lines) + "\n"
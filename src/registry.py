@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Callable, Deque, Dict, Optional
+
+from src.array_crf import ArrayCRF, ensure_arrays
+from src.cache import file_fingerprint
+from src.features import feature_spec, model_extractor
+from src.gazetteer import Gazetteer, model_gazetteer
+from src.logreg_fast import CompiledLogReg
+
+# Phrases prédites par un modèle fraîchement chargé avant qu'il serve du trafic
+WARMUP_SENTENCES = [
+    ["Emmanuel", "Macron", "a", "visité", "Lyon", "lundi", "."],
+    ["Victor", "Hugo", "est", "né", "à", "Besançon", "en", "1802", "."],
+    ["L'", "Organisation", "des", "Nations", "unies", "siège", "à", "New", "York"],
+]
+LATENCY_WINDOW = 1_000
+
+
+def detect_model_type(model) -> str:
+    """Type d'un artefact chargé : "crf" ou "logreg" """
+    if isinstance(model, ArrayCRF) or hasattr(model, "predict_marginals"):
+        return "crf"
+    if isinstance(model, CompiledLogReg) or hasattr(model, "named_steps"):
+        return "logreg"
+    raise ValueError(f"Type de modèle non reconnu : {type(model).__name__}")
+
+
+class ModelVersion:
+    """Un modèle chargé, son origine et ses latences de prédiction"""
+
+    def __init__(
+        self,
+        path: Path,
+        source: Path,
+        model,
+        model_format: str,
+        load_seconds: float,
+        gazetteer: Optional[Gazetteer] = None,
+    ) -> None:
+        self.path = path
+        self.source = source
+        self.model = model
+        self.model_type = detect_model_type(model)
+        # Extracteur spécialisé pour les features avec lesquelles le modèle a
+        # été entraîné (gabarit par défaut pour les modèles plus anciens)
+        self.feature_spec = feature_spec(model)
+        self.gazetteer = gazetteer
+        self.extract = model_extractor(model, gazetteer)
+        self.format = model_format
+        self.fingerprint = file_fingerprint(source)
+        self.version = self.fingerprint[:12]
+        self.load_seconds = load_seconds
+        self.warmup_seconds = 0.0
+        self.loaded_at = time.time()
+        self.batches = 0
+        self.sentences = 0
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, n_sentences: int) -> None:
+        with self._lock:
+            self.batches += 1
+            self.sentences += n_sentences
+            self.latencies.append(seconds)
+
+    def latency_stats(self) -> Dict:
+        with self._lock:
+            ordered = sorted(self.latencies)
+        if not ordered:
+            return {"batches": self.batches, "sentences": self.sentences}
+
+        def pct(q: float) -> float:
+            return round(
+                ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3
+            )
+
+        return {
+            "batches": self.batches,
+            "sentences": self.sentences,
+            "p50_ms": pct(0.50),
+            "p99_ms": pct(0.99),
+            "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        }
+
+    def as_dict(self) -> Dict:
+        return {
+            "version": self.version,
+            "path": str(self.source),
+            "type": self.model_type,
+            "format": self.format,
+            "feature_spec": self.feature_spec.key,
+            "gazetteer": self.gazetteer.key if self.gazetteer else None,
+            "load_seconds": round(self.load_seconds, 4),
+            "warmup_seconds": round(self.warmup_seconds, 4),
+            "loaded_at": self.loaded_at,
+            "latency": self.latency_stats(),
+        }
+
+
+def load_version(path: Path, model_format: str = "joblib") -> ModelVersion:
+    """Charge un artefact (joblib ou tableaux NumPy) et détecte son type.
+
+    Le gazetteer éventuel, enregistré à côté du modèle, est mappé en mémoire.
+    """
+    start = time.perf_counter()
+    if model_format == "arrays":
+        source = ensure_arrays(path)
+        model = ArrayCRF.load(source, mmap=True)
+        gazetteer = model_gazetteer(model, path)
+    else:
+        # Importé ici : un export en tableaux se charge sans joblib
+        import joblib
+
+        source = path
+        model = joblib.load(path)
+        gazetteer = model_gazetteer(model, path)
+        if detect_model_type(model) == "logreg":
+            model = CompiledLogReg(model, gazetteer)
+    return ModelVersion(
+        path, source, model, model_format, time.perf_counter() - start, gazetteer
+    )
+
+
+class ModelRegistry:
+    """Versions de modèle chargées, dont une seule active à la fois.
+
+    Une nouvelle version est chargée et préchauffée à côté de l'active, puis
+    remplace celle-ci par une simple affectation : une requête en cours
+    garde la version qu'elle a lue au début de sa prédiction. Les
+    ``keep`` dernières versions restent en mémoire pour un retour arrière.
+    """
+
+    def __init__(self, keep: int = 2) -> None:
+        self.keep = max(1, keep)
+        self.active: Optional[ModelVersion] = None
+        self.versions: OrderedDict[str, ModelVersion] = OrderedDict()
+        self.loading: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self._load_lock = threading.Lock()
+
+    def load(
+        self,
+        path: Path,
+        model_format: str = "joblib",
+        warmup: Optional[Callable[[ModelVersion], None]] = None,
+    ) -> ModelVersion:
+        """Charge, préchauffe et enregistre une version sans l'activer"""
+        with self._load_lock:
+            self.loading = str(path)
+            try:
+                version = load_version(path, model_format)
+                if warmup is not None:
+                    start = time.perf_counter()
+                    warmup(version)
+                    version.warmup_seconds = time.perf_counter() - start
+            except Exception as e:
+                self.last_error = f"{path}: {e}"
+                raise
+            finally:
+                self.loading = None
+
+            self.last_error = None
+            existing = self.versions.get(version.version)
+            if existing is not None:
+                return existing
+            self.versions[version.version] = version
+            return version
+
+    def activate(self, version: str) -> ModelVersion:
+        selected = self.versions[version]
+        self.active = selected
+        self.versions.move_to_end(version)
+        # Oublie les versions les plus anciennes au-delà de `keep`
+        for stale in list(self.versions)[: -self.keep]:
+            del self.versions[stale]
+        return selected
+
+    def info(self) -> Dict:
+        return {
+            "active": self.active.version if self.active else None,
+            "loading": self.loading,
+            "last_error": self.last_error,
+            "versions": [version.as_dict() for version in self.versions.values()],
+        }
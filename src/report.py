@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import io
+import json
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
+from xml.sax.saxutils import escape
+
+# reportlab n'est importé qu'au premier rendu, dans le processus du pool
+if TYPE_CHECKING:
+    from reportlab.platypus import Paragraph, Table
+
+# Lignes par table de la liste d'entités : chaque table est mise en page seule
+ENTITY_ROWS_PER_TABLE = 250
+# Au-delà, les entités ne sont plus listées dans le rapport (seulement comptées)
+MAX_REPORT_ENTITIES = 20_000
+TEXT_PARAGRAPH_CHARS = 4_000
+
+
+def report_key(data: Dict) -> str:
+    """Empreinte du contenu d'un rapport, identifiant du job et clé du cache"""
+    payload = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def _text_paragraphs(text: str, style) -> Iterator[Paragraph]:
+    """Texte analysé découpé en paragraphes de taille bornée"""
+    from reportlab.platypus import Paragraph
+
+    for block in text.split("\n\n"):
+        for start in range(0, len(block), TEXT_PARAGRAPH_CHARS):
+            chunk = block[start : start + TEXT_PARAGRAPH_CHARS].strip()
+            if chunk:
+                yield Paragraph(escape(chunk), style)
+
+
+def _entity_tables(entities: List[Dict]) -> Iterator[Table]:
+    """Liste des entités en tables de ENTITY_ROWS_PER_TABLE lignes"""
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle
+
+    style = TableStyle(
+        [
+            ("BACKGROUND", (0, 0), (-1, 0), colors.darkblue),
+            ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+            ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+            ("FONTSIZE", (0, 0), (-1, -1), 9),
+        ]
+    )
+    shown = entities[:MAX_REPORT_ENTITIES]
+    for start in range(0, len(shown), ENTITY_ROWS_PER_TABLE):
+        rows = [["#", "Entité", "Type"]]
+        rows.extend(
+            [i, str(entity.get("text", ""))[:120], entity.get("label", "")]
+            for i, entity in enumerate(
+                shown[start : start + ENTITY_ROWS_PER_TABLE], start + 1
+            )
+        )
+        table = Table(rows, colWidths=[50, 330, 130], repeatRows=1)
+        table.setStyle(style)
+        yield table
+
+
+def render_report(data: Dict) -> bytes:
+    """Génère le PDF des résultats"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.platypus import (
+        Paragraph,
+        SimpleDocTemplate,
+        Spacer,
+        Table,
+        TableStyle,
+    )
+
+    # Créer un buffer pour le PDF
+    buffer = io.BytesIO()
+
+    # Créer le document
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    styles = getSampleStyleSheet()
+
+    # Contenu du PDF
+    content = []
+
+    # Titre
+    title_style = ParagraphStyle(
+        "CustomTitle", parent=styles["Heading1"], fontSize=24, spaceAfter=30
+    )
+    content.append(Paragraph("Rapport d'Analyse NER", title_style))
+
+    # Texte original
+    content.append(Paragraph("<b>Texte analysé :</b>", styles["Heading2"]))
+    content.extend(_text_paragraphs(data.get("text", "") or "", styles["Normal"]))
+    content.append(Spacer(1, 20))
+
+    # Statistiques
+    content.append(Paragraph("<b>Statistiques :</b>", styles["Heading2"]))
+    stats = data.get("statistics", {})
+
+    stats_data = [
+        ["Métrique", "Valeur"],
+        ["Tokens analysés", stats.get("total_tokens", 0)],
+        ["Entités détectées", stats.get("total_entities", 0)],
+        ["Densité d'entités", f"{stats.get('entity_density', 0)}%"],
+    ]
+
+    stats_table = Table(stats_data)
+    stats_table.setStyle(
+        TableStyle(
+            [
+                ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
+                ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+                ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+                ("FONTSIZE", (0, 0), (-1, 0), 14),
+                ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
+                ("BACKGROUND", (0, 1), (-1, -1), colors.beige),
+                ("GRID", (0, 0), (-1, -1), 1, colors.black),
+            ]
+        )
+    )
+
+    content.append(stats_table)
+    content.append(Spacer(1, 20))
+
+    # Détail par type
+    content.append(Paragraph("<b>Détail par type d'entité :</b>", styles["Heading2"]))
+
+    entities_by_type = data.get("entities_by_type", [])
+    if entities_by_type:
+        detail_data = [["Type", "Nombre", "Pourcentage"]]
+        for item in entities_by_type:
+            detail_data.append(
+                [
+                    item.get("label", ""),
+                    item.get("count", 0),
+                    f"{item.get('percentage', 0)}%",
+                ]
+            )
+
+        detail_table = Table(detail_data)
+        detail_table.setStyle(
+            TableStyle(
+                [
+                    ("BACKGROUND", (0, 0), (-1, 0), colors.darkblue),
+                    ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+                    ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+                    ("GRID", (0, 0), (-1, -1), 1, colors.black),
+                ]
+            )
+        )
+        content.append(detail_table)
+
+    # Liste des entités, en tables de taille bornée plutôt qu'un paragraphe chacune
+    content.append(Spacer(1, 20))
+    content.append(
+        Paragraph("<b>Liste des entités détectées :</b>", styles["Heading2"])
+    )
+
+    entities = data.get("entities", [])
+    content.extend(_entity_tables(entities))
+    if len(entities) > MAX_REPORT_ENTITIES:
+        content.append(
+            Paragraph(
+                f"... {len(entities) - MAX_REPORT_ENTITIES} entités supplémentaires "
+                "non listées",
+                styles["Normal"],
+            )
+        )
+
+    # Générer le PDF
+    doc.build(content)
+    return buffer.getvalue()
+
+
+class ReportBusyError(RuntimeError):
+    """Trop de rapports en attente de génération"""
+
+
+class ReportJobs:
+    """Génération des rapports PDF dans un pool de processus, avec cache.
+
+    Un job est identifié par l'empreinte de son contenu : un même rapport
+    demandé deux fois partage le job en cours, puis est servi depuis le cache
+    (LRU borné à ``max_cached_bytes`` de PDF). Jobs et cache vivent dans la
+    mémoire du processus : ils ne sont pas partagés entre workers uvicorn.
+    """
+
+    def __init__(
+        self,
+        workers: int = 1,
+        max_pending: int = 16,
+        max_cached_bytes: int = 100_000_000,
+    ) -> None:
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.max_cached_bytes = max_cached_bytes
+        self.cached_bytes = 0
+        self.hits = 0
+        self.rendered = 0
+        self._done: OrderedDict[str, bytes] = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._errors: OrderedDict[str, str] = OrderedDict()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def submit(self, data: Dict) -> str:
+        """Lance (ou retrouve) le rendu du rapport et renvoie l'id du job"""
+        job_id = report_key(data)
+        if job_id in self._done:
+            self.hits += 1
+            self._done.move_to_end(job_id)
+            return job_id
+        if job_id in self._pending:
+            return job_id
+        if len(self._pending) >= self.max_pending:
+            raise ReportBusyError("Trop de rapports en cours de génération")
+
+        if self._executor is None:
+            # forkserver : un fork du serveur (threads, boucle asyncio, SQLite)
+            # peut hériter de verrous tenus par un autre thread
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        self._errors.pop(job_id, None)
+        future = asyncio.get_running_loop().run_in_executor(
+            self._executor, render_report, data
+        )
+        self._pending[job_id] = future
+        future.add_done_callback(lambda f: self._finish(job_id, f))
+        return job_id
+
+    def _finish(self, job_id: str, future: asyncio.Future) -> None:
+        self._pending.pop(job_id, None)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self._errors[job_id] = str(error)
+            while len(self._errors) > self.max_pending:
+                self._errors.popitem(last=False)
+            return
+
+        pdf = future.result()
+        self.rendered += 1
+        self._done[job_id] = pdf
+        self.cached_bytes += len(pdf)
+        while self.cached_bytes > self.max_cached_bytes and len(self._done) > 1:
+            _, evicted = self._done.popitem(last=False)
+            self.cached_bytes -= len(evicted)
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        if job_id in self._done:
+            return {"job_id": job_id, "status": "done"}
+        if job_id in self._pending:
+            return {"job_id": job_id, "status": "pending"}
+        if job_id in self._errors:
+            return {"job_id": job_id, "status": "error", "error": self._errors[job_id]}
+        return None
+
+    def result(self, job_id: str) -> Optional[bytes]:
+        pdf = self._done.get(job_id)
+        if pdf is not None:
+            self._done.move_to_end(job_id)
+        return pdf
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "pending": len(self._pending),
+            "cached": len(self._done),
+            "cached_bytes": self.cached_bytes,
+            "hits": self.hits,
+            "rendered": self.rendered,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
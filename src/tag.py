@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from itertools import islice
+from multiprocessing import Barrier, Pool
+from multiprocessing.synchronize import Barrier as WorkerBarrier
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+from src import api
+from src.conll import iter_conll, open_conll
+from src.tokenizer import tokenize_text
+
+Document = Tuple[Dict, List[str]]
+
+
+def iter_jsonl(path: Path, text_field: str, id_field: str) -> Iterator[Document]:
+    """Yield (metadata, tokens) for each JSONL line holding a text or token list."""
+    with open_conll(path) as f:
+        for index, line in enumerate(f):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            meta = {"id": record.get(id_field, index)}
+            if "tokens" in record:
+                yield meta, list(record["tokens"])
+            else:
+                yield meta, tokenize_text(record.get(text_field, ""))
+
+
+def iter_conll_documents(path: Path) -> Iterator[Document]:
+    for index, sentence in enumerate(iter_conll(path)):
+        yield {"id": sentence.id or index}, sentence.tokens
+
+
+def iter_chunks(documents: Iterator[Document], size: int) -> Iterator[List[Document]]:
+    while True:
+        chunk = list(islice(documents, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _init_worker(model_path: Path, ready: Optional[WorkerBarrier] = None) -> None:
+    # Synchronous load, whatever NER_BACKGROUND_LOAD says
+    api.load_model_file(model_path)
+    if ready is not None:
+        ready.wait()
+
+
+def _tag_chunk(chunk: List[Document]) -> List[Tuple[Dict, List[str], List[str]]]:
+    labels = api.predict_documents([tokens for _, tokens in chunk])
+    return [
+        (meta, tokens, doc_labels) for (meta, tokens), doc_labels in zip(chunk, labels)
+    ]
+
+
+def write_jsonl(out: TextIO, meta: Dict, tokens: List[str], labels: List[str]) -> None:
+    record = {
+        **meta,
+        "tokens": tokens,
+        "labels": labels,
+        "entities": api.extract_entities(tokens, labels),
+    }
+    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def write_conll(out: TextIO, meta: Dict, tokens: List[str], labels: List[str]) -> None:
+    out.write(f"# id {meta['id']}\n")
+    out.writelines(f"{token}\t{label}\n" for token, label in zip(tokens, labels))
+    out.write("\n")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Tag a corpus offline")
+    parser.add_argument("input", type=Path, help="JSONL or CoNLL file (.gz/.xz ok)")
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="Output file (default: stdout)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["jsonl", "conll"],
+        default=None,
+        help="Input format (default: guessed from the file name)",
+    )
+    parser.add_argument(
+        "--model-path",
+        type=Path,
+        default=None,
+        help="Model to use (default: the one the API would load)",
+    )
+    parser.add_argument(
+        "--text-field", default="text", help="JSONL field holding the text"
+    )
+    parser.add_argument("--id-field", default="id", help="JSONL field holding the id")
+    parser.add_argument(
+        "--jobs", type=int, default=1, help="Worker processes used for tagging"
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=256,
+        help="Documents sent to a worker at once",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    input_format = args.format or (
+        "conll" if ".conll" in args.input.suffixes else "jsonl"
+    )
+    if input_format == "conll":
+        documents = iter_conll_documents(args.input)
+        write = write_conll
+    else:
+        documents = iter_jsonl(args.input, args.text_field, args.id_field)
+        write = write_jsonl
+
+    model_path = args.model_path or api.default_model_path()
+    if model_path is None or not model_path.exists():
+        raise SystemExit(f"No model found at {model_path or api.MODEL_PATH}")
+    # Loaded here first so that a broken model fails before any worker starts
+    _init_worker(model_path)
+
+    chunks = iter_chunks(documents, args.chunk_size)
+    out = args.output.open("w", encoding="utf-8") if args.output else sys.stdout
+    n_docs = n_tokens = 0
+    pool = None
+    try:
+        if args.jobs > 1:
+            ready = Barrier(args.jobs + 1)
+            pool = Pool(
+                args.jobs, initializer=_init_worker, initargs=(model_path, ready)
+            )
+            # Throughput excludes the model loads of the workers
+            ready.wait()
+            results = pool.imap(_tag_chunk, chunks)
+        else:
+            results = map(_tag_chunk, chunks)
+
+        start = time.perf_counter()
+        for tagged in results:
+            for meta, tokens, labels in tagged:
+                write(out, meta, tokens, labels)
+                n_docs += 1
+                n_tokens += len(tokens)
+        if pool is not None:
+            pool.close()
+            pool.join()
+    finally:
+        if pool is not None:
+            pool.terminate()
+        if args.output:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"{n_docs} docs, {n_tokens} tokens in {elapsed:.2f}s: "
+        f"{n_docs / elapsed:.1f} docs/s, {n_tokens / elapsed:.0f} tokens/s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import random
+
+import joblib
+import pytest
+import sklearn_crfsuite
+
+from src import api
+from src.cache import PredictionCache
+from src.features import sent2features_cached
+from src.registry import ModelRegistry
+
+WORDS = ["Jean", "habite", "à", "Paris", "et", "Marie", "travaille", "Lyon", "."]
+
+
+@pytest.fixture(scope="session")
+def crf():
+    """Small CRF tagging Paris and Lyon as locations."""
+    rng = random.Random(0)
+    sentences = [[rng.choice(WORDS + ["!", "?"]) for _ in range(8)] for _ in range(50)]
+    labels = [
+        ["B-LOC" if w in {"Paris", "Lyon"} else "O" for w in s] for s in sentences
+    ]
+    model = sklearn_crfsuite.CRF(algorithm="lbfgs", max_iterations=30)
+    model.fit([sent2features_cached(s) for s in sentences], labels)
+    return model
+
+
+@pytest.fixture
+def served(crf, tmp_path, monkeypatch):
+    """The API serving `crf` as its active model, prediction cache disabled."""
+    path = tmp_path / "ner_model.joblib"
+    joblib.dump(crf, path)
+    registry = ModelRegistry()
+    registry.activate(registry.load(path).version)
+    monkeypatch.setattr(api, "registry", registry)
+    monkeypatch.setattr(api, "prediction_cache", PredictionCache(max_entries=0))
+    return crf
@@ -0,0 +1,100 @@
+import json
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import api
+from src.entities import decode_entities
+from src.features import sent2features_cached
+from src.tests.test_extraction import make_docx
+from src.tokenizer import tokenize
+
+WORDS = ["Jean", "habite", "à", "Paris", "et", "Marie", "travaille", "Lyon", "."]
+
+
+def reference_split(tokens, max_tokens):
+    """Sentences ending at . ! ? or after max_tokens tokens."""
+    sentences, current = [], []
+    for token in tokens:
+        current.append(token)
+        if token in {".", "!", "?"} or len(current) == max_tokens:
+            sentences.append(current)
+            current = []
+    return sentences + [current] if current else sentences
+
+
+def random_document(rng, n_tokens):
+    return [rng.choice(WORDS + ["!", "?"]) for _ in range(n_tokens)]
+
+
+@pytest.mark.parametrize("max_tokens", [1, 3, 128])
+def test_split_sentences_matches_reference(max_tokens):
+    rng = random.Random(max_tokens)
+    for n_tokens in [0, 1, 5, 200]:
+        tokens = random_document(rng, n_tokens)
+        spans = list(api.split_sentences(tokens, max_tokens))
+        assert [tokens[start:end] for start, end in spans] == reference_split(
+            tokens, max_tokens
+        )
+
+
+@pytest.mark.parametrize("batch_size", [1, 4, 64])
+def test_batched_documents_match_per_sentence_prediction(served, batch_size):
+    rng = random.Random(batch_size)
+    documents = [random_document(rng, n) for n in [0, 1, 30, 300]]
+
+    labels = api.predict_documents(documents, batch_size)
+
+    for tokens, doc_labels in zip(documents, labels):
+        sentences = reference_split(tokens, api.MAX_SENTENCE_TOKENS)
+        expected = [
+            label
+            for sent in sentences
+            for label in served.predict_single(sent2features_cached(sent))
+        ]
+        assert doc_labels == expected
+
+
+def test_predict_document_skips_empty_input(served):
+    assert api.predict_document([]) == ([], [])
+    tokens = ["Marie", "habite", "Paris", "."]
+    assert api.predict_document(tokens) == (tokens, api.predict_documents([tokens])[0])
+
+
+def read_stream(response):
+    messages = [json.loads(line) for line in response.text.splitlines()]
+    assert messages[-1]["done"]
+    return messages[:-1], messages[-1]
+
+
+@pytest.mark.parametrize("suffix", [".txt", ".docx"])
+def test_stream_matches_whole_document_prediction(served, suffix):
+    paragraphs = ["Jean habite à Paris.", "Marie travaille à Lyon et à Paris !"] * 3
+    text = "\n".join(paragraphs)
+    content = make_docx(paragraphs) if suffix == ".docx" else text.encode("utf-8")
+    client = TestClient(api.app)
+
+    response = client.post(
+        "/predict-file-stream", files={"file": (f"doc{suffix}", content)}
+    )
+    chunks, done = read_stream(response)
+
+    spans = tokenize(text)
+    tokens, labels = api.predict_document(spans.tokens)
+    entities, statistics = decode_entities(tokens, labels, spans)
+    assert [t for chunk in chunks for t in chunk["tokens"]] == tokens
+    assert [label for chunk in chunks for label in chunk["labels"]] == labels
+    streamed = [e for chunk in chunks for e in chunk["entities"]] + done["entities"]
+    assert streamed == [entity.as_dict() for entity in entities]
+    assert done["statistics"] == statistics
+    assert any(entity.label == "LOC" for entity in entities)
+
+
+def test_stream_rejects_broken_and_excess_documents(served, monkeypatch):
+    client = TestClient(api.app)
+    files = {"file": ("doc.pdf", b"not a pdf")}
+
+    assert client.post("/predict-file-stream", files=files).status_code == 400
+    monkeypatch.setattr(api.extraction_pool, "max_queue", 0)
+    assert client.post("/predict-file-stream", files=files).status_code == 503
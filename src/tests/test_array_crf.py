@@ -0,0 +1,126 @@
+import os
+from itertools import islice
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pytest
+import sklearn_crfsuite
+
+from src.array_crf import ArrayCRF, arrays_path, ensure_arrays, is_fresh
+from src.conll import iter_conll
+from src.features import sent2features_cached
+
+DATA = Path(__file__).resolve().parents[2] / "data" / "fr_dev.conll"
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    sentences = list(islice(iter_conll(DATA), 500))
+    train, test = sentences[:300], sentences[300:]
+    return (
+        [sent2features_cached(s.tokens) for s in train],
+        [s.labels for s in train],
+        [sent2features_cached(s.tokens) for s in test],
+    )
+
+
+@pytest.fixture(scope="module")
+def crf(corpus):
+    X_train, y_train, _ = corpus
+    model = sklearn_crfsuite.CRF(algorithm="lbfgs", c2=0.1, max_iterations=30)
+    model.fit(X_train, y_train)
+    return model
+
+
+@pytest.mark.parametrize("batch_size", [1, 7, 256])
+def test_array_crf_matches_crfsuite(crf, corpus, batch_size):
+    _, _, X_test = corpus
+    model = ArrayCRF.from_crf(crf)
+
+    expected = [list(labels) for labels in crf.predict(X_test)]
+    assert model.predict(X_test, batch_size=batch_size) == expected
+
+
+def test_single_and_empty_sentences(crf, corpus):
+    _, _, X_test = corpus
+    model = ArrayCRF.from_crf(crf)
+
+    assert model.predict_single(X_test[0]) == crf.predict_single(X_test[0])
+    assert model.predict([[], X_test[1], []]) == [[], crf.predict_single(X_test[1]), []]
+    # Attributes never seen in training carry no weight
+    unknown = [{"bias": 1.0, "word.lower()": "zzzzqx", "unseen": True}]
+    assert model.predict_single(unknown) == crf.predict_single(unknown)
+
+
+def test_saved_arrays_load_memory_mapped(crf, corpus, tmp_path):
+    _, _, X_test = corpus
+    model = ArrayCRF.from_crf(crf)
+    model.save(tmp_path / "model.arrays")
+
+    loaded = ArrayCRF.load(tmp_path / "model.arrays")
+
+    assert isinstance(loaded.state, np.memmap)
+    assert not loaded.state.flags.writeable
+    assert loaded.predict(X_test) == model.predict(X_test)
+
+
+def test_ensure_arrays_exports_once_and_refreshes(crf, tmp_path):
+    model_path = tmp_path / "ner_model.joblib"
+    joblib.dump(crf, model_path)
+
+    arrays = ensure_arrays(model_path)
+    assert arrays == arrays_path(model_path) and is_fresh(model_path)
+    exported = (arrays / "state.npy").stat().st_mtime_ns
+    assert ensure_arrays(model_path) == arrays
+    assert (arrays / "state.npy").stat().st_mtime_ns == exported
+
+    # A newer model makes the export stale: it is rewritten, with no leftovers
+    earlier = model_path.stat().st_mtime - 10
+    os.utime(arrays, (earlier, earlier))
+    assert not is_fresh(model_path)
+    ensure_arrays(model_path)
+    assert is_fresh(model_path)
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "ner_model.arrays",
+        "ner_model.joblib",
+    ]
+
+
+def token_agreement(a, b):
+    pairs = [(x, y) for xs, ys in zip(a, b) for x, y in zip(xs, ys)]
+    return sum(x == y for x, y in pairs) / len(pairs)
+
+
+def test_pruning_zero_weights_keeps_predictions(crf, corpus):
+    _, _, X_test = corpus
+    model = ArrayCRF.from_crf(crf)
+    pruned = model.prune()
+
+    assert len(pruned.attributes) <= len(model.attributes)
+    assert np.all(np.abs(pruned.weights()).max(axis=1) > 0)
+    assert pruned.predict(X_test) == model.predict(X_test)
+
+    top = model.prune(top_k=100)
+    assert np.count_nonzero(top.weights()) <= 100
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_quantized_weights_stay_close(crf, corpus, tmp_path, dtype):
+    _, _, X_test = corpus
+    model = ArrayCRF.from_crf(crf)
+    quantized = model.quantize(dtype)
+
+    error = np.abs(quantized.weights() - model.weights()).max(axis=0)
+    bound = (
+        np.abs(model.weights()).max(axis=0) / 254
+        if dtype == "int8"
+        else np.abs(model.weights()).max(axis=0) * 2**-11
+    )
+    assert np.all(error <= bound + 1e-12)
+    assert token_agreement(quantized.predict(X_test), model.predict(X_test)) >= 0.99
+
+    quantized.save(tmp_path / "quantized.arrays")
+    loaded = ArrayCRF.load(tmp_path / "quantized.arrays")
+    assert loaded.state.dtype == quantized.state.dtype
+    assert loaded.predict(X_test) == quantized.predict(X_test)
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from src.batching import MicroBatcher
+
+
+def tag_titles(sentences):
+    """Reference predictor: one label per token, independent of the batch."""
+    return [["B-PER" if token.istitle() else "O" for token in s] for s in sentences]
+
+
+SENTENCES = [
+    ["Jean", "habite", "à", "Paris"],
+    ["il", "pleut"],
+    ["Marie", "Curie"],
+    ["Victor", "Hugo", "est", "né", "à", "Besançon"],
+    ["."],
+] * 5
+
+
+async def predict_all(batcher, sentences):
+    try:
+        return await asyncio.gather(*(batcher.predict(s) for s in sentences))
+    finally:
+        await batcher.stop()
+
+
+def test_concurrent_predictions_match_direct_calls():
+    batcher = MicroBatcher(tag_titles, max_batch_size=8, max_wait_ms=50)
+
+    labels = asyncio.run(predict_all(batcher, SENTENCES))
+
+    assert labels == tag_titles(SENTENCES)
+    stats = batcher.stats.as_dict()
+    assert stats["sentences"] == len(SENTENCES)
+    assert stats["largest_batch"] == 8
+    assert stats["batches"] == 4
+
+
+def test_empty_sentence_skips_the_model():
+    batcher = MicroBatcher(tag_titles)
+
+    assert asyncio.run(predict_all(batcher, [[]])) == [[]]
+    assert batcher.stats.batches == 0
+
+
+def test_errors_reach_every_request_of_the_batch():
+    calls = []
+
+    def failing_once(sentences):
+        calls.append(len(sentences))
+        if len(calls) == 1:
+            raise ValueError("model failure")
+        return tag_titles(sentences)
+
+    async def run(batcher):
+        first = asyncio.gather(
+            *(batcher.predict(s) for s in SENTENCES[:3]), return_exceptions=True
+        )
+        failed = await first
+        # The batcher keeps serving after a failed batch
+        recovered = await batcher.predict(SENTENCES[0])
+        await batcher.stop()
+        return failed, recovered
+
+    batcher = MicroBatcher(failing_once, max_batch_size=8, max_wait_ms=50)
+    failed, recovered = asyncio.run(run(batcher))
+
+    assert calls[0] == 3
+    assert all(isinstance(result, ValueError) for result in failed)
+    assert recovered == tag_titles(SENTENCES[:1])[0]
+
+
+def test_batcher_is_bound_to_its_loop():
+    batcher = MicroBatcher(tag_titles)
+
+    async def start_and_keep():
+        batcher.start()
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(start_and_keep())
+        with pytest.raises(RuntimeError):
+            asyncio.run(batcher.predict(["Paris"]))
+    finally:
+        loop.run_until_complete(batcher.stop())
+        loop.close()
@@ -0,0 +1,28 @@
+import joblib
+
+from src.array_crf import ArrayCRF, arrays_path
+from src.benchmark import stage_model
+from src.features import FeatureSpec
+from src.gazetteer import Gazetteer, gazetteer_path, load_gazetteer
+
+
+def test_staged_model_leaves_the_original_untouched(crf, tmp_path):
+    user_dir = tmp_path / "models"
+    user_dir.mkdir()
+    model_path = user_dir / "ner_model.joblib"
+    model = ArrayCRF.from_crf(crf)
+    model.feature_spec_ = FeatureSpec(gazetteer=True).as_dict()
+    joblib.dump(model, model_path)
+    Gazetteer.build([(("paris",), "LOC")]).save(gazetteer_path(model_path))
+    before = sorted(p.name for p in user_dir.iterdir())
+
+    staged = stage_model(model_path, tmp_path / "bench")
+
+    assert sorted(p.name for p in user_dir.iterdir()) == before
+    assert staged.parent == tmp_path / "bench"
+    assert arrays_path(staged).is_dir()
+    assert load_gazetteer(gazetteer_path(staged)).matches(["Paris"]) == [(0, 0, "LOC")]
+    features = [[{"word.lower()": "paris", "bias": 1.0}]]
+    assert ArrayCRF.load(arrays_path(staged)).predict(features) == model.predict(
+        features
+    )
@@ -0,0 +1,84 @@
+import random
+
+from src import cache as cache_module
+from src.cache import PredictionCache
+
+
+def labels_of(tokens):
+    return [f"L-{token}" for token in tokens]
+
+
+def test_lru_matches_reference():
+    rng = random.Random(0)
+    sentences = [[f"w{i}", "."] for i in range(12)]
+    cache = PredictionCache(max_entries=5)
+    reference = []  # least recently used first
+
+    for _ in range(500):
+        sent = rng.choice(sentences)
+        if rng.random() < 0.5:
+            cache.set(sent, labels_of(sent))
+            if sent in reference:
+                reference.remove(sent)
+            reference.append(sent)
+            del reference[:-5]
+        else:
+            expected = labels_of(sent) if sent in reference else None
+            assert cache.get(sent) == expected
+            if expected is not None:
+                reference.remove(sent)
+                reference.append(sent)
+
+    assert cache.stats()["entries"] == len(reference)
+
+
+def test_keys_do_not_collide_across_token_boundaries():
+    cache = PredictionCache()
+    variants = [["a\x00b"], ["a", "b"], ["ab"], ["a", "", "b"], ["", "ab"]]
+
+    assert len({cache.key(tokens) for tokens in variants}) == len(variants)
+
+
+def test_model_change_invalidates_entries():
+    cache = PredictionCache()
+    cache.fingerprint = "model-a"
+    cache.set(["Paris"], ["B-LOC"])
+    cache.fingerprint = "model-b"
+
+    assert cache.get(["Paris"]) is None
+    # A prediction started under the previous model is not stored
+    cache.set(["Lyon"], ["B-LOC"], fingerprint="model-a")
+    assert cache.get(["Lyon"]) is None
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    cache = PredictionCache(ttl=10)
+    cache.set(["Paris"], ["B-LOC"])
+
+    now[0] += 9
+    assert cache.get(["Paris"]) == ["B-LOC"]
+    now[0] += 2
+    assert cache.get(["Paris"]) is None
+
+
+def test_sqlite_tier_is_shared_between_instances(tmp_path):
+    path = tmp_path / "predictions.sqlite"
+    writer = PredictionCache(path=path)
+    reader = PredictionCache(path=path)
+    writer.set(["Victor", "Hugo"], ["B-PER", "I-PER"])
+
+    assert reader.get(["Victor", "Hugo"]) == ["B-PER", "I-PER"]
+    assert reader.stats()["entries"] == 1
+
+    writer.clear()
+    assert PredictionCache(path=path).get(["Victor", "Hugo"]) is None
+
+
+def test_disabled_cache_stores_nothing():
+    cache = PredictionCache(max_entries=0)
+    cache.set(["Paris"], ["B-LOC"])
+
+    assert cache.get(["Paris"]) is None
+    assert cache.stats()["misses"] == 0
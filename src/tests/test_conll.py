@@ -0,0 +1,70 @@
+import gzip
+import lzma
+from pathlib import Path
+
+import pytest
+
+from src.conll import Sentence, iter_batches, iter_conll, read_conll
+
+DATA = Path(__file__).resolve().parents[2] / "data"
+
+SAMPLE = """# id s1\tdomain=fr
+Victor _ _ B-PER
+Hugo _ _ I-PER
+
+
+# id s2\tdomain=fr
+# _ _ O
+né _ _ O
+# id s3\tdomain=fr
+à _ _ O
+Besançon _ _ B-LOC
+# a comment line
+. _ _ O"""
+
+
+def reference_read(path):
+    """Blank-line separated sentences, skipping MultiCoNER header lines."""
+    sentences, labels = [], []
+    for block in Path(path).read_text(encoding="utf-8").split("\n\n"):
+        rows = [line.split() for line in block.splitlines() if line.strip()]
+        rows = [row for row in rows if row[0] != "#" or row[1] == "_"]
+        if rows:
+            sentences.append([row[0] for row in rows])
+            labels.append([row[-1] for row in rows])
+    return sentences, labels
+
+
+def test_headers_split_and_identify_sentences(tmp_path):
+    path = tmp_path / "sample.conll"
+    path.write_text(SAMPLE, encoding="utf-8")
+
+    assert list(iter_conll(path)) == [
+        Sentence("s1", ["Victor", "Hugo"], ["B-PER", "I-PER"]),
+        Sentence("s2", ["#", "né"], ["O", "O"]),
+        Sentence("s3", ["à", "Besançon", "."], ["O", "B-LOC", "O"]),
+    ]
+
+
+def test_reader_matches_reference_on_dev_split():
+    path = DATA / "fr_dev.conll"
+    assert read_conll(path) == reference_read(path)
+
+
+@pytest.mark.parametrize("suffix, open_", [(".gz", gzip.open), (".xz", lzma.open)])
+def test_compressed_files_read_as_plain(tmp_path, suffix, open_):
+    plain = tmp_path / "sample.conll"
+    plain.write_text(SAMPLE, encoding="utf-8")
+    compressed = tmp_path / f"sample.conll{suffix}"
+    with open_(compressed, "wt", encoding="utf-8") as f:
+        f.write(SAMPLE)
+
+    assert list(iter_conll(compressed)) == list(iter_conll(plain))
+
+
+def test_batches_keep_order_and_size():
+    sentences = [Sentence(str(i), [str(i)], ["O"]) for i in range(7)]
+    batches = list(iter_batches(iter(sentences), 3))
+
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert [s for batch in batches for s in batch] == sentences
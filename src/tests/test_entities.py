@@ -0,0 +1,105 @@
+import random
+
+import pytest
+
+from src.entities import EntityAggregator, decode_entities
+from src.tokenizer import tokenize
+
+LABELS = ["O", "O", "B-PER", "I-PER", "B-LOC", "I-LOC", "I-PER"]
+
+
+def reference_entities(tokens, labels):
+    """BIO decoding as the API did it before entities.py, token by token."""
+    entities, current = [], None
+    for i, (token, label) in enumerate(zip(tokens, labels)):
+        if label.startswith("B-"):
+            if current:
+                entities.append(current)
+            current = {"text": token, "label": label[2:], "start": i, "end": i}
+            current["tokens"] = [token]
+        elif label.startswith("I-") and current and label[2:] == current["label"]:
+            current["text"] += " " + token
+            current["end"] = i
+            current["tokens"].append(token)
+        elif current:
+            entities.append(current)
+            current = None
+    if current:
+        entities.append(current)
+    return entities
+
+
+def reference_statistics(entities, total_tokens):
+    if not entities:
+        return {}
+    counts = {}
+    for entity in entities:
+        counts[entity["label"]] = counts.get(entity["label"], 0) + 1
+    by_type = []
+    for label, count in counts.items():
+        n_tokens = sum(len(e["tokens"]) for e in entities if e["label"] == label)
+        by_type.append(
+            {
+                "label": label,
+                "count": count,
+                "percentage": round(count / len(entities) * 100, 1),
+                "token_percentage": round(n_tokens / total_tokens * 100, 1),
+            }
+        )
+    return {
+        "total_entities": len(entities),
+        "total_tokens": total_tokens,
+        "entity_density": round(len(entities) / total_tokens * 100, 1),
+        "by_type": by_type,
+    }
+
+
+def random_document(seed, n_tokens=200):
+    rng = random.Random(seed)
+    tokens = [f"t{i}" for i in range(n_tokens)]
+    return tokens, [rng.choice(LABELS) for _ in tokens]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_single_pass_matches_reference(seed):
+    tokens, labels = random_document(seed)
+    entities, statistics = decode_entities(tokens, labels)
+
+    expected = reference_entities(tokens, labels)
+    assert [entity.as_dict() for entity in entities] == expected
+    assert statistics == reference_statistics(expected, len(tokens))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_chunked_feed_matches_whole_document(seed):
+    tokens, labels = random_document(seed)
+    rng = random.Random(seed)
+    cuts = sorted(rng.sample(range(1, len(tokens)), 10))
+
+    aggregator = EntityAggregator()
+    entities = []
+    for start, end in zip([0] + cuts, cuts + [len(tokens)]):
+        entities += aggregator.feed(tokens[start:end], labels[start:end])
+    entities += aggregator.flush()
+
+    whole, statistics = decode_entities(tokens, labels)
+    assert entities == whole
+    assert aggregator.statistics() == statistics
+
+
+def test_character_offsets_cover_the_entity_text():
+    text = "Victor Hugo est né à Besançon, puis a vécu à Paris."
+    spans = tokenize(text)
+    labels = ["B-PER", "I-PER", "O", "O", "O", "B-LOC"] + ["O"] * 4 + ["B-LOC", "O"]
+
+    entities, _ = decode_entities(spans.tokens, labels, spans)
+
+    assert [text[e.char_start : e.char_end] for e in entities] == [
+        "Victor Hugo",
+        "Besançon",
+        "Paris",
+    ]
+
+
+def test_empty_document():
+    assert decode_entities([], []) == ([], {})
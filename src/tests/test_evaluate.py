@@ -0,0 +1,71 @@
+from itertools import islice
+from pathlib import Path
+
+import joblib
+
+from src.conll import iter_conll
+from src.evaluate import evaluate_models, iter_featurized, predict_crf
+from src.features import FeatureSpec, compile_features
+from src.train import train_crf
+
+DATA = Path(__file__).resolve().parents[2] / "data" / "fr_dev.conll"
+
+
+def flatten(batches):
+    labels, features = [], []
+    for batch_labels, batch_features in batches:
+        labels.extend(batch_labels)
+        features.extend(batch_features)
+    return labels, features
+
+
+def test_cached_split_matches_fresh_featurization(tmp_path):
+    spec = FeatureSpec(window=2)
+    cache = tmp_path / "cache"
+
+    written = flatten(iter_featurized(DATA, 100, cache, spec))
+    assert len(list(cache.glob("*.pkl"))) == 1
+    read = flatten(iter_featurized(DATA, 100, cache, spec))
+
+    sentences = list(iter_conll(DATA))
+    extract = compile_features(spec)
+    assert written == read
+    assert read == (
+        [s.labels for s in sentences],
+        [extract(s.tokens) for s in sentences],
+    )
+    # Another spec gets its own file
+    flatten(iter_featurized(DATA, 100, cache))
+    assert len(list(cache.glob("*.pkl"))) == 2
+
+
+def test_interrupted_featurization_publishes_nothing(tmp_path):
+    cache = tmp_path / "cache"
+    batches = iter_featurized(DATA, 100, cache)
+    next(batches)
+    batches.close()
+
+    assert list(cache.iterdir()) == []
+
+
+def test_models_of_different_specs_are_scored_in_one_call(tmp_path):
+    sentences = list(islice(iter_conll(DATA), 200))
+    tokens, labels = [s.tokens for s in sentences], [s.labels for s in sentences]
+    specs = {"default": FeatureSpec(), "window0": FeatureSpec(window=0)}
+    models = {}
+    for name, spec in specs.items():
+        path = tmp_path / f"{name}.joblib"
+        models[path] = train_crf(tokens, labels, max_iterations=10, spec=spec)
+        joblib.dump(models[path], path)
+
+    dev = list(iter_conll(DATA))
+    results = [
+        evaluate_models(DATA, list(models), batch_size=300, jobs=jobs)
+        for jobs in (1, 2)
+    ]
+
+    for gold, preds in results:
+        assert gold == [s.labels for s in dev]
+        for path, model in models.items():
+            expected = predict_crf(model, [s.tokens for s in dev])
+            assert preds[str(path)] == [list(p) for p in expected]
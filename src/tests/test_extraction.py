@@ -0,0 +1,118 @@
+import asyncio
+import io
+
+import pytest
+
+from src.extraction import (
+    TEXT_SCAN_BYTES,
+    ExtractionBusyError,
+    ExtractionPool,
+    iter_document_tokens,
+    iter_docx_paragraphs,
+    iter_pdf_pages,
+    iter_text_blocks,
+)
+from src.tokenizer import tokenize
+
+
+def read_blocks(data, chunk_chars=1000):
+    blocks = list(iter_text_blocks(io.BytesIO(data), chunk_chars))
+    assert all(0 < len(block) <= chunk_chars for block in blocks)
+    return "".join(blocks)
+
+
+@pytest.mark.parametrize("shift", range(4))
+def test_multibyte_character_across_scan_chunks_is_utf8(shift):
+    # "€" (3 bytes) and "😀" (4 bytes) straddle the boundary of the scanned chunks
+    text = "a" * (TEXT_SCAN_BYTES - shift) + "€😀 fin" + "é" * 10
+    assert read_blocks(text.encode("utf-8")) == text
+
+
+def test_text_without_newlines_is_read_in_blocks():
+    text = "Jean habite à Paris " * 20_000
+    assert read_blocks(text.encode("utf-8"), chunk_chars=4096) == text
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        "Café à Besançon".encode("latin-1"),
+        "a".encode("utf-8") * TEXT_SCAN_BYTES + "é".encode("latin-1"),
+        "fin tronquée €".encode("utf-8")[:-1],
+    ],
+)
+def test_invalid_utf8_falls_back_to_latin1(data):
+    assert read_blocks(data) == data.decode("latin-1")
+
+
+def test_text_tokens_match_whole_text_tokenization():
+    text = "Victor Hugo est né à Besançon. " * 5_000
+    spans = list(iter_document_tokens(io.BytesIO(text.encode("utf-8")), ".txt"))
+
+    assert len(spans) > 2
+    assert [span for chunk in spans for span in chunk] == list(tokenize(text))
+
+
+def make_pdf(n_pages):
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer)
+    for page in range(n_pages):
+        if page != 3:  # one blank page
+            pdf.drawString(72, 720, f"Page {page} : Victor Hugo à Besançon.")
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def make_docx(paragraphs):
+    from docx import Document
+
+    document = Document()
+    for paragraph in paragraphs:
+        document.add_paragraph(paragraph)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = ExtractionPool(workers=2, max_queue=2, pages_per_task=3)
+    yield pool
+    pool.shutdown()
+
+
+def test_pool_extracts_pdf_pages_like_sequential_reader(pool):
+    content = make_pdf(10)
+
+    parts = asyncio.run(pool.extract_parts(content, ".pdf"))
+
+    assert parts == list(iter_pdf_pages(io.BytesIO(content)))
+    assert len(parts) == 9
+
+
+def test_pool_extracts_docx_paragraphs_like_sequential_reader(pool):
+    content = make_docx(["Marie Curie", "", "est née à Varsovie."])
+
+    text = asyncio.run(pool.extract(content, ".docx"))
+
+    assert text == "\n".join(iter_docx_paragraphs(io.BytesIO(content)))
+
+
+def test_pool_reports_broken_documents_and_full_queue(pool):
+    with pytest.raises(ValueError):
+        asyncio.run(pool.extract(b"not a pdf", ".pdf"))
+
+    async def flood():
+        content = make_pdf(2)
+        return await asyncio.gather(
+            *(pool.extract(content, ".pdf") for _ in range(6)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(flood())
+    busy = [r for r in results if isinstance(r, ExtractionBusyError)]
+    assert busy and all(isinstance(r, (str, ExtractionBusyError)) for r in results)
+    assert pool.stats()["waiting"] == pool.stats()["active"] == 0
@@ -0,0 +1,110 @@
+import pytest
+
+from src.features import (
+    DEFAULT_SPEC,
+    SHAPE_FEATURES,
+    FeatureSpec,
+    compile_features,
+    sent2features,
+    sent2features_cached,
+)
+
+SENTENCES = [
+    [],
+    ["Paris"],
+    ["Emmanuel", "Macron", "a", "visité", "Lyon", "en", "2023", "."],
+    ["L'", "ONU", "siège", "à", "New", "York", ",", "New", "York", "."],
+    ["Jean-Pierre", "et", "JEAN", "et", "jean", "É", "x2"],
+]
+
+
+@pytest.mark.parametrize("sentence", SENTENCES)
+def test_cached_features_match_reference(sentence):
+    assert sent2features_cached(sentence) == sent2features(sentence)
+
+
+def test_cached_features_are_not_shared_between_calls():
+    sentence = ["Victor", "Hugo", "Victor"]
+    features = sent2features_cached(sentence)
+    features[0]["word.lower()"] = "changed"
+    features[0]["extra"] = True
+
+    assert sent2features_cached(sentence) == sent2features(sentence)
+
+
+def spec_reference(spec, sentence):
+    """Features of `spec` built token by token, as the FeatureSpec docstring reads."""
+    features = []
+    for i, word in enumerate(sentence):
+        token = {"bias": 1.0, "word.lower()": word.lower()}
+        for name in spec.shapes:
+            token[f"word.{name}()"] = SHAPE_FEATURES[name](word)
+        for n in spec.suffixes:
+            token[f"suffix-{n}"] = word[-n:].lower()
+        for n in spec.prefixes:
+            token[f"prefix-{n}"] = word[:n].lower()
+        for offset in spec.offsets:
+            j = i + offset
+            if 0 <= j < len(sentence):
+                if spec.context_lower:
+                    token[f"{offset:+d}:word.lower()"] = sentence[j].lower()
+                for name in spec.context_shapes:
+                    token[f"{offset:+d}:word.{name}()"] = SHAPE_FEATURES[name](
+                        sentence[j]
+                    )
+            elif abs(offset) == 1:
+                token["BOS" if offset < 0 else "EOS"] = True
+        features.append(token)
+    return features
+
+
+SPECS = [
+    DEFAULT_SPEC,
+    FeatureSpec(window=0),
+    FeatureSpec(window=3, context_lower=False, context_shapes=("isdigit",)),
+    FeatureSpec(
+        window=2,
+        shapes=("hasdigit", "hashyphen", "isalpha"),
+        suffixes=(1, 4),
+        prefixes=(),
+        context_shapes=("islower", "isupper"),
+    ),
+]
+
+
+@pytest.mark.parametrize("spec", SPECS, ids=lambda spec: spec.key)
+@pytest.mark.parametrize("sentence", SENTENCES)
+def test_compiled_spec_matches_reference(spec, sentence):
+    assert compile_features(spec)(sentence) == spec_reference(spec, sentence)
+
+
+def test_default_spec_reproduces_token2features():
+    for sentence in SENTENCES:
+        assert spec_reference(DEFAULT_SPEC, sentence) == sent2features(sentence)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"window": 6},
+        {"window": -1},
+        {"window": True},
+        {"window": "2"},
+        {"suffixes": [0]},
+        {"prefixes": [11]},
+        {"suffixes": 3},
+        {"shapes": ["istitle", "iscapitalized"]},
+        {"context_shapes": "istitle"},
+        {"context_lower": 1},
+        {"gazetteer": "yes"},
+    ],
+)
+def test_invalid_spec_is_rejected(data):
+    with pytest.raises(ValueError):
+        FeatureSpec.from_dict(data)
+
+
+def test_spec_round_trips_through_dict():
+    spec = SPECS[-1]
+    assert FeatureSpec.from_dict(spec.as_dict()) == spec
+    assert FeatureSpec.from_dict(spec.as_dict()).key == spec.key
@@ -0,0 +1,93 @@
+import pickle
+import random
+
+import pytest
+
+from src.features import FeatureSpec, compile_features
+from src.gazetteer import Gazetteer
+from src.logreg_fast import CompiledLogReg
+from src.train import train_logreg
+
+VOCABULARY = ["new", "york", "city", "de", "paris", "la", "Rochelle"]
+LABELS = ["LOC", "ORG", "PER"]
+
+
+def random_entries(seed, n_entries=40):
+    rng = random.Random(seed)
+    return [
+        (
+            tuple(rng.choice(VOCABULARY) for _ in range(rng.randint(1, 4))),
+            rng.choice(LABELS),
+        )
+        for _ in range(n_entries)
+    ]
+
+
+def random_sentence(rng, n_tokens=30):
+    words = VOCABULARY + ["NEW", "York", "inconnu", "."]
+    return [rng.choice(words) for _ in range(n_tokens)]
+
+
+def brute_force_matches(entries, tokens):
+    """Every (start, end, label) whose lowercased tokens form an entry."""
+    names = {(tuple(t.lower() for t in name), label) for name, label in entries}
+    lowered = [token.lower() for token in tokens]
+    return {
+        (start, end, label)
+        for start in range(len(tokens))
+        for end in range(start, len(tokens))
+        for name, label in names
+        if tuple(lowered[start : end + 1]) == name
+    }
+
+
+def brute_force_annotate(entries, tokens):
+    features = [{} for _ in tokens]
+    for start, end, label in brute_force_matches(entries, tokens):
+        features[start][f"gaz:B-{label}"] = True
+        for i in range(start + 1, end + 1):
+            features[i][f"gaz:I-{label}"] = True
+    return features
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_automaton_matches_brute_force(seed):
+    entries = random_entries(seed)
+    gazetteer = Gazetteer.build(entries)
+    rng = random.Random(seed)
+
+    for _ in range(20):
+        tokens = random_sentence(rng)
+        matches = gazetteer.matches(tokens)
+        assert len(matches) == len(set(matches))
+        assert set(matches) == brute_force_matches(entries, tokens)
+        assert gazetteer.annotate(tokens) == brute_force_annotate(entries, tokens)
+
+
+def test_saved_gazetteer_loads_and_pickles_by_path(tmp_path):
+    entries = random_entries(0)
+    gazetteer = Gazetteer.build(entries)
+    gazetteer.save(tmp_path / "model.gazetteer")
+
+    loaded = Gazetteer.load(tmp_path / "model.gazetteer")
+    unpickled = pickle.loads(pickle.dumps(loaded))
+
+    tokens = random_sentence(random.Random(1))
+    assert loaded.key == unpickled.key == gazetteer.key
+    assert loaded.matches(tokens) == gazetteer.matches(tokens)
+    assert unpickled.matches(tokens) == gazetteer.matches(tokens)
+    assert unpickled.path == loaded.path
+
+
+def test_gazetteer_features_reach_both_logreg_paths():
+    gazetteer = Gazetteer.build([(("la", "rochelle"), "LOC"), (("paris",), "LOC")])
+    spec = FeatureSpec(gazetteer=True)
+    sentences = [["Il", "va", "à", "La", "Rochelle"], ["Il", "reste", "à", "Paris"]] * 5
+    labels = [["O", "O", "O", "B-LOC", "I-LOC"], ["O", "O", "O", "B-LOC"]] * 5
+    pipeline = train_logreg(sentences, labels, spec=spec, gazetteer=gazetteer)
+
+    extract = compile_features(spec, gazetteer)
+    test = [["Elle", "part", "de", "la", "rochelle"], ["Paris", "attendra"]]
+    assert extract(test[0])[3]["gaz:B-LOC"] and extract(test[0])[4]["gaz:I-LOC"]
+    expected = [list(pipeline.predict(extract(s))) for s in test]
+    assert CompiledLogReg(pipeline, gazetteer).predict_sentences(test) == expected
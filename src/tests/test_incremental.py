@@ -0,0 +1,113 @@
+import random
+
+import pytest
+import sklearn_crfsuite
+from seqeval.metrics import f1_score
+
+from src.array_crf import ArrayCRF
+from src.features import sent2features_cached
+from src.incremental import update_crf, update_logreg
+from src.train import train_logreg
+
+PERSONS = ["Jean", "Marie", "Paul", "Claire", "Louis", "Sophie"]
+PLACES = ["Paris", "Lyon", "Nantes", "Lille", "Brest", "Nice"]
+VERBS = ["habite", "travaille", "arrive", "reste"]
+
+
+def make_corpus(n_sentences, seed):
+    rng = random.Random(seed)
+    sentences, labels = [], []
+    for _ in range(n_sentences):
+        sentences.append(
+            [rng.choice(PERSONS), rng.choice(VERBS), "à", rng.choice(PLACES), "."]
+        )
+        labels.append(["B-PER", "O", "O", "B-LOC", "O"])
+    return sentences, labels
+
+
+def accuracy(model, sentences, labels):
+    predicted = model.predict([sent2features_cached(s) for s in sentences])
+    pairs = [(p, g) for ps, gs in zip(predicted, labels) for p, g in zip(ps, gs)]
+    return sum(p == g for p, g in pairs) / len(pairs)
+
+
+@pytest.fixture(scope="module")
+def crf():
+    sentences, labels = make_corpus(60, seed=0)
+    model = sklearn_crfsuite.CRF(algorithm="lbfgs", c2=0.1, max_iterations=50)
+    model.fit([sent2features_cached(s) for s in sentences], labels)
+    return model
+
+
+@pytest.mark.parametrize("dtype", ["int8", "float16"])
+def test_update_quantized_crf_keeps_accuracy(crf, dtype):
+    test_sentences, test_labels = make_corpus(30, seed=1)
+    new_sentences, new_labels = make_corpus(10, seed=2)
+    full = ArrayCRF.from_crf(crf)
+    quantized = full.quantize(dtype)
+    assert accuracy(quantized, test_sentences, test_labels) == 1.0
+
+    updated = update_crf(quantized, new_sentences, new_labels, epochs=1)
+
+    assert updated.scale is None
+    assert accuracy(updated, test_sentences, test_labels) == 1.0
+    reference = update_crf(full, new_sentences, new_labels, epochs=1)
+    assert abs(updated.weights() - reference.weights()).max() < 0.1
+
+
+def make_contextual_corpus(n_sentences, seed):
+    """Names labelled by their context word or, after "et", by the name itself."""
+    letters = random.Random(42)
+    names = [
+        "".join(
+            letters.choice("bcdfglmnprstv") + letters.choice("aeiou") for _ in "xyz"
+        )
+        for _ in range(80)
+    ]
+    persons, places = names[:40], names[40:]
+    rng = random.Random(seed)
+    sentences, labels = [], []
+    for _ in range(n_sentences):
+        label = rng.choice(["PER", "LOC"])
+        name = rng.choice(persons if label == "PER" else places)
+        if rng.random() < 0.5:
+            context = "et"
+        else:
+            context = "avec" if label == "PER" else "à"
+        sentences.append(["Il", "parle", context, name, "."])
+        labels.append(["O", "O", "O", f"B-{label}", "O"])
+    return sentences, labels
+
+
+def f1(pipeline, sentences, labels):
+    predicted = [list(pipeline.predict(sent2features_cached(s))) for s in sentences]
+    return f1_score(labels, predicted)
+
+
+def test_update_logreg_does_not_regress():
+    train_sentences, train_labels = make_contextual_corpus(40, seed=0)
+    new_sentences, new_labels = make_contextual_corpus(100, seed=1)
+    test_sentences, test_labels = make_contextual_corpus(200, seed=2)
+    base = train_logreg(train_sentences, train_labels)
+    full = train_logreg(train_sentences + new_sentences, train_labels + new_labels)
+
+    updated = update_logreg(
+        base,
+        new_sentences,
+        new_labels,
+        seen_sent=train_sentences,
+        seen_labels=train_labels,
+    )
+
+    score = f1(updated, test_sentences, test_labels)
+    assert score >= f1(base, test_sentences, test_labels)
+    assert score >= f1(full, test_sentences, test_labels) - 0.01
+    assert updated.feature_spec_ == base.feature_spec_
+
+
+def test_update_logreg_needs_seen_labels():
+    train_sentences, train_labels = make_contextual_corpus(100, seed=0)
+    base = train_logreg(train_sentences, train_labels)
+
+    with pytest.raises(ValueError):
+        update_logreg(base, [["Il", "va", "à", "Lyon"]], [["O", "O", "O", "B-LOC"]])
@@ -0,0 +1,59 @@
+from itertools import islice
+from pathlib import Path
+
+import pytest
+
+from src import logreg_fast
+from src.conll import iter_conll
+from src.features import FeatureSpec, compile_features
+from src.logreg_fast import CompiledLogReg
+from src.train import train_logreg
+
+DATA = Path(__file__).resolve().parents[2] / "data" / "fr_dev.conll"
+SPECS = {"default": FeatureSpec(), "window2": FeatureSpec(window=2, suffixes=(4,))}
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    sentences = list(islice(iter_conll(DATA), 400))
+    return sentences[:250], [s.tokens for s in sentences[250:]]
+
+
+@pytest.fixture(scope="module", params=list(SPECS))
+def pipeline(request, corpus):
+    train, _ = corpus
+    spec = SPECS[request.param]
+    return train_logreg([s.tokens for s in train], [s.labels for s in train], spec=spec)
+
+
+def reference_predict(pipeline, sentences):
+    extract = compile_features(FeatureSpec.from_dict(pipeline.feature_spec_))
+    return [list(pipeline.predict(extract(s))) if s else [] for s in sentences]
+
+
+@pytest.mark.parametrize("block_size", [7, 100, logreg_fast.BLOCK_SIZE])
+def test_compiled_logreg_matches_pipeline(monkeypatch, pipeline, corpus, block_size):
+    _, sentences = corpus
+    monkeypatch.setattr(logreg_fast, "BLOCK_SIZE", block_size)
+    sentences = sentences + [[], ["Paris"], ["zzzqx", "inconnu"]]
+
+    compiled = CompiledLogReg(pipeline)
+
+    assert compiled.predict_sentences(sentences) == reference_predict(
+        pipeline, sentences
+    )
+    # Buffers are reused by the next request of the same thread
+    assert compiled.predict_sentences(sentences[:3]) == reference_predict(
+        pipeline, sentences[:3]
+    )
+
+
+def test_binary_pipeline_matches():
+    sentences = [["Jean", "habite", "à", "Paris"], ["il", "pleut", "à", "Lyon"]] * 5
+    labels = [["B-LOC" if w.istitle() else "O" for w in s] for s in sentences]
+    pipeline = train_logreg(sentences, labels)
+
+    test = [["Marie", "reste", "à", "Nice"], ["il", "reste"]]
+    assert CompiledLogReg(pipeline).predict_sentences(test) == reference_predict(
+        pipeline, test
+    )
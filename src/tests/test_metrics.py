@@ -0,0 +1,97 @@
+import random
+import threading
+
+from fastapi.testclient import TestClient
+
+from src import api
+from src.batching import MicroBatcher
+from src.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+
+def test_histogram_matches_reference_counts():
+    rng = random.Random(0)
+    buckets = (0.01, 0.1, 1.0)
+    values = [rng.choice([0.01, 0.1, 1.0, 5.0]) * rng.random() for _ in range(200)]
+    values += [0.01, 0.1, 1.0, 5.0]
+    histogram = Histogram("h", "help", ("stage",), buckets)
+    for value in values:
+        histogram.observe(value, stage="predict")
+
+    lines = histogram.render()[2:]
+
+    expected = [
+        f'h_bucket{{stage="predict",le="{le}"}} {sum(v <= bound for v in values)}'
+        for le, bound in [("0.01", 0.01), ("0.1", 0.1), ("1", 1.0)]
+    ]
+    expected.append(f'h_bucket{{stage="predict",le="+Inf"}} {len(values)}')
+    assert lines[:4] == expected
+    assert lines[4].startswith('h_sum{stage="predict"} ')
+    assert abs(float(lines[4].split()[-1]) - sum(values)) < 1e-9
+    assert lines[5] == f'h_count{{stage="predict"}} {len(values)}'
+
+
+def test_counter_and_gauge_render():
+    counter = Counter("c_total", "Requests", ("path", "status"))
+    counter.inc(path="/predict", status="200")
+    counter.inc(2, path="/predict", status="200")
+    counter.inc(0.5, path="/health", status="500")
+    gauge = Gauge("g", "Load time")
+    gauge.set(1.5)
+    gauge.set(0.25)
+
+    assert counter.render() == [
+        "# HELP c_total Requests",
+        "# TYPE c_total counter",
+        'c_total{path="/health",status="500"} 0.5',
+        'c_total{path="/predict",status="200"} 3',
+    ]
+    assert gauge.render()[2:] == ["g 0.25"]
+
+
+def test_render_while_recording_from_threads():
+    counter = Counter("c_total", "Requests", ("path",))
+    stop = threading.Event()
+
+    def record():
+        i = 0
+        while not stop.is_set():
+            counter.inc(path=f"/p{i % 500}")
+            i += 1
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    try:
+        for _ in range(50):
+            counter.render()
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    total = sum(float(line.split()[-1]) for line in counter.render()[2:])
+    assert total == sum(counter._values.values())
+
+
+def test_disabled_registry_records_nothing():
+    metrics = MetricsRegistry(enabled=False)
+    with metrics.stage("predict"):
+        pass
+    metrics.record_document("request", 10)
+
+    assert "ner_stage_duration_seconds_count" not in metrics.render()
+
+
+def test_enhanced_prediction_records_every_stage(served, monkeypatch):
+    metrics = MetricsRegistry(enabled=True)
+    monkeypatch.setattr(api, "metrics", metrics)
+    monkeypatch.setattr(api, "batcher", MicroBatcher(api.predict_sentences))
+
+    response = TestClient(api.app).post(
+        "/predict-enhanced", json={"text": "Jean habite à Paris."}
+    )
+
+    assert response.status_code == 200
+    text = metrics.render()
+    for stage in ["tokenize", "features", "predict", "entities"]:
+        assert f'ner_stage_duration_seconds_count{{stage="{stage}"}} 1' in text
+    assert 'ner_requests_total{method="POST",path="/predict-enhanced"' in text
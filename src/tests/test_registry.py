@@ -0,0 +1,101 @@
+import random
+
+import joblib
+import pytest
+
+from src.array_crf import ArrayCRF
+from src.evaluate import evaluate_models, predict_crf, predict_logreg
+from src.logreg_fast import CompiledLogReg
+from src.registry import ModelRegistry, detect_model_type, load_version
+from src.train import train_logreg
+
+WORDS = ["Jean", "habite", "à", "Paris", "et", "Marie", "travaille", "Lyon", "."]
+
+
+def random_corpus(seed, n_sentences):
+    rng = random.Random(seed)
+    sentences = [[rng.choice(WORDS) for _ in range(6)] for _ in range(n_sentences)]
+    labels = [
+        ["B-LOC" if w in {"Paris", "Lyon"} else "O" for w in s] for s in sentences
+    ]
+    return sentences, labels
+
+
+@pytest.fixture(scope="module")
+def logreg():
+    return train_logreg(*random_corpus(1, 50))
+
+
+@pytest.fixture
+def checkpoints(tmp_path, crf, logreg):
+    paths = {"crf": tmp_path / "crf.joblib", "logreg": tmp_path / "logreg.joblib"}
+    joblib.dump(crf, paths["crf"])
+    joblib.dump(logreg, paths["logreg"])
+    return paths
+
+
+def test_versions_detect_their_model_type(checkpoints):
+    sentences, _ = random_corpus(2, 20)
+    crf_version = load_version(checkpoints["crf"])
+    arrays_version = load_version(checkpoints["crf"], "arrays")
+    logreg_version = load_version(checkpoints["logreg"])
+
+    assert crf_version.model_type == arrays_version.model_type == "crf"
+    assert isinstance(arrays_version.model, ArrayCRF)
+    assert logreg_version.model_type == "logreg"
+    assert isinstance(logreg_version.model, CompiledLogReg)
+    features = [crf_version.extract(s) for s in sentences]
+    assert arrays_version.model.predict(features) == [
+        list(labels) for labels in crf_version.model.predict(features)
+    ]
+    with pytest.raises(ValueError):
+        detect_model_type(object())
+
+
+def test_registry_keeps_the_latest_versions(checkpoints, tmp_path, crf):
+    registry = ModelRegistry(keep=2)
+    first = registry.load(checkpoints["crf"])
+    registry.activate(first.version)
+    assert registry.load(checkpoints["crf"]) is first
+
+    second = registry.load(checkpoints["logreg"])
+    assert registry.active is first
+    registry.activate(second.version)
+    third_path = tmp_path / "crf_copy.joblib"
+    joblib.dump(ArrayCRF.from_crf(crf).quantize("int8"), third_path)
+    third = registry.load(third_path)
+    registry.activate(third.version)
+
+    assert list(registry.versions) == [second.version, third.version]
+    assert registry.activate(second.version) is second
+    with pytest.raises(KeyError):
+        registry.activate(first.version)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_evaluation_mixes_crf_and_logreg_checkpoints(
+    checkpoints, crf, logreg, tmp_path, jobs
+):
+    sentences, labels = random_corpus(3, 40)
+    split = tmp_path / "fr_dev.conll"
+    split.write_text(
+        "\n\n".join(
+            "\n".join(f"{t} _ _ {label}" for t, label in zip(sent, sent_labels))
+            for sent, sent_labels in zip(sentences, labels)
+        ),
+        encoding="utf-8",
+    )
+
+    gold, preds = evaluate_models(
+        split,
+        [checkpoints["crf"], checkpoints["logreg"]],
+        batch_size=7,
+        jobs=jobs,
+        cache_dir=tmp_path / "cache",
+    )
+
+    assert gold == labels
+    assert preds[str(checkpoints["crf"])] == [
+        list(p) for p in predict_crf(crf, sentences)
+    ]
+    assert preds[str(checkpoints["logreg"])] == predict_logreg(logreg, sentences)
@@ -0,0 +1,77 @@
+import asyncio
+import io
+
+import pytest
+
+from src.report import ReportBusyError, ReportJobs, render_report, report_key
+
+
+def report(text):
+    return {
+        "text": text,
+        "entities": [{"text": "Paris", "label": "LOC", "start": 3, "end": 3}],
+        "statistics": {"total_tokens": 4, "total_entities": 1, "entity_density": 25},
+    }
+
+
+def pdf_text(pdf):
+    import pdfplumber
+
+    with pdfplumber.open(io.BytesIO(pdf)) as document:
+        return "\n".join(page.extract_text() or "" for page in document.pages)
+
+
+def test_report_key_ignores_key_order():
+    data = report("Jean habite à Paris")
+    reordered = dict(reversed(list(data.items())))
+
+    assert report_key(reordered) == report_key(data)
+    assert report_key(report("Jean habite à Lyon")) != report_key(data)
+
+
+async def wait_for(jobs, job_id):
+    while jobs.status(job_id)["status"] == "pending":
+        await asyncio.sleep(0.05)
+    return jobs.status(job_id)
+
+
+def test_pooled_reports_match_in_process_rendering():
+    async def run():
+        jobs = ReportJobs(workers=1, max_pending=4, max_cached_bytes=10**8)
+        try:
+            data = report("Jean habite à Paris")
+            job_id = jobs.submit(data)
+            assert jobs.submit(data) == job_id
+            assert (await wait_for(jobs, job_id))["status"] == "done"
+            assert jobs.submit(dict(reversed(list(data.items())))) == job_id
+            return jobs.result(job_id), jobs.stats()
+        finally:
+            jobs.shutdown()
+
+    pdf, stats = asyncio.run(run())
+
+    assert pdf_text(pdf) == pdf_text(render_report(report("Jean habite à Paris")))
+    assert (stats["rendered"], stats["hits"], stats["pending"]) == (1, 1, 0)
+
+
+def test_cache_is_bounded_and_errors_are_reported():
+    async def run():
+        jobs = ReportJobs(workers=1, max_pending=1, max_cached_bytes=1)
+        try:
+            first = jobs.submit(report("premier"))
+            with pytest.raises(ReportBusyError):
+                jobs.submit(report("de trop"))
+            await wait_for(jobs, first)
+            second = jobs.submit(report("second"))
+            await wait_for(jobs, second)
+            broken = await wait_for(jobs, jobs.submit({"statistics": "pas un dict"}))
+            return jobs.status(first), jobs.status(second), broken, jobs.stats()
+        finally:
+            jobs.shutdown()
+
+    first, second, broken, stats = asyncio.run(run())
+
+    # Over budget, only the most recent report stays cached
+    assert first is None and second["status"] == "done"
+    assert stats["cached"] == 1
+    assert broken["status"] == "error"
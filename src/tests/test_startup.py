@@ -0,0 +1,62 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import joblib
+from fastapi.testclient import TestClient
+
+from src import api
+from src.array_crf import ensure_arrays
+
+ROOT = Path(__file__).resolve().parents[2]
+HEAVY = ["pdfplumber", "docx", "reportlab", "sklearn", "sklearn_crfsuite", "joblib"]
+
+
+def imported_modules(code):
+    """Heavy modules present in sys.modules after running `code` in a fresh interpreter."""
+    script = (
+        f"{code}\nimport sys\nprint(' '.join(m for m in {HEAVY!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.split()
+
+
+def test_importing_the_api_defers_heavy_modules():
+    assert imported_modules("import src.api") == []
+
+
+def test_array_models_load_without_sklearn(crf, tmp_path):
+    path = tmp_path / "ner_model.joblib"
+    joblib.dump(crf, path)
+    ensure_arrays(path)
+
+    loaded = imported_modules(
+        "from pathlib import Path\n"
+        "from src.registry import load_version\n"
+        f"load_version(Path({str(path)!r}), 'arrays')"
+    )
+
+    assert loaded == []
+
+
+def test_predictions_wait_for_background_load(served, monkeypatch):
+    monkeypatch.setattr(api, "BACKGROUND_LOAD", True)
+    monkeypatch.setitem(api.readiness, "ready", False)
+    client = TestClient(api.app)
+
+    assert client.get("/ready").status_code == 503
+    response = client.post("/predict-text", json={"text": "Jean habite à Paris"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert client.get("/extraction-stats").status_code == 200
+
+    monkeypatch.setitem(api.readiness, "ready", True)
+    assert client.get("/ready").status_code == 200
+    response = client.post("/predict-text", json={"text": "Jean habite à Paris"})
+    assert response.status_code == 200
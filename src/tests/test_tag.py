@@ -0,0 +1,97 @@
+import json
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import api, tag
+from src.conll import iter_conll
+from src.tokenizer import tokenize_text
+
+TEXTS = [
+    "Jean habite à Paris. Marie travaille à Lyon !",
+    "",
+    "Paris et Lyon ? " * 50,
+]
+TOKENS = [["Marie", "habite", "Lyon", "."], []]
+
+
+def test_predict_batch_matches_single_documents(served):
+    response = TestClient(api.app).post(
+        "/predict-batch", json={"texts": TEXTS, "tokens": TOKENS}
+    )
+
+    assert response.status_code == 200
+    documents = [tokenize_text(text) for text in TEXTS] + TOKENS
+    assert response.json()["results"] == [
+        {"tokens": tokens, "labels": api.predict_documents([tokens])[0]}
+        for tokens in documents
+    ]
+
+
+def test_predict_batch_rejects_too_many_documents(served, monkeypatch):
+    monkeypatch.setattr(api, "MAX_BATCH_DOCUMENTS", 2)
+    response = TestClient(api.app).post("/predict-batch", json={"texts": TEXTS})
+
+    assert response.status_code == 400
+
+
+def run_tag(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["tag", *map(str, args)])
+    tag.main()
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_tag_cli_jsonl_matches_api(served, tmp_path, monkeypatch, jobs):
+    model_path = tmp_path / "ner_model.joblib"
+    source = tmp_path / "corpus.jsonl"
+    records = [{"id": f"d{i}", "text": text} for i, text in enumerate(TEXTS)]
+    records.append({"id": "tokens", "tokens": TOKENS[0]})
+    source.write_text("\n".join(json.dumps(r) for r in records), encoding="utf-8")
+    output = tmp_path / "tagged.jsonl"
+
+    run_tag(
+        monkeypatch,
+        source,
+        "--model-path",
+        model_path,
+        "--output",
+        output,
+        "--jobs",
+        jobs,
+        "--chunk-size",
+        1,
+    )
+
+    tagged = [json.loads(line) for line in output.read_text("utf-8").splitlines()]
+    documents = [tokenize_text(text) for text in TEXTS] + TOKENS[:1]
+    assert [record["id"] for record in tagged] == [r["id"] for r in records]
+    for record, tokens in zip(tagged, documents):
+        labels = api.predict_documents([tokens])[0]
+        assert (record["tokens"], record["labels"]) == (tokens, labels)
+        assert record["entities"] == api.extract_entities(tokens, labels)
+
+
+def test_tag_cli_conll_keeps_sentence_ids(served, tmp_path, monkeypatch):
+    source = tmp_path / "corpus.conll"
+    source.write_text(
+        "# id a\tdomain=fr\nJean _ _ O\nà _ _ O\nParis _ _ B-LOC\n\n"
+        "# id b\tdomain=fr\nLyon _ _ B-LOC\n",
+        encoding="utf-8",
+    )
+    output = tmp_path / "tagged.conll"
+
+    run_tag(
+        monkeypatch,
+        source,
+        "--model-path",
+        tmp_path / "ner_model.joblib",
+        "--output",
+        output,
+    )
+
+    tagged = list(iter_conll(output))
+    assert [s.id for s in tagged] == ["a", "b"]
+    assert [s.labels for s in tagged] == api.predict_documents(
+        [["Jean", "à", "Paris"], ["Lyon"]]
+    )
@@ -0,0 +1,58 @@
+import random
+import re
+
+import pytest
+
+from src.tokenizer import IncrementalTokenizer, tokenize, tokenize_text
+
+TEXTS = [
+    "",
+    "Paris",
+    "Emmanuel Macron a visité Lyon le 14 juillet 2023 !",
+    "L'ONU siège à New-York, n'est-ce pas ?... Oui ; c'est ça : ok.",
+    "Ça coûte 3,50 € — « vraiment » ?\nDeuxième ligne\tavec  espaces.  ",
+    "Straße, Ærø, 東京 et Привет.",
+]
+
+
+def reference_spans(text):
+    """Tokens of the original regex tokenizer, with their character offsets."""
+    return [(m.group(), m.start(), m.end()) for m in re.finditer(r"\w+|[!?.;:]", text)]
+
+
+def feed_in_chunks(text, cuts):
+    tokenizer = IncrementalTokenizer()
+    spans = []
+    bounds = [0] + sorted(cuts) + [len(text)]
+    for start, end in zip(bounds, bounds[1:]):
+        spans.extend(tokenizer.feed(text[start:end]))
+    spans.extend(tokenizer.flush())
+    return spans
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_tokenize_matches_reference(text):
+    assert list(tokenize(text)) == reference_spans(text)
+    assert tokenize_text(text) == [token for token, _, _ in reference_spans(text)]
+    assert list(tokenize(text, offset=100)) == [
+        (token, start + 100, end + 100) for token, start, end in reference_spans(text)
+    ]
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_every_single_cut_matches_tokenize(text):
+    for cut in range(len(text) + 1):
+        assert feed_in_chunks(text, [cut]) == list(tokenize(text))
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_random_chunkings_match_tokenize(text):
+    rng = random.Random(0)
+    for _ in range(50):
+        cuts = [rng.randint(0, len(text)) for _ in range(rng.randint(1, 8))]
+        assert feed_in_chunks(text, cuts) == list(tokenize(text))
+
+
+def test_one_character_chunks():
+    text = " ".join(TEXTS)
+    assert feed_in_chunks(text, range(1, len(text))) == list(tokenize(text))
@@ -0,0 +1,51 @@
+from itertools import islice
+from pathlib import Path
+
+import pytest
+
+from src.conll import iter_conll
+from src.features import FeatureSpec, compile_features, sent2features
+from src.gazetteer import Gazetteer, gazetteer_path, load_gazetteer
+from src.train import featurize, train_crf
+
+DATA = Path(__file__).resolve().parents[2] / "data" / "fr_dev.conll"
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    sentences = list(islice(iter_conll(DATA), 200))
+    return [s.tokens for s in sentences], [s.labels for s in sentences]
+
+
+@pytest.mark.parametrize("jobs", [1, 3])
+def test_featurize_matches_reference(corpus, jobs):
+    sentences, labels = corpus
+    featurized = list(featurize(iter(sentences), iter(labels), jobs))
+
+    assert [feats for feats, _ in featurized] == [sent2features(s) for s in sentences]
+    assert [labs for _, labs in featurized] == labels
+
+
+def test_workers_reopen_a_saved_gazetteer(corpus, tmp_path):
+    sentences, labels = corpus
+    entries = [(("paris",), "LOC"), (("la", "france"), "LOC"), (("de",), "X")]
+    model_path = tmp_path / "ner_model.joblib"
+    Gazetteer.build(entries).save(gazetteer_path(model_path))
+    gazetteer = load_gazetteer(gazetteer_path(model_path))
+    spec = FeatureSpec(window=2, gazetteer=True)
+
+    parallel = list(featurize(sentences, labels, 3, spec, gazetteer))
+
+    extract = compile_features(spec, gazetteer)
+    assert [feats for feats, _ in parallel] == [extract(s) for s in sentences]
+    assert any("gaz:B-X" in token for feats, _ in parallel for token in feats)
+
+
+def test_parallel_training_learns_the_same_weights(corpus):
+    sentences, labels = corpus
+    serial = train_crf(sentences, labels, jobs=1, max_iterations=20)
+    parallel = train_crf(sentences, labels, jobs=2, max_iterations=20)
+
+    assert parallel.state_features_ == serial.state_features_
+    assert parallel.transition_features_ == serial.transition_features_
+    assert parallel.feature_spec_ == serial.feature_spec_
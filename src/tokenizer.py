@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import re
+from array import array
+from typing import Iterator, List, Tuple
+
+# Mots, plus les ponctuations utiles à la structure (!, ?, ., :, ;)
+TOKEN_PATTERN = re.compile(r"\w+|[!?\.;:]")
+WORD_CONTINUATION = re.compile(r"\w*")
+
+Span = Tuple[str, int, int]
+
+
+class TokenSpans:
+    """Tokens et leurs offsets caractères (début, fin) dans des tableaux compacts"""
+
+    __slots__ = ("tokens", "starts", "ends")
+
+    def __init__(self) -> None:
+        self.tokens: List[str] = []
+        self.starts = array("q")
+        self.ends = array("q")
+
+    def append(self, token: str, start: int, end: int) -> None:
+        self.tokens.append(token)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def __iter__(self) -> Iterator[Span]:
+        return zip(self.tokens, self.starts, self.ends)
+
+    def __getitem__(self, i: int) -> Span:
+        return self.tokens[i], self.starts[i], self.ends[i]
+
+
+def tokenize(text: str, offset: int = 0) -> TokenSpans:
+    """Tokenise en une seule passe finditer, offsets décalés de ``offset``"""
+    spans = TokenSpans()
+    append = spans.append
+    for match in TOKEN_PATTERN.finditer(text):
+        append(match.group(), match.start() + offset, match.end() + offset)
+    return spans
+
+
+def tokenize_text(text: str) -> List[str]:
+    """Tokenise le texte en excluant les virgules et ponctuation non pertinente"""
+    return TOKEN_PATTERN.findall(text)
+
+
+class IncrementalTokenizer:
+    """Tokenise un texte reçu par morceaux, sans couper un mot entre deux morceaux.
+
+    Un mot qui touche la fin du morceau courant est gardé en attente et émis
+    avec le morceau suivant (ou par `flush`). Les offsets sont relatifs au
+    début du flux.
+    """
+
+    def __init__(self) -> None:
+        # Début du mot en attente, en morceaux : jamais recopié ni ré-analysé
+        self._pending: List[str] = []
+        self._base = 0
+
+    def feed(self, text: str) -> TokenSpans:
+        spans = TokenSpans()
+        start = 0
+        if self._pending:
+            # Le mot en attente se prolonge sur les caractères de mot en tête
+            start = WORD_CONTINUATION.match(text).end()
+            self._pending.append(text[:start])
+            if start == len(text):
+                return spans
+            word = "".join(self._pending)
+            spans.append(word, self._base, self._base + len(word))
+            self._base += len(word)
+            self._pending = []
+
+        keep = len(text)
+        base = self._base - start
+        for match in TOKEN_PATTERN.finditer(text, start):
+            if match.end() == len(text) and match.group()[-1] not in "!?.;:":
+                keep = match.start()
+                break
+            spans.append(match.group(), base + match.start(), base + match.end())
+        if keep < len(text):
+            self._pending.append(text[keep:])
+        self._base = base + keep
+        return spans
+
+    def flush(self) -> TokenSpans:
+        pending = "".join(self._pending)
+        spans = tokenize(pending, self._base)
+        self._base += len(pending)
+        self._pending = []
+        return spans
@@ -1,17 +1,45 @@
 from __future__ import annotations
 
 import argparse
+import dataclasses
+import json
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from itertools import product, tee
+from multiprocessing import Pool
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 import joblib
+import numpy as np
+from seqeval.metrics import f1_score
 from sklearn.feature_extraction import DictVectorizer
 from sklearn.linear_model import LogisticRegression
 from sklearn.pipeline import Pipeline
 from sklearn_crfsuite import CRF
 
-from src.conll import read_conll
-from src.features import sent2features
+from src.array_crf import ArrayCRF, arrays_path, export_arrays, is_fresh
+from src.conll import iter_conll, read_conll
+from src.features import (
+    DEFAULT_SPEC,
+    FeatureSpec,
+    compile_features,
+    feature_spec,
+    model_extractor,
+)
+from src.gazetteer import Gazetteer, load_gazetteer, model_gazetteer, save_gazetteer
+from src.incremental import update_crf, update_logreg
+
+FEATURIZE_CHUNK_SIZE = 256
+DEFAULT_GRID = {
+    "c1": [0.05, 0.1, 0.25],
+    "c2": [0.01, 0.1],
+    "max_iterations": [100],
+}
+
+Featurized = Tuple[List[Dict[str, object]], List[str]]
 
 
 def load_data(data_dir: Path) -> Tuple[List[List[str]], List[List[str]]]:
@@ -20,9 +48,70 @@ def load_data(data_dir: Path) -> Tuple[List[List[str]], List[List[str]]]:
     return train_sent, train_labels
 
 
-def train_logreg(train_sent: List[List[str]], train_labels: List[List[str]]):
-    X = [feat for sent in train_sent for feat in sent2features(sent)]
-    y = [lab for labs in train_labels for lab in labs]
+def iter_data(data_dir: Path) -> Tuple[Iterable[List[str]], Iterable[List[str]]]:
+    """Lazy counterpart of `load_data`: tokens and labels streamed from disk."""
+    train_path = data_dir / "fr_train.conll"
+    for_tokens, for_labels = tee(iter_conll(train_path))
+    train_sent = (sentence.tokens for sentence in for_tokens)
+    train_labels = (sentence.labels for sentence in for_labels)
+    return train_sent, train_labels
+
+
+def load_spec(path: Optional[Path]) -> FeatureSpec:
+    if path is None:
+        return DEFAULT_SPEC
+    return FeatureSpec.from_dict(json.loads(path.read_text(encoding="utf-8")))
+
+
+def save_model(model, output: Path, gazetteer: Optional[Gazetteer] = None) -> None:
+    """Dump the model, with the gazetteer its features use next to it."""
+    joblib.dump(model, output)
+    save_gazetteer(gazetteer, output)
+
+
+def _featurize_pair(
+    pair: Tuple[List[str], List[str]],
+    spec: FeatureSpec = DEFAULT_SPEC,
+    gazetteer: Optional[Gazetteer] = None,
+) -> Featurized:
+    sent, labels = pair
+    return compile_features(spec, gazetteer)(sent), labels
+
+
+def featurize(
+    train_sent: Iterable[List[str]],
+    train_labels: Iterable[List[str]],
+    jobs: int = 1,
+    spec: FeatureSpec = DEFAULT_SPEC,
+    gazetteer: Optional[Gazetteer] = None,
+) -> Iterator[Featurized]:
+    """Featurize sentences in order, sharded across `jobs` worker processes.
+
+    A saved gazetteer is reopened (memory mapped) by each worker rather than
+    copied to it.
+    """
+    pairs = zip(train_sent, train_labels)
+    featurize_pair = partial(_featurize_pair, spec=spec, gazetteer=gazetteer)
+    if jobs <= 1:
+        yield from map(featurize_pair, pairs)
+        return
+
+    with Pool(jobs) as pool:
+        yield from pool.imap(featurize_pair, pairs, chunksize=FEATURIZE_CHUNK_SIZE)
+
+
+def train_logreg(
+    train_sent: Iterable[List[str]],
+    train_labels: Iterable[List[str]],
+    jobs: int = 1,
+    spec: FeatureSpec = DEFAULT_SPEC,
+    gazetteer: Optional[Gazetteer] = None,
+):
+    X = []
+    y = []
+    for feats, labs in featurize(train_sent, train_labels, jobs, spec, gazetteer):
+        X.extend(feats)
+        y.extend(labs)
 
     clf = Pipeline(
         [
@@ -39,24 +128,80 @@ def train_logreg(train_sent: List[List[str]], train_labels: List[List[str]]):
     )
 
     clf.fit(X, y)
+    # Stored with the model so that evaluate.py and the API rebuild its extractor
+    clf.feature_spec_ = spec.as_dict()
     return clf
 
 
-def train_crf(train_sent: List[List[str]], train_labels: List[List[str]]):
-    X = [sent2features(sent) for sent in train_sent]
-    y = train_labels
+def train_crf(
+    train_sent: Iterable[List[str]],
+    train_labels: Iterable[List[str]],
+    jobs: int = 1,
+    c1: float = 0.1,
+    c2: float = 0.1,
+    max_iterations: int = 100,
+    spec: FeatureSpec = DEFAULT_SPEC,
+    gazetteer: Optional[Gazetteer] = None,
+):
+    # Consumed in lockstep by CRF.fit, sentence by sentence
+    for_X, for_y = tee(featurize(train_sent, train_labels, jobs, spec, gazetteer))
+    X = (feats for feats, _ in for_X)
+    y = (labs for _, labs in for_y)
 
     crf = CRF(
         algorithm="lbfgs",
-        c1=0.1,
-        c2=0.1,
-        max_iterations=100,
+        c1=c1,
+        c2=c2,
+        max_iterations=max_iterations,
         all_possible_transitions=True,
     )
     crf.fit(X, y)
+    crf.feature_spec_ = spec.as_dict()
     return crf
 
 
+def _fit_and_score(
+    data_dir: Path,
+    params: Dict[str, float],
+    spec: FeatureSpec = DEFAULT_SPEC,
+    gazetteer: Optional[Gazetteer] = None,
+) -> Tuple[float, CRF]:
+    train_sent, train_labels = iter_data(data_dir)
+    crf = train_crf(train_sent, train_labels, spec=spec, gazetteer=gazetteer, **params)
+
+    dev_sent, dev_labels = read_conll(data_dir / "fr_dev.conll")
+    extract = compile_features(spec, gazetteer)
+    preds = crf.predict([extract(sent) for sent in dev_sent])
+    return f1_score(dev_labels, [list(p) for p in preds]), crf
+
+
+def grid_search_crf(
+    data_dir: Path,
+    grid: Dict[str, List[float]],
+    jobs: int = 1,
+    spec: FeatureSpec = DEFAULT_SPEC,
+    gazetteer: Optional[Gazetteer] = None,
+) -> Tuple[Dict[str, float], float, CRF]:
+    """Fit every CRF configuration of `grid` in parallel and keep the best on dev."""
+    configs = [dict(zip(grid, values)) for values in product(*grid.values())]
+
+    best_params: Dict[str, float] = {}
+    best_f1 = -1.0
+    best_model = None
+    with ProcessPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = {
+            executor.submit(_fit_and_score, data_dir, params, spec, gazetteer): params
+            for params in configs
+        }
+        for future in as_completed(futures):
+            params = futures[future]
+            f1, crf = future.result()
+            print(f"{params} -> dev F1 {f1:.4f}")
+            if f1 > best_f1:
+                best_params, best_f1, best_model = params, f1, crf
+    return best_params, best_f1, best_model
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Train NER models")
     parser.add_argument(
@@ -74,24 +219,353 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--output",
         type=Path,
-        default=Path("models") / "ner_model.joblib",
-        help="Output path for the trained model",
+        default=None,
+        help="Output path for the trained model (default: models/ner_model.joblib, "
+        "or <model>_compressed.joblib with --compress)",
+    )
+    parser.add_argument(
+        "--feature-spec",
+        type=Path,
+        default=None,
+        help="JSON feature template (window, shapes, suffixes, prefixes, ...); "
+        "stored in the model. Default: the built-in template",
+    )
+    parser.add_argument(
+        "--gazetteer",
+        type=Path,
+        default=None,
+        help="Gazetteer built by src.gazetteer: adds its match features to the "
+        "spec and is saved next to the model (<output>.gazetteer)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes for featurization (or grid configurations)",
+    )
+    parser.add_argument(
+        "--grid",
+        action="store_true",
+        help="Search CRF hyper-parameters on the dev split and save the best "
+        "model as ner_model_best.joblib next to --output",
+    )
+    parser.add_argument(
+        "--export",
+        action="store_true",
+        help="Also export the CRF as NumPy arrays (<output>.arrays) for the API",
+    )
+    parser.add_argument(
+        "--update",
+        type=Path,
+        nargs="+",
+        help="Incremental mode: continue training --base-model on these new "
+        "CoNLL files only (a logreg is refit from its weights on the training "
+        "split plus these files)",
+    )
+    parser.add_argument(
+        "--base-model",
+        type=Path,
+        default=None,
+        help="Model updated by --update (default: --output)",
+    )
+    parser.add_argument(
+        "--epochs",
+        type=int,
+        default=3,
+        help="Passes over the new data (--update of a CRF)",
+    )
+    parser.add_argument(
+        "--learning-rate",
+        type=float,
+        default=0.05,
+        help="SGD step size for --update of a CRF",
+    )
+    parser.add_argument(
+        "--prior-strength",
+        type=float,
+        default=100.0,
+        help="L2 pull of a CRF --update towards the previous weights (higher "
+        "forgets less)",
+    )
+    parser.add_argument(
+        "--compare-full",
+        action="store_true",
+        help="With --update, also time a full retrain on the training split "
+        "plus the new files and compare dev F1",
+    )
+    parser.add_argument(
+        "--compress",
+        type=Path,
+        default=None,
+        help="Compression mode: prune/quantize this trained CRF, save it with its "
+        "array export and report size, load time, latency and dev F1 against it",
+    )
+    parser.add_argument(
+        "--prune-threshold",
+        type=float,
+        default=0.0,
+        help="Drop CRF state weights below this magnitude (--compress)",
+    )
+    parser.add_argument(
+        "--top-k",
+        type=int,
+        default=None,
+        help="Keep only the k largest CRF state weights (--compress)",
+    )
+    parser.add_argument(
+        "--quantize",
+        choices=["int8", "float16"],
+        default=None,
+        help="Store the compressed CRF weights as int8 or float16 (--compress)",
+    )
+    parser.add_argument("--c1", type=float, nargs="+", help="CRF L1 penalty")
+    parser.add_argument("--c2", type=float, nargs="+", help="CRF L2 penalty")
+    parser.add_argument(
+        "--max-iterations", type=int, nargs="+", help="CRF L-BFGS iterations"
     )
     return parser.parse_args()
 
 
+def read_files(paths: List[Path]) -> Tuple[List[List[str]], List[List[str]]]:
+    sentences: List[List[str]] = []
+    labels: List[List[str]] = []
+    for path in paths:
+        file_sent, file_labels = read_conll(path)
+        sentences.extend(file_sent)
+        labels.extend(file_labels)
+    return sentences, labels
+
+
+def dev_f1(
+    model, data_dir: Path, gazetteer: Optional[Gazetteer] = None
+) -> Optional[float]:
+    dev_path = data_dir / "fr_dev.conll"
+    if not dev_path.exists():
+        return None
+    dev_sent, dev_labels = read_conll(dev_path)
+    extract = model_extractor(model, gazetteer)
+    X = [extract(sent) for sent in dev_sent]
+    if isinstance(model, Pipeline):
+        flat = list(model.predict([feat for feats in X for feat in feats]))
+        preds, idx = [], 0
+        for sent in dev_sent:
+            preds.append(flat[idx : idx + len(sent)])
+            idx += len(sent)
+    else:
+        preds = [list(labels) for labels in model.predict(X)]
+    return f1_score(dev_labels, preds)
+
+
+def run_update(args: argparse.Namespace) -> None:
+    """Warm-start the existing model on the new files and save it to --output."""
+    if args.c1 or args.c2:
+        raise SystemExit(
+            "--c1/--c2 only apply to full training; use --prior-strength with --update"
+        )
+    base_path = args.base_model or args.output
+    base = joblib.load(base_path)
+    gazetteer = model_gazetteer(base, base_path)
+    new_sent, new_labels = read_files(args.update)
+    n_tokens = sum(len(sent) for sent in new_sent)
+
+    start = time.perf_counter()
+    if isinstance(base, Pipeline):
+        model_type = "logreg"
+        # Warm-started refit: the training split keeps what the model learned
+        train_sent, train_labels = load_data(args.data_dir)
+        model = update_logreg(
+            base,
+            new_sent,
+            new_labels,
+            gazetteer=gazetteer,
+            seen_sent=train_sent,
+            seen_labels=train_labels,
+        )
+    else:
+        model_type = "crf"
+        model = update_crf(
+            base,
+            new_sent,
+            new_labels,
+            args.epochs,
+            args.learning_rate,
+            args.prior_strength,
+            gazetteer=gazetteer,
+        )
+    update_seconds = time.perf_counter() - start
+    print(
+        f"Updated {model_type} model {base_path} on {len(new_sent)} new sentences "
+        f"({n_tokens} tokens) in {update_seconds:.1f}s"
+    )
+
+    save_model(model, args.output, gazetteer)
+    print(f"Model saved to {args.output}")
+    if args.export and model_type == "crf":
+        export_arrays(model, arrays_path(args.output))
+
+    if args.compare_full:
+        train_sent, train_labels = load_data(args.data_dir)
+        start = time.perf_counter()
+        spec = feature_spec(model)
+        if model_type == "logreg":
+            full = train_logreg(
+                train_sent + new_sent,
+                train_labels + new_labels,
+                args.jobs,
+                spec,
+                gazetteer,
+            )
+        else:
+            full = train_crf(
+                train_sent + new_sent,
+                train_labels + new_labels,
+                args.jobs,
+                spec=spec,
+                gazetteer=gazetteer,
+            )
+        full_seconds = time.perf_counter() - start
+        print(
+            f"Full retrain on {len(train_sent) + len(new_sent)} sentences: "
+            f"{full_seconds:.1f}s (update x{full_seconds / update_seconds:.1f} faster)"
+        )
+        for name, candidate in [("update", model), ("full retrain", full)]:
+            f1 = dev_f1(candidate, args.data_dir, gazetteer)
+            if f1 is not None:
+                print(f"Dev F1 ({name}): {f1:.4f}")
+
+
+def artifact_size(path: Path) -> int:
+    if path.is_dir():
+        return sum(child.stat().st_size for child in path.iterdir())
+    return path.stat().st_size
+
+
+def profile_arrays(model_path: Path, arrays: Path, data_dir: Path) -> Dict[str, float]:
+    """Artifact sizes, mmap load time, serving latency and dev F1 of an export."""
+    start = time.perf_counter()
+    model = ArrayCRF.load(arrays, mmap=True)
+    gazetteer = model_gazetteer(model, model_path)
+    report = {
+        "joblib_mb": artifact_size(model_path) / 1e6,
+        "arrays_mb": artifact_size(arrays) / 1e6,
+        "load_ms": (time.perf_counter() - start) * 1000,
+    }
+    dev_path = data_dir / "fr_dev.conll"
+    if dev_path.exists():
+        dev_sent, _ = read_conll(dev_path)
+        extract = model_extractor(model, gazetteer)
+        X = [extract(sent) for sent in dev_sent]
+        start = time.perf_counter()
+        model.predict(X)
+        report["ms_per_sentence"] = (time.perf_counter() - start) / len(X) * 1000
+        report["dev_f1"] = dev_f1(model, data_dir, gazetteer)
+    return report
+
+
+def run_compress(args: argparse.Namespace) -> None:
+    """Prune and quantize a trained CRF and compare it with the original."""
+    output = args.output or args.compress.with_name(
+        f"{args.compress.stem}_compressed.joblib"
+    )
+    base = joblib.load(args.compress)
+    if isinstance(base, Pipeline):
+        raise SystemExit("--compress only applies to CRF models")
+    model = base if isinstance(base, ArrayCRF) else ArrayCRF.from_crf(base)
+    n_weights = int(np.count_nonzero(model.weights()))
+
+    model = model.prune(args.prune_threshold, args.top_k)
+    if args.quantize:
+        model = model.quantize(args.quantize)
+    # The array export is the serving artifact (NER_MODEL_FORMAT=arrays)
+    save_model(model, output, model_gazetteer(model, args.compress))
+    export_arrays(model, arrays_path(output))
+    print(
+        f"{n_weights} -> {int(np.count_nonzero(model.state))} state weights, "
+        f"{len(model.attributes)} attributes; saved to {output} "
+        f"and {arrays_path(output)}"
+    )
+
+    if is_fresh(args.compress):
+        before = profile_arrays(
+            args.compress, arrays_path(args.compress), args.data_dir
+        )
+    else:
+        # Profile the original from a throwaway export, not one left next to it
+        with tempfile.TemporaryDirectory() as tmp:
+            arrays = Path(tmp) / "original.arrays"
+            export_arrays(base, arrays)
+            before = profile_arrays(args.compress, arrays, args.data_dir)
+    after = profile_arrays(output, arrays_path(output), args.data_dir)
+    print(f"{'':<16} {'original':>10} {'compressed':>11} {'ratio':>7}")
+    for key in before:
+        ratio = after[key] / before[key] if before[key] else float("nan")
+        print(f"{key:<16} {before[key]:>10.4f} {after[key]:>11.4f} {ratio:>7.2f}")
+
+
 def main() -> None:
     args = parse_args()
-    train_sent, train_labels = load_data(args.data_dir)
+    if args.compress:
+        run_compress(args)
+        return
+
+    args.output = args.output or Path("models") / "ner_model.joblib"
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+
+    if args.update:
+        run_update(args)
+        return
+
+    spec = load_spec(args.feature_spec)
+    gazetteer = None
+    if args.gazetteer is not None:
+        gazetteer = load_gazetteer(args.gazetteer)
+        spec = dataclasses.replace(spec, gazetteer=True)
+    elif spec.gazetteer:
+        raise SystemExit("The feature spec uses a gazetteer: pass --gazetteer")
+    if args.grid:
+        grid = {
+            "c1": args.c1 or DEFAULT_GRID["c1"],
+            "c2": args.c2 or DEFAULT_GRID["c2"],
+            "max_iterations": args.max_iterations or DEFAULT_GRID["max_iterations"],
+        }
+        params, f1, model = grid_search_crf(
+            args.data_dir, grid, args.jobs, spec, gazetteer
+        )
+        output = args.output.parent / "ner_model_best.joblib"
+        save_model(model, output, gazetteer)
+        print(f"Best {params} (dev F1 {f1:.4f}) saved to {output}")
+        if args.export:
+            export_arrays(model, arrays_path(output))
+        return
+
+    train_sent, train_labels = iter_data(args.data_dir)
 
     if args.model == "logreg":
-        model = train_logreg(train_sent, train_labels)
+        model = train_logreg(train_sent, train_labels, args.jobs, spec, gazetteer)
     else:
-        model = train_crf(train_sent, train_labels)
+        params = {
+            name: values[0]
+            for name, values in [
+                ("c1", args.c1),
+                ("c2", args.c2),
+                ("max_iterations", args.max_iterations),
+            ]
+            if values
+        }
+        model = train_crf(
+            train_sent,
+            train_labels,
+            args.jobs,
+            spec=spec,
+            gazetteer=gazetteer,
+            **params,
+        )
 
-    args.output.parent.mkdir(parents=True, exist_ok=True)
-    joblib.dump(model, args.output)
+    save_model(model, args.output, gazetteer)
     print(f"Model saved to {args.output}")
+    if args.export and args.model == "crf":
+        export_arrays(model, arrays_path(args.output))
+        print(f"Arrays exported to {arrays_path(args.output)}")
 
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
 import React, { useState } from 'react';
+import { exportPDF as requestPDF } from '../utiles/api';
 
 export default function ExportPanel({ text, entities, statistics }) {
   const [exporting, setExporting] = useState(false);
@@ -26,22 +27,13 @@ export default function ExportPanel({ text, entities, statistics }) {
   const exportPDF = async () => {
     setExporting(true);
     try {
-      const response = await fetch('https://nlp-4g9u.onrender.com/export-pdf', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          text,
-          entities,
-          statistics,
-          entities_by_type: statistics.by_type || []
-        })
+      // Génération en arrière-plan côté API, puis téléchargement du rapport
+      const blob = await requestPDF({
+        text,
+        entities,
+        statistics,
+        entities_by_type: statistics.by_type || []
       });
-
-      if (!response.ok) throw new Error('Erreur lors de la génération du PDF');
-
-      const blob = await response.blob();
       const url = window.URL.createObjectURL(blob);
       const a = document.createElement('a');
       a.href = url;
@@ -3,7 +3,7 @@ import { FaSync, FaDownload, FaExclamationCircle, FaCheckCircle } from 'react-ic
 import Results from '../components/Analyze/Results'
 import Statistics from '../components/Analyze/Statistics'
 import Charts from '../components/Analyze/Charts'
-import { analyzeText, analyzeFile } from '../utiles/api'
+import { analyzeText, analyzeFileStream } from '../utiles/api'
 import './AnalyzePage.css'
 
 export default function AnalyzePage() {
@@ -111,7 +111,8 @@ export default function AnalyzePage() {
     try {
       let result
       if (dataToAnalyze.type === 'file') {
-        result = await analyzeFile(dataToAnalyze.data)
+        // Les résultats s'affichent page par page pendant l'analyse
+        result = await analyzeFileStream(dataToAnalyze.data, setResults)
       } else {
         result = await analyzeText(dataToAnalyze.data)
       }
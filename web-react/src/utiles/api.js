@@ -30,16 +30,85 @@ export const analyzeFile = async (file) => {
   return response.json();
 };
 
+// Version streamée : onChunk est appelé pour chaque page/paragraphe tagué
+export const analyzeFileStream = async (file, onChunk) => {
+  const formData = new FormData();
+  formData.append("file", file);
+
+  const response = await fetch(`${API_BASE}/predict-file-stream`, {
+    method: "POST",
+    body: formData
+  });
+
+  if (!response.ok) {
+    throw new Error(`API error: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  const result = { tokens: [], labels: [], entities: [], statistics: {} };
+  let buffer = "";
+
+  const handleLine = (line) => {
+    if (!line.trim()) return;
+    const message = JSON.parse(line);
+    if (message.error) {
+      throw new Error(message.error);
+    }
+    if (message.done) {
+      // Entité encore ouverte à la fin du dernier morceau
+      result.entities.push(...(message.entities || []));
+      result.statistics = message.statistics;
+      onChunk?.({ ...result });
+      return;
+    }
+    result.tokens.push(...message.tokens);
+    result.labels.push(...message.labels);
+    result.entities.push(...message.entities);
+    onChunk?.({ ...result });
+  };
+
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split("\n");
+    buffer = lines.pop();
+    lines.forEach(handleLine);
+  }
+  handleLine(buffer + decoder.decode());
+
+  return result;
+};
+
 export const exportPDF = async (data) => {
   const response = await fetch(`${API_BASE}/export-pdf`, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify(data)
   });
-  
+
   if (!response.ok) {
     throw new Error(`PDF export error: ${response.status}`);
   }
-  
-  return response.blob();
-};
\ No newline at end of file
+
+  // Le rapport est généré en arrière-plan : attendre la fin du job
+  let job = await response.json();
+  while (job.status === "pending") {
+    await new Promise((resolve) => setTimeout(resolve, 500));
+    const poll = await fetch(`${API_BASE}/export-pdf/${job.job_id}`);
+    if (!poll.ok) {
+      throw new Error(`PDF export error: ${poll.status}`);
+    }
+    job = await poll.json();
+  }
+  if (job.status === "error") {
+    throw new Error(`PDF export error: ${job.error}`);
+  }
+
+  const download = await fetch(`${API_BASE}/export-pdf/${job.job_id}/download`);
+  if (!download.ok) {
+    throw new Error(`PDF export error: ${download.status}`);
+  }
+  return download.blob();
+};